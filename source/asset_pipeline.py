@@ -0,0 +1,123 @@
+"""
+Loading of assets in parallel. Files are decoded to CPU-side data (a 'mesh.Mesh', 'texture.Image' or 'FontData') in a
+pool of worker processes, and uploaded on the main thread (which has the OpenGL context) as they come back:
+
+    pipeline = AssetPipeline()
+    pipeline.submit('model.obj', 'texture.png', 'font.fnt')
+    ...  # E.g. create the window, while the workers decode.
+    assets, timings = pipeline.load()
+    print(format_timings(timings, pipeline.elapsed))
+
+The workers are started from a fork server (or spawned where there's none) instead of forked from the main process, as
+a fork would share its window and OpenGL context. They import the program again, so it must guard its entry point with
+"if __name__ == '__main__'". Workers never call OpenGL.
+"""
+import multiprocessing
+import os
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from source.mesh import Mesh, parse_obj
+from source.mesh_optimization import optimize_mesh
+from source.model import create_mesh_model
+from source.text import Font, parse_font
+from source.texture import Image, decode_png, create_texture
+
+
+# A font before it's uploaded: its characters (see 'text.parse_font') and the image of its texture.
+FontData = namedtuple('FontData', 'characters, image')
+
+# Seconds spent on an asset: decoding it in a worker, from submitting it until it was back on the main thread
+# (decoding, waiting for a worker and sending it between processes), and uploading it.
+AssetTiming = namedtuple('AssetTiming', 'path, decode, latency, upload')
+
+
+def _decode_obj(path):
+    return optimize_mesh(parse_obj(path))
+
+
+def _decode_font(path):
+    characters, texture_path = parse_font(path)
+    return FontData(characters, decode_png(texture_path))
+
+
+def _upload_font(font):
+    return Font(font.characters, create_texture(font.image))
+
+
+# Decoder of each file extension, and uploader of each type they decode to.
+DECODERS  = {'.obj': _decode_obj, '.png': decode_png, '.fnt': _decode_font}
+UPLOADERS = {Mesh: create_mesh_model, Image: create_texture, FontData: _upload_font}
+
+
+def decode_asset(path):
+    """Decodes the file at 'path' with the decoder of its extension. Returns the data and the seconds it took."""
+    start = time.perf_counter()
+    data = DECODERS[os.path.splitext(path)[1].lower()](path)
+    return data, time.perf_counter() - start
+
+
+class AssetPipeline:
+    """Decodes assets in 'workers' processes (by default, one per core) and uploads them on the main thread."""
+
+    def __init__(self, workers=None):
+        method  = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+        context = multiprocessing.get_context(method)
+        self.executor = ProcessPoolExecutor(workers, mp_context=context)
+        self.pending = {}    # Future of each submitted asset to its path and when it was submitted.
+        self.start   = None  # When the first asset was submitted.
+        self.elapsed = 0.0   # Seconds from the first submit until the last upload of 'load'.
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.shutdown()
+
+    def submit(self, *paths):
+        """Starts decoding the files at 'paths' (see 'DECODERS')."""
+        now = time.perf_counter()
+        if self.start is None:
+            self.start = now
+        for path in paths:
+            self.pending[self.executor.submit(decode_asset, path)] = (path, now)
+
+    def decoded(self):
+        """Yields the path, data, decoding and latency seconds of each submitted asset, in the order they're done."""
+        pending, self.pending = self.pending, {}
+        for future in as_completed(pending):
+            path, submitted = pending[future]
+            data, decode = future.result()
+            yield path, data, decode, time.perf_counter() - submitted
+
+    def load(self):
+        """
+        Waits for the submitted assets and uploads them (see 'UPLOADERS') as they're decoded. Returns the asset of each
+        path, and their 'AssetTiming' in the order they were uploaded.
+        """
+        assets, timings = {}, []
+        for path, data, decode, latency in self.decoded():
+            start = time.perf_counter()
+            assets[path] = UPLOADERS[type(data)](data)
+            timings.append(AssetTiming(path, decode, latency, time.perf_counter() - start))
+        self.elapsed = time.perf_counter() - self.start if self.start is not None else 0.0
+        return assets, timings
+
+    def shutdown(self):
+        self.executor.shutdown()
+
+
+def format_timings(timings, elapsed):
+    """A table of the 'AssetTiming's in milliseconds, and how much decoding was done in the 'elapsed' seconds."""
+    lines = ['{:>32} {:>10} {:>10} {:>10}'.format('asset', 'decode', 'latency', 'upload')]
+    for timing in timings:
+        lines.append('{:>32} {:>8.1f}ms {:>8.1f}ms {:>8.1f}ms'.format(
+            os.path.basename(timing.path), timing.decode * 1000, timing.latency * 1000, timing.upload * 1000
+        ))
+    decode = sum(timing.decode for timing in timings)
+    upload = sum(timing.upload for timing in timings)
+    lines.append('{} assets: {:.1f} ms of decoding and {:.1f} ms of uploading in {:.1f} ms'.format(
+        len(timings), decode * 1000, upload * 1000, elapsed * 1000
+    ))
+    return '\n'.join(lines)
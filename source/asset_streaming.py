@@ -0,0 +1,113 @@
+"""
+Loading of assets in the background while the program runs. 'load_texture' and 'load_model' return an 'AssetHandle'
+right away, which stands in for a placeholder (a white 1x1 texture or a unit cube) until the file is decoded (in an
+executor, see 'asset_pipeline.decode_asset') and uploaded. Uploads happen in 'update', which is scheduled on the pyglet
+clock and only uploads for 'budget' seconds per frame, so frame times stay flat while assets stream in:
+
+    streamer = AssetStreamer.create()
+    texture  = streamer.load_texture('texture.png')  # Usable right away.
+    pyglet.clock.schedule(streamer.update)
+"""
+import logging
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy
+
+from source.asset_pipeline import decode_asset, UPLOADERS
+from source.model import create_cube
+from source.texture import Image, create_texture
+
+
+UPLOAD_BUDGET = 0.002  # Seconds of uploading per frame, of the 16.7 ms of a frame at 60 Hz.
+
+logger = logging.getLogger(__name__)
+
+
+class AssetHandle:
+    """
+    An asset that may still be loading. Attributes are those of its placeholder until it's 'ready'. If the file couldn't
+    be decoded, it keeps the placeholder and 'error' is the exception.
+    """
+
+    def __init__(self, path, asset):
+        self.path  = path
+        self.asset = asset
+        self.ready = False
+        self.error = None
+
+    def __getattr__(self, name):
+        return getattr(self.asset, name)
+
+
+class AssetStreamer:
+
+    @classmethod
+    def create(cls, budget=UPLOAD_BUDGET, executor=None):
+        """A streamer with a white 1x1 texture and a unit cube as placeholders."""
+        white = Image(1, 1, numpy.full((1, 1, 4), 255, dtype=numpy.uint8))
+        return cls(create_texture(white), create_cube(), budget, executor)
+
+    def __init__(self, placeholder_texture, placeholder_model, budget=UPLOAD_BUDGET, executor=None,
+                 decode=decode_asset, uploaders=UPLOADERS, timer=time.perf_counter):
+        """
+        Files are decoded with 'decode' in 'executor' (by default, a background thread, but e.g. the process pool of
+        an 'AssetPipeline' works too), and uploaded with the uploader of their type in 'uploaders'.
+        """
+        self.placeholder_texture = placeholder_texture
+        self.placeholder_model   = placeholder_model
+        self.budget    = budget
+        self.executor  = executor or ThreadPoolExecutor(1)
+        self.decode    = decode
+        self.uploaders = uploaders
+        self.timer     = timer
+        self.owns_executor = executor is None
+
+        self.handles = {}       # Path to its handle, so every file is only loaded once.
+        self.decoded = deque()  # (handle, future) of decoded files, appended from the executor's threads.
+        self.pending = 0        # Handles not yet ready (or failed).
+
+    def load_texture(self, path):
+        return self._load(path, self.placeholder_texture)
+
+    def load_model(self, path):
+        return self._load(path, self.placeholder_model)
+
+    def _load(self, path, placeholder):
+        handle = self.handles.get(path)
+        if handle is None:
+            handle = self.handles[path] = AssetHandle(path, placeholder)
+            self.pending += 1
+            future = self.executor.submit(self.decode, path)
+            future.add_done_callback(lambda future: self.decoded.append((handle, future)))
+        return handle
+
+    def update(self, dt=None):
+        """
+        Uploads decoded assets until 'budget' seconds have passed (but at least one, so big assets still load).
+        Returns how many were uploaded. Files that couldn't be decoded are logged, and their handles get the 'error'.
+        """
+        start = self.timer()
+        uploaded = 0
+        while self.decoded:
+            handle, future = self.decoded.popleft()
+            try:
+                data, _ = future.result()
+            except Exception as exception:
+                logger.error("Couldn't decode '%s': %s", handle.path, exception)
+                handle.error = exception
+                self.pending -= 1
+                continue
+            handle.asset = self.uploaders[type(data)](data)
+            handle.ready = True
+            self.pending -= 1
+            uploaded += 1
+            if self.timer() - start >= self.budget:
+                break
+        return uploaded
+
+    def shutdown(self):
+        """Stops the executor, unless it was given (and may be shared)."""
+        if self.owns_executor:
+            self.executor.shutdown()
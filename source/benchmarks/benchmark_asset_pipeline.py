@@ -0,0 +1,46 @@
+"""
+Time to decode 200 assets (the textures, fonts and models in 'resources', repeated) one after another on the main
+thread, compared to in an 'AssetPipeline' with 1, 2, ... workers up to one per core. Only decoding is timed, as
+uploading needs an OpenGL context and is done on the main thread either way.
+
+Run from the repository root with:
+    python -m source.benchmarks.benchmark_asset_pipeline
+"""
+import os
+import time
+
+from source.asset_pipeline import AssetPipeline, decode_asset
+
+
+def main():
+    resources = os.path.join(os.path.dirname(__file__), '..', '..', 'resources')
+    files = [
+        os.path.join(resources, folder, name)
+        for folder, extension in (('textures', '.png'), ('fonts', '.fnt'), ('models', '.obj'))
+        for name in sorted(os.listdir(os.path.join(resources, folder))) if name.endswith(extension)
+    ]
+    paths = [files[i % len(files)] for i in range(200)]
+
+    start = time.perf_counter()
+    for path in paths:
+        decode_asset(path)
+    sequential = time.perf_counter() - start
+    print('{:>12}: {:8.1f} ms'.format('sequential', sequential * 1000))
+
+    workers = 1
+    while workers <= os.cpu_count():
+        with AssetPipeline(workers) as pipeline:
+            pipeline.submit(paths[0])
+            list(pipeline.decoded())  # Start the workers before timing.
+
+            start = time.perf_counter()
+            pipeline.submit(*paths)
+            for _ in pipeline.decoded():
+                pass
+            elapsed = time.perf_counter() - start
+        print('{:>4} workers: {:8.1f} ms ({:.2f}x)'.format(workers, elapsed * 1000, sequential / elapsed))
+        workers *= 2
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""
+Time to build an AABB tree of 100k boxes, and to pick (ray cast) and refit in it, compared to testing every box.
+
+Run from the repository root with:
+    python -m source.benchmarks.benchmark_bvh
+"""
+from time import perf_counter
+from timeit import Timer
+
+import numpy
+
+from source.bvh import AABBTree
+
+
+def main():
+    random = numpy.random.RandomState(0)
+    count = 100000
+    size = (count * 100) ** (1 / 3) / 2
+    centers = random.uniform(-size, size, size=(count, 3))
+    half_extents = random.uniform(0.25, 1, size=(count, 3))
+    minimums, maximums = centers - half_extents, centers + half_extents
+
+    start = perf_counter()
+    tree, proxies = AABBTree.create(minimums, maximums)
+    print('Create with {} boxes: {:.2f} s'.format(count, perf_counter() - start))
+
+    start = perf_counter()
+    small_tree = AABBTree()
+    for minimum, maximum in zip(minimums[:10000].tolist(), maximums[:10000].tolist()):
+        small_tree.insert(minimum, maximum)
+    print('Insert 10000 boxes one by one: {:.2f} s'.format(perf_counter() - start))
+
+    origins    = random.uniform(-size, size, size=(100, 3))
+    directions = random.normal(size=(100, 3))
+    rays = [(tuple(origin), tuple(direction)) for origin, direction in zip(origins, directions)]
+
+    def pick():
+        for origin, direction in rays:
+            tree.ray_cast(origin, direction)
+
+    def brute_force_pick():
+        for origin, direction in rays[:10]:
+            with numpy.errstate(divide='ignore', invalid='ignore'):
+                t1 = (minimums - origin) / direction
+                t2 = (maximums - origin) / direction
+            near = numpy.maximum(numpy.minimum(t1, t2).max(axis=1), 0)
+            far = numpy.maximum(t1, t2).min(axis=1)
+            hits = numpy.flatnonzero(near <= far)
+            hits[numpy.argmin(near[hits])] if len(hits) else None
+
+    moved = random.choice(count, size=1000, replace=False)
+    offsets = random.uniform(-0.5, 0.5, size=(1000, 3))
+
+    def refit():
+        for proxy, offset in zip(moved, offsets):
+            tree.refit(proxies[proxy], minimums[proxy] + offset, maximums[proxy] + offset)
+
+    for name, function, rays_or_boxes in (('ray cast', pick, 100), ('brute force ray cast', brute_force_pick, 10),
+                                          ('refit', refit, 1000)):
+        timer = Timer(function)
+        number, _ = timer.autorange()
+        best = min(timer.repeat(repeat=5, number=number)) / number
+        print('{:<21} {:.1f} us each'.format(name + ':', best / rays_or_boxes * 1e6))
+
+    tree.validate()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+"""
+Time to build the spatial hash and produce the overlapping pairs for 50k boxes, with and without a
+big collider.
+
+Run from the repository root with:
+    python -m source.benchmarks.benchmark_collision
+"""
+from timeit import Timer
+
+import numpy
+
+from source.collision import SpatialHash
+
+
+def main():
+    random = numpy.random.RandomState(0)
+    for big_collider in (False, True):
+        for count in (1000, 10000, 50000):
+            # Keep the density constant, about one box per 100 cubic units.
+            size = (count * 100) ** (1 / 3) / 2
+            centers = random.uniform(-size, size, size=(count, 3)).astype(numpy.float32)
+            half_extents = random.uniform(0.25, 1, size=(count, 3)).astype(numpy.float32)
+            if big_collider:
+                # A ground plane under half of the boxes.
+                centers[0], half_extents[0] = (0, 0, 0), (size, 1, size)
+            minimums, maximums = centers - half_extents, centers + half_extents
+
+            spatial_hash = SpatialHash()
+
+            def run():
+                spatial_hash.build(minimums, maximums)
+                return spatial_hash.pairs()
+
+            timer = Timer(run)
+            number, _ = timer.autorange()
+            best = min(timer.repeat(repeat=5, number=number)) / number
+            description = ' (and a big collider)' if big_collider else ''
+            print('{:>8} boxes{}: {:>6} pairs in {:.2f} ms'.format(count, description, len(run()), best * 1000))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+"""
+Time to frustum cull 100k instances, compared to testing them one by one.
+
+Run from the repository root with:
+    python -m source.benchmarks.benchmark_culling
+"""
+from timeit import Timer
+
+import numpy
+
+from source.culling import FrustumCuller
+from source.linear_algebra import perspective_matrix, transformation_matrix, transformation_matrices
+from source.model import Bounds
+
+
+def main():
+    random = numpy.random.RandomState(0)
+    count = 100000
+    matrices = transformation_matrices(
+        random.uniform(-100, 100, size=(count, 3)), random.uniform(-3, 3, size=(count, 3)),
+        random.uniform(0.5, 2, size=(count, 3))
+    )
+    bounds = Bounds(numpy.full(3, -0.5), numpy.full(3, 0.5), numpy.zeros(3), float(numpy.sqrt(0.75)))
+
+    culler = FrustumCuller()
+    perspective, view = perspective_matrix(60, 1, 0.1, 100), transformation_matrix(0, 0, -10)
+
+    def vectorized():
+        culler.begin_frame(perspective, view)
+        return culler.cull(matrices, bounds)
+
+    def one_by_one():
+        culler.begin_frame(perspective, view)
+        visible = []
+        for i, matrix in enumerate(matrices[:count // 100]):
+            if len(culler.cull(matrix, bounds)):
+                visible.append(i)
+        return visible
+
+    for name, function, scale in (('vectorized', vectorized, 1), ('one by one', one_by_one, 100)):
+        timer = Timer(function)
+        number, _ = timer.autorange()
+        best = min(timer.repeat(repeat=5, number=number)) / number * scale
+        print('{:<11} {:.2f} ms'.format(name + ':', best * 1000))
+
+    vectorized()
+    print('Visible: {}, culled: {}'.format(culler.visible, culler.culled))
+
+
+if __name__ == '__main__':
+    main()
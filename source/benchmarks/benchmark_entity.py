@@ -0,0 +1,51 @@
+"""
+Tagging and untagging a large group of entities, one at a time against all at once.
+
+Run from the repository root with:
+    python -m source.benchmarks.benchmark_entity
+"""
+from time import perf_counter
+
+from source.entity import World, Transform, Physics
+
+
+class Selected:
+    pass
+
+
+def create_world(count):
+    world = World()
+    entities = [
+        world.create_entity(
+            Transform(location=(i, 0, 0), rotation=(0, 0, 0), scale=(1, 1, 1)),
+            Physics(velocity=(0, 0, 0), acceleration=(0, 0, 0), max_speed=1)
+        ) for i in range(count)
+    ]
+    return world, entities
+
+
+def main():
+    world, entities = create_world(10)
+    world.add_components_to_many(entities, Selected())  # Warm up, as NumPy imports some modules lazily.
+
+    print('{:>8} {:>16} {:>16} {:>10}'.format('N', 'single (ms)', 'batched (ms)', 'speedup'))
+    for count in (100, 10000, 50000):
+        world, entities = create_world(count)
+        start = perf_counter()
+        for entity in entities:
+            world.add_components(entity, Selected())
+        for entity in entities:
+            world.remove_components(entity, Selected)
+        single = perf_counter() - start
+
+        world, entities = create_world(count)
+        start = perf_counter()
+        world.add_components_to_many(entities, Selected())
+        world.remove_components_from_many(entities, Selected)
+        batched = perf_counter() - start
+
+        print('{:>8} {:>16.2f} {:>16.2f} {:>9.1f}x'.format(count, single * 1000, batched * 1000, single / batched))
+
+
+if __name__ == '__main__':
+    main()
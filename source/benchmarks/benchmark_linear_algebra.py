@@ -0,0 +1,45 @@
+"""
+Throughput of 'transformation_matrix' (one entity at a time) against 'transformation_matrices' (all at once).
+
+Run from the repository root with:
+    python -m source.benchmarks.benchmark_linear_algebra
+"""
+from timeit import Timer
+
+import numpy
+
+from source.linear_algebra import transformation_matrix, transformation_matrices
+
+
+def best_time(function, repeat=5):
+    timer = Timer(function)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def main():
+    random = numpy.random.RandomState(0)
+
+    print('{:>8} {:>16} {:>16} {:>10}'.format('N', 'scalar (/s)', 'batched (/s)', 'speedup'))
+    for count in (1, 100, 10000, 100000):
+        locations = random.uniform(-100, 100, size=(count, 3)).astype(numpy.float32)
+        rotations = random.uniform(-numpy.pi, numpy.pi, size=(count, 3)).astype(numpy.float32)
+        scales    = random.uniform(0.1, 10, size=(count, 3)).astype(numpy.float32)
+
+        def scalar():
+            return [transformation_matrix(*l, *r, *s) for l, r, s in zip(locations, rotations, scales)]
+
+        def batched():
+            return transformation_matrices(locations, rotations, scales)
+
+        # The scalar version is too slow to run repeatedly for large N.
+        scalar_time  = best_time(scalar, repeat=1 if count > 1000 else 5)
+        batched_time = best_time(batched)
+
+        print('{:>8} {:>16,.0f} {:>16,.0f} {:>9.1f}x'.format(
+            count, count / scalar_time, count / batched_time, scalar_time / batched_time
+        ))
+
+
+if __name__ == '__main__':
+    main()
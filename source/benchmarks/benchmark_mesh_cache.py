@@ -0,0 +1,55 @@
+"""
+Time to load the vertex data of a scene of 400 meshes (copies of the models in 'resources/models') by parsing the OBJ
+files, compared to loading their cached meshes (including hashing the OBJ files to find them). Both read every byte,
+like uploading it would.
+
+Run from the repository root with:
+    python -m source.benchmarks.benchmark_mesh_cache
+"""
+import os
+import shutil
+import tempfile
+from timeit import Timer
+
+from source.mesh import parse_obj
+from source.mesh_cache import save_mesh, load_mesh, cache_path
+from source.model import MODEL_LAYOUT
+
+
+def main():
+    folder = os.path.join(os.path.dirname(__file__), '..', '..', 'resources', 'models')
+    models = [os.path.join(folder, name) for name in sorted(os.listdir(folder)) if name.endswith('.obj')]
+
+    with tempfile.TemporaryDirectory() as directory:
+        paths = []
+        for i in range(400):
+            path = os.path.join(directory, '{}.obj'.format(i))
+            shutil.copy(models[i % len(models)], path)
+            with open(path, 'a') as file:
+                file.write('# {}\n'.format(i))  # Different content, so every copy has its own cache file.
+            paths.append(path)
+
+        cache = os.path.join(directory, 'cache')
+        os.makedirs(cache)
+        for path in paths:
+            save_mesh(cache_path(path, cache), parse_obj(path))
+
+        def parse():
+            for path in paths:
+                mesh = parse_obj(path)
+                MODEL_LAYOUT.pack(
+                    position=mesh.positions, texture_coordinate=mesh.texture_coordinates, normal=mesh.normals
+                ).tobytes()
+
+        def cached():
+            for path in paths:
+                _, _, vertices, indices = load_mesh(cache_path(path, cache))
+                vertices.tobytes(), indices.tobytes()
+
+        for name, function in (('parse', parse), ('cached', cached)):
+            time = min(Timer(function).repeat(repeat=3, number=1))
+            print('{:>8}: {:8.1f} ms'.format(name, time * 1000))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+"""
+Time to parse OBJ files: the models in 'resources/models', and a generated grid of 500k triangles.
+
+Run from the repository root with:
+    python -m source.benchmarks.benchmark_obj
+"""
+import os
+import tempfile
+from timeit import Timer
+
+import numpy
+
+from source.mesh import parse_obj
+
+
+def write_grid(path, size):
+    """An OBJ file of a 'size' x 'size' grid of quads (2 * size^2 triangles), with shared vertices like a real mesh."""
+    points = numpy.stack(numpy.meshgrid(numpy.arange(size + 1), numpy.arange(size + 1)), axis=-1).reshape(-1, 2)
+    corner = numpy.arange(size * (size + 1)).reshape(size, size + 1)[:, :-1].ravel() + 1  # Top left of each quad.
+    quads  = numpy.stack((corner, corner + size + 1, corner + size + 2, corner + 1), axis=-1)
+    triangles = quads[:, [0, 1, 2, 0, 2, 3]].reshape(-1, 3)
+
+    with open(path, 'w') as file:
+        file.writelines('v {} {} 0.0\n'.format(x, y) for x, y in points)
+        file.writelines('vt {} {}\n'.format(x / size, y / size) for x, y in points)
+        file.write('vn 0.0 0.0 1.0\n')
+        file.writelines('f {0}/{0}/1 {1}/{1}/1 {2}/{2}/1\n'.format(*triangle) for triangle in triangles)
+
+
+def main():
+    folder = os.path.join(os.path.dirname(__file__), '..', '..', 'resources', 'models')
+    for name in sorted(os.listdir(folder)):
+        path = os.path.join(folder, name)
+        time = min(Timer(lambda: parse_obj(path)).repeat(repeat=5, number=10)) / 10
+        print('{:>16}: {:8.2f} ms'.format(name, time * 1000))
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'grid.obj')
+        write_grid(path, 500)
+        time = min(Timer(lambda: parse_obj(path)).repeat(repeat=3, number=1))
+        print('{:>16}: {:8.2f} ms ({} triangles)'.format('grid', time * 1000, len(parse_obj(path).indices) // 3))
+
+
+if __name__ == '__main__':
+    main()
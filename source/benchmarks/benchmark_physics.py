@@ -0,0 +1,44 @@
+"""
+Time of one physics step for 100k moving bodies.
+
+Run from the repository root with:
+    python -m source.benchmarks.benchmark_physics
+"""
+from timeit import Timer
+
+import numpy
+
+from source.entity import World, Transform, Physics
+from source.physics import integrate
+
+
+def create_world(count, max_speed):
+    random = numpy.random.RandomState(0)
+    world = World()
+
+    transforms = numpy.zeros(count, dtype=Transform.dtype)
+    transforms['location'] = random.uniform(-100, 100, size=(count, 3))
+    transforms['scale'] = 1
+    physics = numpy.zeros(count, dtype=Physics.dtype)
+    physics['velocity'] = random.uniform(-10, 10, size=(count, 3))
+    physics['acceleration'] = random.uniform(-1, 1, size=(count, 3))
+    physics['max_speed'] = max_speed
+
+    entities = [world.create_entity() for _ in range(count)]
+    world.add_component_columns(entities, {Transform: transforms, Physics: physics})
+    return world
+
+
+def main():
+    # Speeds are up to 17, so with a max speed of 10 about half of the bodies are clamped every step, and with 15 a few.
+    for max_speed, description in ((100, 'none clamped'), (15, 'few clamped'), (10, 'half clamped')):
+        for count in (1000, 10000, 100000):
+            world = create_world(count, max_speed)
+            timer = Timer(lambda: integrate(world, 1 / 120))
+            number, _ = timer.autorange()
+            best = min(timer.repeat(repeat=5, number=number)) / number
+            print('{:>8} bodies ({}): {:.3f} ms per step'.format(count, description, best * 1000))
+
+
+if __name__ == '__main__':
+    main()
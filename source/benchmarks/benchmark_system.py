@@ -0,0 +1,98 @@
+"""
+Serial against parallel execution of the systems of a synthetic 200k entity world.
+
+Run from the repository root with:
+    python -m source.benchmarks.benchmark_system
+"""
+from os import cpu_count
+from time import perf_counter
+
+import numpy
+
+from source.entity import World, Transform, Physics, PointLight, Collidable, component_elements
+from source.system import Scheduler
+
+
+def create_world(moving=150000, lights=50000):
+    random = numpy.random.RandomState(0)
+    world = World()
+
+    entities = [world.create_entity() for _ in range(moving)]
+    transforms = numpy.zeros(moving, dtype=Transform.dtype)
+    transforms['location'] = random.uniform(-100, 100, size=(moving, 3))
+    transforms['scale'] = 1
+    physics = numpy.zeros(moving, dtype=Physics.dtype)
+    physics['acceleration'] = random.uniform(-1, 1, size=(moving, 3))
+    physics['max_speed'] = 5
+    collidables = numpy.repeat(component_elements(Collidable, [Collidable(hitbox=(0.5, 0.5, 0.5))]), moving)
+    world.add_component_columns(entities, {Transform: transforms, Physics: physics, Collidable: collidables})
+
+    entities = [world.create_entity() for _ in range(lights)]
+    transforms = numpy.zeros(lights, dtype=Transform.dtype)
+    transforms['location'] = random.uniform(-100, 100, size=(lights, 3))
+    transforms['scale'] = 1
+    point_lights = numpy.zeros(lights, dtype=PointLight.dtype)
+    point_lights['color'] = random.uniform(0, 1, size=(lights, 3))
+    point_lights['attenuation'] = (1.0, 0.009, 0.032)
+    world.add_component_columns(entities, {Transform: transforms, PointLight: point_lights})
+
+    return world
+
+
+def accelerate(world, commands, dt):
+    for physics, in world.get_component_arrays_of(Physics):
+        velocity = physics['velocity']
+        velocity += physics['acceleration'] * dt
+        speed = numpy.sqrt(numpy.sum(numpy.square(velocity), axis=1))
+        factor = numpy.minimum(1, physics['max_speed'] / numpy.maximum(speed, 1e-6))
+        velocity *= factor[:, numpy.newaxis]
+
+
+def move(world, commands, dt):
+    for transforms, physics in world.get_component_arrays_of(Transform, Physics):
+        transforms['location'] += physics['velocity'] * dt
+
+
+def pack_lights(world, commands, dt):
+    for transforms, lights in world.get_component_arrays_of(Transform, PointLight):
+        numpy.concatenate((transforms['location'], lights['color'], lights['attenuation']), axis=1)
+
+
+def cull(world, commands, dt):
+    planes = numpy.random.RandomState(1).uniform(-1, 1, size=(6, 4)).astype(numpy.float32)
+    for transforms, collidables in world.get_component_arrays_of(Transform, Collidable):
+        radii = numpy.sqrt(numpy.sum(numpy.square(collidables['hitbox'] * transforms['scale']), axis=1))
+        distances = transforms['location'] @ planes[:, :3].T + planes[:, 3]
+        numpy.count_nonzero(numpy.all(distances >= -radii[:, numpy.newaxis], axis=1))
+
+
+def best_time(function, repeat=20):
+    times = []
+    for _ in range(repeat):
+        start = perf_counter()
+        function()
+        times.append(perf_counter() - start)
+    return min(times)
+
+
+def main():
+    world = create_world()
+    scheduler = Scheduler(world)
+    scheduler.add_system(accelerate,  reads=[],                       writes=[Physics])
+    scheduler.add_system(pack_lights, reads=[Transform, PointLight])
+    scheduler.add_system(cull,        reads=[Transform, Collidable])
+    scheduler.add_system(move,        reads=[Physics],                writes=[Transform])
+
+    print('Stages:', scheduler.stages)
+    print('CPUs:  ', cpu_count())
+
+    serial   = best_time(lambda: scheduler.run_serial(1 / 60))
+    parallel = best_time(lambda: scheduler.run(1 / 60))
+    scheduler.shutdown()
+
+    print('Serial:   {:.2f} ms'.format(serial * 1000))
+    print('Parallel: {:.2f} ms ({:.2f}x)'.format(parallel * 1000, serial / parallel))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+"""
+Time to upload 10M floats to a vertex buffer from a numpy array (passed to OpenGL without copying), from a list, and
+by building a ctypes array of the list like 'VBO.create' used to.
+
+Needs an OpenGL context (a hidden window is created). Run from the repository root with:
+    python -m source.benchmarks.benchmark_upload
+"""
+from timeit import Timer
+
+import numpy
+import pyglet
+from pyglet.gl import glBufferData, glDeleteBuffers, glFinish, GL_ARRAY_BUFFER, GL_STATIC_DRAW, GLfloat
+
+from source.c_bindings import sizeof
+from source.gl_state import gl_state
+from source.model import VBO
+
+
+def main():
+    window = pyglet.window.Window(visible=False)
+    count = 10 ** 7
+    array = numpy.random.RandomState(0).uniform(-1, 1, size=count).astype(numpy.float32)
+    data  = array.tolist()
+
+    def upload(data):
+        vbo = VBO.create(data, dimension=3)
+        glFinish()
+        glDeleteBuffers(1, vbo.id)
+
+    def ctypes_array():  # How 'VBO.create' uploaded before.
+        vbo = VBO.create([], dimension=3)
+        gl_state.bind_buffer(GL_ARRAY_BUFFER, vbo.id)
+        glBufferData(GL_ARRAY_BUFFER, len(data) * sizeof(GLfloat), (GLfloat * len(data))(*data), GL_STATIC_DRAW)
+        glFinish()
+        glDeleteBuffers(1, vbo.id)
+
+    benchmarks = (
+        ('numpy array', lambda: upload(array)), ('list', lambda: upload(data)), ('ctypes array of list', ctypes_array)
+    )
+    for name, function in benchmarks:
+        time = min(Timer(function).repeat(repeat=3, number=1))
+        print('{:>22}: {:8.1f} ms'.format(name, time * 1000))
+
+    window.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,458 @@
+from math import inf
+
+import numpy
+
+
+class AABBTree:
+    """
+    Dynamic bounding volume hierarchy of axis aligned boxes (like Box2D's dynamic tree, but in 3D).
+
+    Every leaf is a proxy for one object (e.g. an entity) with a user specified 'data'. Leaves store a fattened box,
+    so objects can move a little without the tree being changed. The tree is kept balanced with rotations, so
+    queries and ray casts visit O(log n) nodes for small query volumes.
+
+    Nodes are stored in parallel lists (indexed by node), as that's much faster than NumPy for scalar access.
+    """
+
+    NULL = -1
+
+    def __init__(self, margin=0.1):
+        self.margin = margin  # How much leaf boxes are fattened in each direction.
+        self.root = AABBTree.NULL
+
+        self.minimums = []  # Fattened box of each node.
+        self.maximums = []
+        self.parent   = []
+        self.left     = []  # NULL for leaves.
+        self.right    = []
+        self.height   = []  # 0 for leaves, -1 for free nodes.
+        self.data     = []
+        self.exact_minimums = []  # Actual box of the object of each leaf.
+        self.exact_maximums = []
+
+        self.free = []
+        self.count = 0  # Number of proxies.
+
+    def __len__(self):
+        return self.count
+
+    @classmethod
+    def create(cls, minimums, maximums, data=None, margin=0.1):
+        """
+        Builds a tree of many boxes (given as (N, 3) arrays) at once, by recursively splitting them in half along the
+        longest axis of their centers. This is much faster than inserting them one by one, and gives a balanced tree.
+        The data of each box defaults to its index. Returns the tree and the proxy of each box.
+        """
+        tree = cls(margin)
+        minimums = numpy.asarray(minimums, dtype=numpy.float64).reshape(-1, 3)
+        maximums = numpy.asarray(maximums, dtype=numpy.float64).reshape(-1, 3)
+        count = len(minimums)
+        if count == 0:
+            return tree, []
+
+        # The leaves are the first nodes, so the proxy of each box is its index.
+        tree.exact_minimums = list(map(tuple, minimums.tolist()))
+        tree.exact_maximums = list(map(tuple, maximums.tolist()))
+        tree.minimums = list(map(tuple, (minimums - margin).tolist()))
+        tree.maximums = list(map(tuple, (maximums + margin).tolist()))
+        tree.parent = [AABBTree.NULL] * count
+        tree.left   = [AABBTree.NULL] * count
+        tree.right  = [AABBTree.NULL] * count
+        tree.height = [0] * count
+        tree.data   = list(range(count)) if data is None else list(data)
+        assert len(tree.data) == count, "Got {} data for {} boxes!".format(len(tree.data), count)
+        tree.count  = count
+
+        centers = minimums + maximums
+
+        def build(indices):
+            if len(indices) == 1:
+                return int(indices[0])
+            half = len(indices) // 2
+            points = centers[indices]
+            axis = numpy.argmax(points.max(axis=0) - points.min(axis=0))
+            indices = indices[numpy.argpartition(points[:, axis], half)]
+
+            node = tree._allocate_node()
+            tree.left[node], tree.right[node] = build(indices[:half]), build(indices[half:])
+            tree.parent[tree.left[node]] = tree.parent[tree.right[node]] = node
+            tree._fit(node)
+            return node
+
+        tree.root = build(numpy.arange(count))
+        return tree, list(range(count))
+
+    # ---- Proxies ----
+
+    def insert(self, minimum, maximum, data=None):
+        """Inserts an object with the box (minimum, maximum). Returns the proxy id."""
+        leaf = self._allocate_node()
+        self._set_leaf_box(leaf, minimum, maximum)
+        self.data[leaf] = data
+        self.height[leaf] = 0
+        self._insert_leaf(leaf)
+        self.count += 1
+        return leaf
+
+    def remove(self, proxy):
+        assert self._is_proxy(proxy), "Invalid proxy {}!".format(proxy)
+        self._remove_leaf(proxy)
+        self._free_node(proxy)
+        self.count -= 1
+
+    def refit(self, proxy, minimum, maximum):
+        """
+        Updates the box of a proxy. The tree is only changed if the box has moved out of the fattened box. Returns True
+        if the tree was changed.
+        """
+        assert self._is_proxy(proxy), "Invalid proxy {}!".format(proxy)
+        minimum, maximum = _floats(minimum), _floats(maximum)
+        self.exact_minimums[proxy] = minimum
+        self.exact_maximums[proxy] = maximum
+
+        fat_minimum, fat_maximum = self.minimums[proxy], self.maximums[proxy]
+        if all(fat_minimum[i] <= minimum[i] and maximum[i] <= fat_maximum[i] for i in range(3)):
+            return False
+
+        self._remove_leaf(proxy)
+        self._set_leaf_box(proxy, minimum, maximum)
+        self._insert_leaf(proxy)
+        return True
+
+    def get_data(self, proxy):
+        return self.data[proxy]
+
+    def get_box(self, proxy):
+        return self.exact_minimums[proxy], self.exact_maximums[proxy]
+
+    # ---- Queries ----
+
+    def query_aabb(self, minimum, maximum):
+        """Data of all objects whose box overlaps (minimum, maximum)."""
+        result = []
+        if self.root == AABBTree.NULL:
+            return result
+
+        min_x, min_y, min_z = _floats(minimum)
+        max_x, max_y, max_z = _floats(maximum)
+        minimums, maximums, left, right = self.minimums, self.maximums, self.left, self.right
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            a, b = minimums[node], maximums[node]
+            if a[0] > max_x or a[1] > max_y or a[2] > max_z or b[0] < min_x or b[1] < min_y or b[2] < min_z:
+                continue
+            if left[node] == AABBTree.NULL:
+                a, b = self.exact_minimums[node], self.exact_maximums[node]
+                if not (a[0] > max_x or a[1] > max_y or a[2] > max_z or b[0] < min_x or b[1] < min_y or b[2] < min_z):
+                    result.append(self.data[node])
+            else:
+                stack.append(left[node])
+                stack.append(right[node])
+        return result
+
+    def query_frustum(self, planes):
+        """
+        Data of all objects whose box is (at least partially) inside all planes. A plane (a, b, c, d) has the points
+        where 'a*x + b*y + c*z + d >= 0' inside (see 'linear_algebra.frustum_planes').
+        """
+        result = []
+        if self.root == AABBTree.NULL:
+            return result
+
+        planes = [_floats(plane) for plane in planes]
+        minimums, maximums, left, right = self.minimums, self.maximums, self.left, self.right
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            is_leaf = left[node] == AABBTree.NULL
+            if is_leaf:
+                a, b = self.exact_minimums[node], self.exact_maximums[node]
+            else:
+                a, b = minimums[node], maximums[node]
+
+            # The box is outside if its corner furthest along the plane's normal is outside.
+            for x, y, z, d in planes:
+                if (x * (b[0] if x > 0 else a[0]) + y * (b[1] if y > 0 else a[1]) + z * (b[2] if z > 0 else a[2])
+                        + d < 0):
+                    break
+            else:
+                if is_leaf:
+                    result.append(self.data[node])
+                else:
+                    stack.append(left[node])
+                    stack.append(right[node])
+        return result
+
+    def ray_cast(self, origin, direction, max_distance=inf):
+        """
+        The closest object hit by the ray, as the tuple (data, distance), or None if nothing is hit. The distance is in
+        units of 'direction' (i.e. the hit point is 'origin + distance * direction').
+        """
+        if self.root == AABBTree.NULL:
+            return None
+
+        ox, oy, oz = origin = _floats(origin)
+        ix, iy, iz = inverse = _inverse(direction)
+        best_data, best_distance, hit = None, max_distance, False
+
+        # The slab test is inlined, as a function call per node costs more than the test. The side of the box the ray
+        # enters through is the same for every box, so it's picked once per axis.
+        minimums, maximums, left, right = self.minimums, self.maximums, self.left, self.right
+        near_x, far_x = (minimums, maximums) if ix >= 0 else (maximums, minimums)
+        near_y, far_y = (minimums, maximums) if iy >= 0 else (maximums, minimums)
+        near_z, far_z = (minimums, maximums) if iz >= 0 else (maximums, minimums)
+
+        # Nodes, and the distance to where the ray enters them, in parallel stacks.
+        nodes, entries = [self.root], [0.0]
+        while nodes:
+            node, entry_distance = nodes.pop(), entries.pop()
+            if entry_distance >= best_distance:  # Something closer was hit after the node was pushed.
+                continue
+            a = left[node]
+            if a == AABBTree.NULL:
+                distance = _ray_box_distance(origin, inverse, self.exact_minimums[node], self.exact_maximums[node])
+                if distance is not None and distance < best_distance:
+                    best_data, best_distance, hit = self.data[node], distance, True
+                continue
+
+            # Visit the closest child first, so the best distance shrinks quickly and prunes the other child.
+            b = right[node]
+            near_a = max((near_x[a][0] - ox) * ix, (near_y[a][1] - oy) * iy, (near_z[a][2] - oz) * iz, 0.0)
+            far_a  = min((far_x[a][0] - ox) * ix, (far_y[a][1] - oy) * iy, (far_z[a][2] - oz) * iz, best_distance)
+            near_b = max((near_x[b][0] - ox) * ix, (near_y[b][1] - oy) * iy, (near_z[b][2] - oz) * iz, 0.0)
+            far_b  = min((far_x[b][0] - ox) * ix, (far_y[b][1] - oy) * iy, (far_z[b][2] - oz) * iz, best_distance)
+            if near_a > far_a:
+                if near_b <= far_b:
+                    nodes.append(b)
+                    entries.append(near_b)
+            elif near_b > far_b:
+                nodes.append(a)
+                entries.append(near_a)
+            elif near_a < near_b:
+                nodes += (b, a)
+                entries += (near_b, near_a)
+            else:
+                nodes += (a, b)
+                entries += (near_a, near_b)
+
+        return (best_data, best_distance) if hit else None
+
+    # ---- Tree structure ----
+
+    def _is_proxy(self, node):
+        return 0 <= node < len(self.height) and self.height[node] == 0
+
+    def _allocate_node(self):
+        if self.free:
+            node = self.free.pop()
+        else:
+            node = len(self.height)
+            for array in (self.minimums, self.maximums, self.exact_minimums, self.exact_maximums, self.data):
+                array.append(None)
+            for array in (self.parent, self.left, self.right, self.height):
+                array.append(AABBTree.NULL)
+        self.parent[node] = self.left[node] = self.right[node] = AABBTree.NULL
+        self.height[node] = 0
+        return node
+
+    def _free_node(self, node):
+        self.height[node] = -1
+        self.data[node] = self.exact_minimums[node] = self.exact_maximums[node] = None
+        self.free.append(node)
+
+    def _set_leaf_box(self, leaf, minimum, maximum):
+        margin = self.margin
+        minimum, maximum = _floats(minimum), _floats(maximum)
+        self.exact_minimums[leaf] = minimum
+        self.exact_maximums[leaf] = maximum
+        self.minimums[leaf] = tuple(value - margin for value in minimum)
+        self.maximums[leaf] = tuple(value + margin for value in maximum)
+
+    def _fit(self, node):
+        left, right = self.left[node], self.right[node]
+        self.minimums[node] = tuple(map(min, self.minimums[left], self.minimums[right]))
+        self.maximums[node] = tuple(map(max, self.maximums[left], self.maximums[right]))
+        self.height[node] = 1 + max(self.height[left], self.height[right])
+
+    def _insert_leaf(self, leaf):
+        if self.root == AABBTree.NULL:
+            self.root = leaf
+            self.parent[leaf] = AABBTree.NULL
+            return
+
+        # Find the best sibling by descending the tree, using the surface area heuristic.
+        leaf_minimum, leaf_maximum = self.minimums[leaf], self.maximums[leaf]
+        node = self.root
+        while self.left[node] != AABBTree.NULL:
+            left, right = self.left[node], self.right[node]
+
+            area = _area(self.minimums[node], self.maximums[node])
+            combined_area = _union_area(self.minimums[node], self.maximums[node], leaf_minimum, leaf_maximum)
+
+            # Cost of creating a new parent for this node and the new leaf, and the cost of pushing the leaf further
+            # down the tree (which grows all the boxes on the way).
+            cost = 2 * combined_area
+            inheritance_cost = 2 * (combined_area - area)
+
+            def descend_cost(child):
+                child_area = _union_area(self.minimums[child], self.maximums[child], leaf_minimum, leaf_maximum)
+                if self.left[child] != AABBTree.NULL:
+                    child_area -= _area(self.minimums[child], self.maximums[child])
+                return child_area + inheritance_cost
+
+            left_cost, right_cost = descend_cost(left), descend_cost(right)
+            if cost < left_cost and cost < right_cost:
+                break
+            node = left if left_cost < right_cost else right
+
+        # Create a new parent for the sibling and the leaf.
+        sibling = node
+        old_parent = self.parent[sibling]
+        new_parent = self._allocate_node()
+        self.parent[new_parent] = old_parent
+        self.data[new_parent] = None
+        self.left[new_parent], self.right[new_parent] = sibling, leaf
+        self.parent[sibling] = self.parent[leaf] = new_parent
+        self._fit(new_parent)
+
+        if old_parent == AABBTree.NULL:
+            self.root = new_parent
+        elif self.left[old_parent] == sibling:
+            self.left[old_parent] = new_parent
+        else:
+            self.right[old_parent] = new_parent
+
+        self._rebalance_upwards(self.parent[leaf])
+
+    def _remove_leaf(self, leaf):
+        if leaf == self.root:
+            self.root = AABBTree.NULL
+            return
+
+        parent = self.parent[leaf]
+        grandparent = self.parent[parent]
+        sibling = self.right[parent] if self.left[parent] == leaf else self.left[parent]
+
+        if grandparent == AABBTree.NULL:
+            self.root = sibling
+            self.parent[sibling] = AABBTree.NULL
+        else:
+            if self.left[grandparent] == parent:
+                self.left[grandparent] = sibling
+            else:
+                self.right[grandparent] = sibling
+            self.parent[sibling] = grandparent
+            self._rebalance_upwards(grandparent)
+
+        self._free_node(parent)
+        self.parent[leaf] = AABBTree.NULL
+
+    def _rebalance_upwards(self, node):
+        while node != AABBTree.NULL:
+            node = self._balance(node)
+            self._fit(node)
+            node = self.parent[node]
+
+    def _balance(self, a):
+        """Rotates 'a' if its children's heights differ by more than one. Returns the new root of the subtree."""
+        if self.left[a] == AABBTree.NULL or self.height[a] < 2:
+            return a
+
+        b, c = self.left[a], self.right[a]
+        balance = self.height[c] - self.height[b]
+        if balance > 1:
+            return self._rotate(a, c, c_is_right=True)
+        if balance < -1:
+            return self._rotate(a, b, c_is_right=False)
+        return a
+
+    def _rotate(self, a, c, c_is_right):
+        """Promotes 'c' (the higher child of 'a'), and moves the lower of c's children down to 'a'."""
+        f, g = self.left[c], self.right[c]
+
+        # Swap a and c.
+        self.left[c] = a
+        self.parent[c] = self.parent[a]
+        self.parent[a] = c
+
+        if self.parent[c] == AABBTree.NULL:
+            self.root = c
+        elif self.left[self.parent[c]] == a:
+            self.left[self.parent[c]] = c
+        else:
+            self.right[self.parent[c]] = c
+
+        # Keep the higher of c's children in c, and give the other to a.
+        if self.height[f] > self.height[g]:
+            higher, lower = f, g
+        else:
+            higher, lower = g, f
+
+        self.right[c] = higher
+        if c_is_right:
+            self.right[a] = lower
+        else:
+            self.left[a] = lower
+        self.parent[lower] = a
+
+        self._fit(a)
+        self._fit(c)
+        return c
+
+    def validate(self):
+        """Asserts that the structure and boxes of the tree are consistent. For testing."""
+        def validate_node(node, parent):
+            assert self.parent[node] == parent, "Wrong parent of {}!".format(node)
+            if self.left[node] == AABBTree.NULL:
+                assert self.height[node] == 0
+                return 1
+            left, right = self.left[node], self.right[node]
+            assert self.height[node] == 1 + max(self.height[left], self.height[right])
+            for child in (left, right):
+                assert all(self.minimums[node][i] <= self.minimums[child][i] for i in range(3))
+                assert all(self.maximums[node][i] >= self.maximums[child][i] for i in range(3))
+            return validate_node(left, node) + validate_node(right, node)
+
+        leaves = validate_node(self.root, AABBTree.NULL) if self.root != AABBTree.NULL else 0
+        assert leaves == self.count, "Tree has {} leaves, but {} proxies!".format(leaves, self.count)
+
+
+def _floats(values):
+    """Converts e.g. NumPy arrays to a tuple of Python floats, as arithmetic on NumPy scalars is much slower."""
+    return tuple(float(value) for value in values)
+
+
+def _area(minimum, maximum):
+    x, y, z = maximum[0] - minimum[0], maximum[1] - minimum[1], maximum[2] - minimum[2]
+    return 2 * (x * y + y * z + z * x)
+
+
+def _union_area(minimum_a, maximum_a, minimum_b, maximum_b):
+    x = max(maximum_a[0], maximum_b[0]) - min(minimum_a[0], minimum_b[0])
+    y = max(maximum_a[1], maximum_b[1]) - min(minimum_a[1], minimum_b[1])
+    z = max(maximum_a[2], maximum_b[2]) - min(minimum_a[2], minimum_b[2])
+    return 2 * (x * y + y * z + z * x)
+
+
+def _inverse(direction):
+    """
+    Inverse of each component of a ray's direction. Components of 0 become a huge number instead of infinity, so the
+    slab test gives infinite distances (or 0 on the slab's boundary) instead of NaN for rays parallel to a slab.
+    """
+    return tuple(1 / value if abs(value) > 1e-300 else 1e300 for value in _floats(direction))
+
+
+def _ray_box_distance(origin, inverse_direction, minimum, maximum):
+    """Distance along the ray to where it enters the box (0 if it starts inside), or None if it misses."""
+    near, far = 0.0, inf
+    for i in range(3):
+        t1 = (minimum[i] - origin[i]) * inverse_direction[i]
+        t2 = (maximum[i] - origin[i]) * inverse_direction[i]
+        if t1 > t2:
+            t1, t2 = t2, t1
+        near = max(near, t1)
+        far  = min(far, t2)
+        if near > far:
+            return None
+    return near
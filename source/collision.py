@@ -0,0 +1,232 @@
+import numpy
+
+from source.entity import Transform, Collidable
+
+
+class SpatialHash:
+    """
+    Uniform grid broadphase for axis aligned boxes. Each box is put in the cell of its center, and the cells are at
+    least as big as the boxes in the grid, so overlapping boxes are always in the same or neighbouring cells. Only boxes
+    in neighbouring cells are tested against each other.
+
+    The cells are sized for the typical box, not the biggest, as one big collider would otherwise put everything in a
+    few cells and make the test quadratic. Boxes bigger than a cell aren't put in the grid, but tested against the
+    boxes in all cells they overlap, and against each other with a coarser SpatialHash of their own.
+
+    The grid is stored as NumPy arrays sorted by cell, and is rebuilt with 'build' every frame (which is cheap
+    compared to keeping it updated for moving boxes).
+    """
+
+    # Half of the 26 neighbours (plus the cell itself), so every pair of neighbouring cells is visited once.
+    NEIGHBOURS = [
+        (x, y, z) for z in (-1, 0, 1) for y in (-1, 0, 1) for x in (-1, 0, 1) if (z, y, x) > (0, 0, 0)
+    ]
+
+    MAX_DENSE_CELLS_PER_BOX = 16
+    MAX_CELLS_PER_AXIS = 2 ** 20  # So the cell keys can't overflow, even for tiny cells or point colliders.
+
+    def __init__(self, cell_size=None):
+        self.cell_size = cell_size  # By default the biggest box that's at most twice the median box size.
+        self.grid_cell_size = 0.0   # Cell size of the last 'build'.
+        self.minimums = numpy.empty((0, 3), dtype=numpy.float32)
+        self.maximums = numpy.empty((0, 3), dtype=numpy.float32)
+        self.boxes = numpy.empty(0, dtype=numpy.int64)        # All boxes in the grid, sorted by cell.
+        self.cell_keys   = numpy.empty(0, dtype=numpy.int64)  # Key of every non-empty cell, sorted.
+        self.cell_starts = numpy.empty(0, dtype=numpy.int64)  # Index in 'boxes' of the first box of each cell.
+        self.cell_ends   = numpy.empty(0, dtype=numpy.int64)
+        self.grid_origin = numpy.zeros(3, dtype=numpy.float32)  # Minimum corner of the cell with key 0.
+        self.grid_size   = numpy.zeros(3, dtype=numpy.int64)
+        self.key_strides = (0, 0, 0)
+        self.cell_lookup = None  # Dense table from key to cell index (or -1), if the grid is small enough.
+        self.oversized = numpy.empty(0, dtype=numpy.int64)  # Boxes bigger than a cell.
+        self.coarse = None  # SpatialHash of the oversized boxes.
+
+    def build(self, minimums, maximums):
+        """Builds the grid from boxes given as (N, 3) arrays of minimum and maximum corners."""
+        self.minimums = minimums = numpy.asarray(minimums, dtype=numpy.float32).reshape(-1, 3)
+        self.maximums = maximums = numpy.asarray(maximums, dtype=numpy.float32).reshape(-1, 3)
+
+        extents = maximums - minimums
+        sizes = numpy.maximum(numpy.maximum(extents[:, 0], extents[:, 1]), extents[:, 2])
+        cell_size = self.cell_size
+        if cell_size is None:
+            # The biggest box that's at most twice the median, so only the outliers are oversized. The median of a
+            # sample of the boxes is close enough, and much faster for many boxes.
+            median = numpy.median(sizes[::len(sizes) // 1024 + 1]) if len(sizes) else 0.0
+            typical = sizes[sizes <= 2 * median]
+            cell_size = float(typical.max()) if len(typical) else 0.0
+        if len(sizes):
+            # Reducing each column separately, as reducing along axis 0 is slow for short rows.
+            extent = max(float(maximums[:, axis].max() - minimums[:, axis].min()) for axis in range(3))
+            cell_size = max(cell_size, extent / SpatialHash.MAX_CELLS_PER_AXIS)
+        self.grid_cell_size = cell_size = max(cell_size, 1e-6)
+
+        fits = sizes <= cell_size
+        self.oversized = numpy.flatnonzero(~fits)
+        self.coarse = None
+        if len(self.oversized) > 1:
+            self.coarse = SpatialHash()
+            self.coarse.build(minimums[self.oversized], maximums[self.oversized])
+        self._build_grid(numpy.flatnonzero(fits), cell_size)
+
+    def _build_grid(self, boxes, cell_size):
+        if len(boxes) == 0:
+            self.boxes = self.cell_keys = self.cell_starts = self.cell_ends = numpy.empty(0, dtype=numpy.int64)
+            self.cell_lookup = None
+            return
+
+        if len(boxes) == len(self.minimums):  # The common case, so the boxes aren't copied.
+            boxes, minimums, maximums = None, self.minimums, self.maximums
+        else:
+            minimums, maximums = self.minimums[boxes], self.maximums[boxes]
+        centers = (minimums + maximums) * numpy.float32(0.5)
+
+        # Cells are counted from the lowest center, so far away boxes don't overflow the cell coordinates. Packs them
+        # into one integer key, with a margin of one cell so neighbours never wrap around. Reducing each column
+        # separately, as reducing along axis 0 is slow for short rows.
+        lowest = numpy.array([centers[:, axis].min() for axis in range(3)], dtype=numpy.float32)
+        self.grid_origin = lowest - numpy.float32(cell_size)
+        cells = numpy.floor((centers - lowest) / numpy.float32(cell_size)).astype(numpy.int64) + 1
+        self.grid_size = size = numpy.array([cells[:, axis].max() for axis in range(3)]) + 2
+        self.key_strides = (1, int(size[0]), int(size[0] * size[1]))
+        keys = cells @ numpy.array(self.key_strides, dtype=numpy.int64)
+
+        order = numpy.argsort(keys)
+        self.boxes = order if boxes is None else boxes[order]
+        sorted_keys = keys[order]
+        self.cell_starts = numpy.flatnonzero(numpy.diff(sorted_keys, prepend=-1))
+        self.cell_ends   = numpy.append(self.cell_starts[1:], len(sorted_keys))
+        self.cell_keys   = sorted_keys[self.cell_starts]
+
+        # Finding neighbours by indexing a dense table is much faster than searching, if the grid isn't too sparse.
+        volume = int(size.prod())
+        if volume <= SpatialHash.MAX_DENSE_CELLS_PER_BOX * len(order):
+            self.cell_lookup = numpy.full(volume, -1, dtype=numpy.int32)
+            self.cell_lookup[self.cell_keys] = numpy.arange(len(self.cell_keys))
+        else:
+            self.cell_lookup = None
+
+    def _find_cells(self, keys):
+        """Index of the cell of each key, or -1 if the cell is empty."""
+        if self.cell_lookup is not None:
+            return self.cell_lookup[keys]
+        cells = numpy.minimum(numpy.searchsorted(self.cell_keys, keys), len(self.cell_keys) - 1)
+        return numpy.where(self.cell_keys[cells] == keys, cells, -1)
+
+    def candidate_pairs(self):
+        """All pairs (i, j), where i < j, of boxes in neighbouring cells, as an (M, 2) array."""
+        first, second = zip(self._grid_pairs(), self._oversized_pairs())
+        if self.coarse is not None:
+            coarse_pairs = self.oversized[self.coarse.candidate_pairs()]
+            first, second = first + (coarse_pairs[:, 0],), second + (coarse_pairs[:, 1],)
+
+        first, second = numpy.concatenate(first), numpy.concatenate(second)
+        return numpy.stack((numpy.minimum(first, second), numpy.maximum(first, second)), axis=1)
+
+    def _grid_pairs(self):
+        """Pairs of boxes in the grid that are in neighbouring cells."""
+        if len(self.boxes) == 0:
+            return numpy.empty(0, dtype=numpy.int64), numpy.empty(0, dtype=numpy.int64)
+
+        cell_sizes = self.cell_ends - self.cell_starts
+
+        # Pairs within the same cell: every box with the boxes after it.
+        crowded = numpy.flatnonzero(cell_sizes > 1)
+        positions = numpy.repeat(self.cell_starts[crowded], cell_sizes[crowded]) + _ranges(cell_sizes[crowded])
+        partners = numpy.repeat(self.cell_ends[crowded], cell_sizes[crowded]) - positions - 1
+        first = numpy.repeat(positions, partners)
+        second = first + 1 + _ranges(partners)
+
+        # Pairs between neighbouring cells: every box of a cell with every box of the neighbour.
+        offsets = numpy.array(SpatialHash.NEIGHBOURS, dtype=numpy.int64) @ numpy.array(self.key_strides)
+        neighbours = self._find_cells((self.cell_keys + offsets[:, numpy.newaxis]).ravel())
+        found = neighbours >= 0
+        cells = numpy.tile(numpy.arange(len(self.cell_keys)), len(offsets))[found]
+        neighbours = neighbours[found]
+
+        counts = cell_sizes[cells] * cell_sizes[neighbours]
+        cells, neighbours, pair_indices = numpy.repeat(cells, counts), numpy.repeat(neighbours, counts), _ranges(counts)
+        neighbour_sizes = cell_sizes[neighbours]
+        first  = numpy.concatenate((first,  self.cell_starts[cells] + pair_indices // neighbour_sizes))
+        second = numpy.concatenate((second, self.cell_starts[neighbours] + pair_indices % neighbour_sizes))
+        return self.boxes[first], self.boxes[second]
+
+    def _oversized_pairs(self):
+        """
+        Pairs of each oversized box with the boxes in the grid that are in the cells it overlaps, or in the cells next
+        to them (as the center of an overlapping box can be half a cell outside). Oversized boxes that cover more cells
+        than there are boxes in the grid are paired with all of them instead.
+        """
+        if len(self.oversized) == 0 or len(self.boxes) == 0:
+            return numpy.empty(0, dtype=numpy.int64), numpy.empty(0, dtype=numpy.int64)
+
+        # Ranges of cells, clamped to the grid as there are no boxes outside of it (before converting to integers, so
+        # boxes far outside of the grid don't overflow).
+        last  = self.grid_size - 1
+        lows  = numpy.floor((self.minimums[self.oversized] - self.grid_origin) / self.grid_cell_size) - 1
+        highs = numpy.floor((self.maximums[self.oversized] - self.grid_origin) / self.grid_cell_size) + 1
+        lows  = numpy.clip(lows, 0, last + 1).astype(numpy.int64)
+        highs = numpy.clip(highs, -1, last).astype(numpy.int64)
+        extents = numpy.maximum(highs - lows + 1, 0)
+        counts = extents[:, 0] * extents[:, 1] * extents[:, 2]
+
+        ranged = counts <= len(self.boxes)
+        owners = numpy.repeat(numpy.flatnonzero(ranged), counts[ranged])
+        indices = _ranges(counts[ranged])
+        sizes = extents[owners]
+        cells = lows[owners] + numpy.stack((
+            indices % sizes[:, 0], indices // sizes[:, 0] % sizes[:, 1], indices // (sizes[:, 0] * sizes[:, 1])
+        ), axis=1)
+        cells = self._find_cells(cells @ numpy.array(self.key_strides, dtype=numpy.int64))
+        found = cells >= 0
+        owners, cells = owners[found], cells[found]
+
+        cell_sizes = self.cell_ends[cells] - self.cell_starts[cells]
+        positions = numpy.repeat(self.cell_starts[cells], cell_sizes) + _ranges(cell_sizes)
+        everywhere = numpy.flatnonzero(~ranged)
+        first  = numpy.concatenate((numpy.repeat(owners, cell_sizes), numpy.repeat(everywhere, len(self.boxes))))
+        second = numpy.concatenate((self.boxes[positions], numpy.tile(self.boxes, len(everywhere))))
+        return self.oversized[first], second
+
+    def pairs(self):
+        """All pairs (i, j), where i < j, of overlapping boxes, as an (M, 2) array."""
+        pairs = self.candidate_pairs()
+        a, b = pairs[:, 0], pairs[:, 1]
+        overlapping = numpy.ones(len(pairs), dtype=bool)
+        for axis in range(3):
+            minimums, maximums = self.minimums[:, axis], self.maximums[:, axis]
+            overlapping &= (minimums[a] <= maximums[b]) & (minimums[b] <= maximums[a])
+        return pairs[overlapping]
+
+
+def _ranges(counts):
+    """Concatenation of 'arange(count)' for every count."""
+    return numpy.arange(counts.sum()) - numpy.repeat(numpy.cumsum(counts) - counts, counts)
+
+
+def collidable_boxes(world):
+    """
+    Entity ids and world space boxes (minimums, maximums) of all entities with Transform and Collidable. The hitbox is
+    scaled, but not rotated.
+    """
+    ids, minimums, maximums = [], [], []
+    for archetype in world.get_archetypes_of(Transform, Collidable):
+        if archetype.count == 0:
+            continue
+        transforms, collidables = archetype.arrays(Transform, Collidable)
+        half_extents = collidables['hitbox'] * numpy.abs(transforms['scale'])
+        ids.append(archetype.ids.view())
+        minimums.append(transforms['location'] - half_extents)
+        maximums.append(transforms['location'] + half_extents)
+
+    if not ids:
+        return numpy.empty(0, dtype=numpy.int64), numpy.empty((0, 3), numpy.float32), numpy.empty((0, 3), numpy.float32)
+    return numpy.concatenate(ids), numpy.concatenate(minimums), numpy.concatenate(maximums)
+
+
+def broadphase(world, spatial_hash=None):
+    """Pairs of entity ids, as an (M, 2) array, of all entities with Transform and Collidable whose boxes overlap."""
+    spatial_hash = spatial_hash or SpatialHash()
+    ids, minimums, maximums = collidable_boxes(world)
+    spatial_hash.build(minimums, maximums)
+    return ids[spatial_hash.pairs()]
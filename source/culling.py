@@ -0,0 +1,67 @@
+import numpy
+
+from source.linear_algebra import frustum_planes
+
+
+class FrustumCuller:
+    """
+    Tests instances of a model against the view frustum, using the model's bounding sphere (see 'model.Bounds'),
+    in one vectorized pass for all instances.
+
+    Counts the visible and culled instances since the last 'begin_frame', for instrumentation.
+    """
+
+    def __init__(self):
+        self.planes  = numpy.zeros((0, 4))
+        self.visible = 0
+        self.culled  = 0
+
+    def begin_frame(self, perspective, view):
+        """Updates the frustum and resets the counters. Must be called every frame before 'cull'."""
+        self.planes = frustum_planes(numpy.asarray(perspective, dtype=numpy.float64) @ view)
+        self.visible = 0
+        self.culled  = 0
+
+    def cull(self, matrices, bounds):
+        """
+        Indices of the visible instances, given the (N, 4, 4) transformation matrices of the instances and the bounds
+        of their model. If 'bounds' is None, all instances are visible.
+        """
+        matrices = numpy.asarray(matrices).reshape(-1, 4, 4)
+        if bounds is None:
+            visible = numpy.arange(len(matrices))
+        else:
+            centers, radii = bounding_spheres(matrices, bounds.center, bounds.radius)
+            visible = numpy.flatnonzero(spheres_in_frustum(self.planes, centers, radii))
+
+        self.visible += len(visible)
+        self.culled  += len(matrices) - len(visible)
+        return visible
+
+
+def bounding_spheres(matrices, center, radius):
+    """
+    World space bounding spheres (centers, radii) of instances with the (N, 4, 4) transformation 'matrices', of a
+    model with the bounding sphere (center, radius). The radius is scaled by the largest scale of each instance.
+    """
+    center  = numpy.array((*center, 1), dtype=matrices.dtype)
+    centers = numpy.einsum('nij,j->ni', matrices[:, :3, :], center)
+
+    # The scale along each axis is the length of the matrix's column for it. Working on the flattened rows, as
+    # reductions over short axes are slow.
+    squares = numpy.square(matrices.reshape(-1, 16)[:, :12])
+    squared_scales = squares[:, 0:3] + squares[:, 4:7] + squares[:, 8:11]
+    max_squared_scales = numpy.maximum(numpy.maximum(squared_scales[:, 0], squared_scales[:, 1]), squared_scales[:, 2])
+    return centers, radius * numpy.sqrt(max_squared_scales)
+
+
+def spheres_in_frustum(planes, centers, radii):
+    """Boolean array of which spheres are (at least partially) inside all planes (see 'frustum_planes')."""
+    centers = numpy.asarray(centers)
+    planes  = numpy.asarray(planes, dtype=centers.dtype)
+    distances = centers @ planes[:, :3].T + planes[:, 3]
+
+    inside = numpy.ones(len(centers), dtype=bool)
+    for i in range(len(planes)):
+        inside &= distances[:, i] >= -radii
+    return inside
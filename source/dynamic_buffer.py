@@ -0,0 +1,113 @@
+import numpy
+from pyglet.gl import (
+    glGenBuffers, glBufferData, glBufferSubData, GL_ARRAY_BUFFER, GL_DYNAMIC_DRAW, GL_STREAM_DRAW, GLuint
+)
+
+from source.gl_state import gl_state
+
+
+def as_bytes(data):
+    """'data' (a numpy array or other buffer protocol object) as a contiguous numpy array, copied only if needed."""
+    if isinstance(data, numpy.ndarray):
+        return numpy.ascontiguousarray(data)
+    return numpy.frombuffer(memoryview(data).cast('B'), dtype=numpy.uint8)
+
+
+class DynamicBuffer:
+    """
+    A buffer which content changes after it's created, either in ranges with 'update' or all at once with 'upload'.
+    It keeps its handle when it grows, so models and vertex array objects using it stay valid. It can be used as a
+    vertex buffer (see 'VBO') or as an index buffer (see 'IBO').
+    """
+
+    # Buffers are written while bound to GL_ARRAY_BUFFER whatever they're used as, since binding GL_ELEMENT_ARRAY_BUFFER
+    # would change the index buffer of the bound vertex array object.
+    TARGET = GL_ARRAY_BUFFER
+
+    @classmethod
+    def create(cls, capacity, draw_mode=GL_DYNAMIC_DRAW):
+        """An uninitialized buffer of 'capacity' bytes."""
+        handle = GLuint()
+        glGenBuffers(1, handle)
+        buffer = cls(handle, capacity, draw_mode)
+        buffer.orphan()
+        return buffer
+
+    def __init__(self, id_, capacity, draw_mode=GL_DYNAMIC_DRAW):
+        self.id = id_
+        self.capacity  = capacity  # Size in bytes.
+        self.draw_mode = draw_mode
+
+    def bind(self):
+        gl_state.bind_buffer(DynamicBuffer.TARGET, self.id)
+
+    def orphan(self, capacity=None):
+        """
+        Replaces the storage of the buffer with new, uninitialized storage (of 'capacity' bytes, if given). Draws
+        still reading the old storage keep it until they finish, so writing afterwards doesn't wait for them.
+        """
+        if capacity is not None:
+            self.capacity = capacity
+        self.bind()
+        glBufferData(DynamicBuffer.TARGET, self.capacity, None, self.draw_mode)
+
+    def update(self, data, offset=0):
+        """Writes 'data' (see 'as_bytes') at byte 'offset', keeping the rest of the buffer."""
+        data = as_bytes(data)
+        assert offset >= 0 and offset + data.nbytes <= self.capacity, \
+            "Can't write {} bytes at {} in a buffer of {} bytes!".format(data.nbytes, offset, self.capacity)
+
+        self.bind()
+        glBufferSubData(DynamicBuffer.TARGET, offset, data.nbytes, data.ctypes.data)
+
+    def upload(self, data):
+        """Replaces the whole content with 'data' (see 'as_bytes'), growing by doubling if it doesn't fit."""
+        data = as_bytes(data)
+        capacity = max(self.capacity, 1)
+        while capacity < data.nbytes:
+            capacity *= 2
+        self.orphan(capacity)
+        if data.nbytes > 0:
+            glBufferSubData(DynamicBuffer.TARGET, 0, data.nbytes, data.ctypes.data)
+
+
+class RingBuffer:
+    """
+    Allocator for transient data (e.g. text, debug lines or particles) that's written once and drawn the same frame.
+    Allocations are placed one after the other in a 'DynamicBuffer', and when the end is reached the buffer is
+    orphaned and allocation starts over from the beginning. No handles are created after 'create', and writing never
+    waits for draws of previous allocations (they keep the orphaned storage).
+
+    An allocation is valid until the buffer wraps, so the capacity should fit at least a frame of data.
+    """
+
+    @classmethod
+    def create(cls, capacity, alignment=16):
+        return cls(DynamicBuffer.create(capacity, GL_STREAM_DRAW), alignment)
+
+    def __init__(self, buffer, alignment=16):
+        self.buffer = buffer
+        self.alignment = alignment  # Allocations start at multiples of this many bytes.
+        self.offset = 0             # Where the next allocation starts.
+        self.wraps  = 0             # Times the buffer was orphaned to start over.
+
+    @property
+    def id(self):
+        return self.buffer.id
+
+    def allocate(self, data):
+        """Writes 'data' (see 'as_bytes') in the buffer and returns the byte offset it was written at."""
+        data = as_bytes(data)
+        offset = -(-self.offset // self.alignment) * self.alignment  # Round up to the alignment.
+
+        if offset + data.nbytes > self.buffer.capacity:
+            capacity = max(self.buffer.capacity, 1)
+            while capacity < data.nbytes:
+                capacity *= 2
+            self.buffer.orphan(capacity)
+            self.wraps += 1
+            offset = 0
+
+        self.buffer.update(data, offset)
+        self.offset = offset + data.nbytes
+        return offset
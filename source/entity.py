@@ -1,5 +1,8 @@
 from collections import OrderedDict, namedtuple
 from itertools import combinations, chain
+from threading import Lock
+import numpy
+
 from source.linear_algebra import *
 
 
@@ -13,14 +16,113 @@ from source.linear_algebra import *
 #         )
 
 
+class TrackedVector(numpy.ndarray):
+    """
+    A vector that notifies its owner when it's modified in-place, e.g. 'transform.location[0] += 1'. Views (e.g.
+    'transform.location[:2]') notify the same owner.
+
+    Results of arithmetic (e.g. 'transform.location + 1') are new vectors without an owner.
+    """
+
+    def __new__(cls, values, owner):
+        vector = numpy.array(values, dtype=GLfloat).view(cls)
+        vector.owner = owner
+        return vector
+
+    def __array_finalize__(self, vector):
+        # Only views of an owned vector share its data, not copies or results of arithmetic.
+        owner = getattr(vector, 'owner', None)
+        self.owner = owner if owner is not None and numpy.may_share_memory(self, vector) else None
+
+    def __setitem__(self, index, value):
+        super().__setitem__(index, value)
+        if self.owner is not None:
+            self.owner.dirty = True
+
+    def fill(self, value):
+        super().fill(value)
+        if self.owner is not None:
+            self.owner.dirty = True
+
+    def __array_ufunc__(self, ufunc, method, *inputs, out=None, **kwargs):
+        # In-place operators (e.g. 'transform.scale *= 2') and ufuncs with 'out' (e.g. 'numpy.add(location, v,
+        # out=location)') write to the outputs without '__setitem__', and 'ufunc.at' writes to the first input.
+        written = out if out is not None else inputs[:1] if method == 'at' else ()
+        for vector in written:
+            if getattr(vector, 'owner', None) is not None:
+                vector.owner.dirty = True
+
+        inputs = [value.view(numpy.ndarray) if isinstance(value, TrackedVector) else value for value in inputs]
+        if out is not None:
+            kwargs['out'] = tuple(value.view(numpy.ndarray) if isinstance(value, TrackedVector) else value
+                                  for value in out)
+        results = getattr(ufunc, method)(*inputs, **kwargs)
+
+        if out is not None:
+            return out[0] if len(out) == 1 else out
+        if isinstance(results, tuple):
+            return tuple(result.view(TrackedVector) if type(result) is numpy.ndarray else result for result in results)
+        return results.view(TrackedVector) if type(results) is numpy.ndarray else results
+
+
 class Transform:
+    """
+    Location, rotation and scale of an entity. The transformation matrix is cached and only recomputed after
+    location, rotation or scale has been changed (either assigned or modified in-place).
+    """
+
+    # Cache statistics for all transforms, for verifying that static entities doesn't recompute their matrix.
+    hits   = 0
+    misses = 0
+
     def __init__(self, location, rotation, scale):
-        self.location = Vector3(*location)
-        self.rotation = Vector3(*rotation)
-        self.scale    = Vector3(*scale)
+        self.dirty = True
+        self._matrix = None
+        self.location = location
+        self.rotation = rotation
+        self.scale    = scale
+
+    @property
+    def location(self):
+        return self._location
+
+    @location.setter
+    def location(self, value):
+        self._location = TrackedVector(value, owner=self)
+        self.dirty = True
+
+    @property
+    def rotation(self):
+        return self._rotation
+
+    @rotation.setter
+    def rotation(self, value):
+        self._rotation = TrackedVector(value, owner=self)
+        self.dirty = True
+
+    @property
+    def scale(self):
+        return self._scale
+
+    @scale.setter
+    def scale(self, value):
+        self._scale = TrackedVector(value, owner=self)
+        self.dirty = True
 
     def matrix(self):
-        return transformation_matrix(*self.location, *self.rotation, *self.scale)
+        if self.dirty:
+            self._matrix = transformation_matrix(*self._location, *self._rotation, *self._scale)
+            self._matrix.flags.writeable = False  # It's the cache, so it's read-only for the callers.
+            self.dirty = False
+            Transform.misses += 1
+        else:
+            Transform.hits += 1
+        return self._matrix
+
+    @staticmethod
+    def reset_statistics():
+        Transform.hits   = 0
+        Transform.misses = 0
 
 
 class Renderable:
@@ -31,12 +133,16 @@ class Renderable:
 
 
 class PointLight:
+    dtype = numpy.dtype([('color', GLfloat, 3), ('attenuation', GLfloat, 3)])
+
     def __init__(self, color, attenuation):
         self.color = color
         self.attenuation = attenuation
 
 
 class Physics:
+    dtype = numpy.dtype([('velocity', GLfloat, 3), ('acceleration', GLfloat, 3), ('max_speed', GLfloat)])
+
     def __init__(self, velocity, acceleration, max_speed):
         self.velocity = velocity
         self.acceleration = acceleration
@@ -44,9 +150,14 @@ class Physics:
 
 
 class Collidable:
+    dtype = numpy.dtype([('hitbox', GLfloat, 3)])  # Half extents of the axis aligned box.
+
     def __init__(self, hitbox):
         self.hitbox = hitbox
 
+
+Transform.dtype = numpy.dtype([('location', GLfloat, 3), ('rotation', GLfloat, 3), ('scale', GLfloat, 3)])
+
 #
 # transformations = [0, 1, 2, 3, 4, 5, 6, 7, 8, 9]
 # point_lights    = [                        8, 9]
@@ -56,8 +167,9 @@ class Collidable:
 #
 
 """
-Plan for cache-friendliness. Each set of components will have it's own contiguous array of SOA data. The * represents
-an array.
+Cache-friendliness. Each set of components (archetype) has it's own contiguous array per component. Components with a
+'dtype' are stored in NumPy structured arrays, where the field names of the dtype are the names of the constructor
+arguments (in order). Other components (like Renderable) are stored as Python objects. The * represents an array.
 
 Index: 0
 * Transform
@@ -75,10 +187,15 @@ Index: 3
 * Renderable
 * Physics
 
+A system then works on the arrays of all archetypes that has the components it needs, for example:
+
+    for transforms, physics in world.get_component_arrays_of(Transform, Physics):
+        transforms['location'] += physics['velocity'] * dt
+
 """
 
 class IComponentSetStorage:
-    def create(self, *components):
+    def create(self, entity_id, *components):
         raise NotImplemented("Sorry...")
 
     def get(self, index, *Components):
@@ -91,58 +208,196 @@ class IComponentSetStorage:
         raise NotImplemented("Sorry...")
 
 
-class SwitchArray:
+class Columns:
+    """
+    Views of the occupied part of each field of a ComponentArray, e.g. 'transforms['location']' is an (N, 3) array.
+    """
 
-    def __init__(self, ConstructorClass):
-        self.ConstructorClass = ConstructorClass
-        self.data = [None]       # Making sure to always have one free slot.
-        self.last_occupied = -1  # Index of first free slot
+    __slots__ = ('arrays', 'dtype', 'count')
 
-    def __iter__(self):
-        return (self.data[i] for i in range(self.last_occupied + 1))
+    def __init__(self, arrays, dtype, count):
+        self.arrays = arrays
+        self.dtype  = dtype
+        self.count  = count
 
-    def create(self, *elements):
-        for element in elements:
-            if 0 <= self.last_occupied < len(self.data)-2:
-                index = self.last_occupied
-                self.data[index] = element
-                self.last_occupied += 1
-            else:
-                self.data.append(None)
-                index = self.last_occupied + 1  # Making sure to always have one free slot at the end.
-                self.data[index] = element
-                self.last_occupied = index
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, name):
+        return self.arrays[name]
+
+    def __setitem__(self, name, value):
+        array = self.arrays[name]
+        if value is not array:  # In-place operators like 'columns[name] += 1' assign the same array back.
+            array[...] = value
+
+    def __repr__(self):
+        return '{}({})'.format(self.__class__.__name__, self.arrays)
 
+
+class ComponentArray:
+    """
+    Contiguous array of one component type. Destroying an element moves the last element into its place, so the
+    occupied elements are always the first 'count' ones.
+
+    Components with a structured dtype are stored as one contiguous array per field (SoA), since systems work on
+    fields (e.g. all locations) and strided access to interleaved fields is many times slower.
+    """
+
+    def __init__(self, Component, capacity=16, dtype=None):
+        self.Component = Component
+        self.dtype = dtype if dtype is not None else getattr(Component, 'dtype', None)
+        self.count = 0
+
+        if self.dtype is not None and self.dtype.names is not None:
+            self.columns = {}
+            for name in self.dtype.names:
+                field = self.dtype.fields[name][0]
+                self.columns[name] = numpy.empty((capacity, *field.shape), dtype=field.base)
+        else:
+            self.columns = {None: numpy.empty(capacity, dtype=self.dtype if self.dtype is not None else object)}
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def is_structured(self):
+        return None not in self.columns
+
+    @property
+    def data(self):
+        """The underlying array of components without fields."""
+        return self.columns[None]
+
+    @property
+    def capacity(self):
+        for column in self.columns.values():
+            return len(column)
+
+    def view(self):
+        if self.is_structured:
+            return Columns({name: column[:self.count] for name, column in self.columns.items()}, self.dtype, self.count)
+        return self.columns[None][:self.count]
+
+    def reserve(self, capacity):
+        if capacity > self.capacity:
+            capacity = max(capacity, 2 * self.capacity)
+            for name, column in self.columns.items():
+                new_column = numpy.empty((capacity, *column.shape[1:]), dtype=column.dtype)
+                new_column[:self.count] = column[:self.count]
+                self.columns[name] = new_column
+
+    def to_element(self, component):
+        if not self.is_structured:
+            return component
+        return tuple(getattr(component, name) for name in self.dtype.names)
+
+    def to_component(self, element):
+        if not self.is_structured:
+            return element
+        return self.Component(*element)
+
+    def _write(self, indices, elements):
+        """Writes an element (or array of elements) to 'indices' (an index, slice or index array)."""
+        if self.is_structured:
+            if isinstance(elements, tuple):
+                for column, value in zip(self.columns.values(), elements):
+                    column[indices] = value
+            else:
+                for name, column in self.columns.items():
+                    column[indices] = elements[name]
+        else:
+            self.columns[None][indices] = elements
+
+    def _copy(self, destination, source):
+        for column in self.columns.values():
+            column[destination] = column[source]
+
+    def take(self, indices):
+        """Copy of the elements at 'indices' as an array (structured if the component has fields)."""
+        if not self.is_structured:
+            return self.columns[None][indices]
+        elements = numpy.empty(len(indices), dtype=self.dtype)
+        for name, column in self.columns.items():
+            elements[name] = column[indices]
+        return elements
+
+    def create(self, component):
+        self.reserve(self.count + 1)
+        index = self.count
+        self._write(index, self.to_element(component))
+        self.count += 1
         return index
 
     def get(self, index):
-        return self.data[index]
+        if not self.is_structured:
+            return self.columns[None][index]
+        return self.Component(*(column[index].copy() for column in self.columns.values()))
 
-    def set(self, index, data):
-        self.data[index] = data
+    def set(self, index, component):
+        self._write(index, self.to_element(component))
 
     def destroy(self, index):
-        if not 0 <= index < self.last_occupied:
-            if index == self.last_occupied:
-                self.last_occupied -= 1
-                return
-            else:
-                raise ValueError("Invalid index {}! Last occupied is {}.".format(index, self.last_occupied))
+        if not 0 <= index < self.count:
+            raise ValueError("Invalid index {}! Count is {}.".format(index, self.count))
+
+        last = self.count - 1
+        self._copy(index, last)
+        if self.dtype is None:
+            self.columns[None][last] = None  # Don't keep the object alive.
+        self.count -= 1
+
+        return last
+
+    def extend(self, elements):
+        """Appends an array of elements. Returns the index of the first one."""
+        start = self.count
+        self.reserve(start + len(elements))
+        self._write(slice(start, start + len(elements)), elements)
+        self.count += len(elements)
+        return start
+
+    def destroy_many(self, indices):
+        """
+        Destroys the elements at the (unique) indices by moving the remaining elements from the end into the holes.
+        Returns the arrays (holes, moved), where the element at 'moved[i]' was moved to 'holes[i]'.
+        """
+        indices = numpy.asarray(indices, dtype=numpy.int64)
+        if len(indices) and not (0 <= indices.min() and indices.max() < self.count):
+            raise ValueError("Invalid indices! Count is {}.".format(self.count))
+
+        new_count = self.count - len(indices)
+
+        destroyed_at_end = numpy.zeros(len(indices), dtype=bool)
+        destroyed_at_end[indices[indices >= new_count] - new_count] = True
+
+        holes = numpy.sort(indices[indices < new_count])
+        moved = new_count + numpy.flatnonzero(~destroyed_at_end)
 
-        last_occupied = self.last_occupied
+        self._copy(holes, moved)
+        if self.dtype is None:
+            self.columns[None][new_count:self.count] = None  # Don't keep the objects alive.
+        self.count = new_count
 
-        self.data[index], self.data[last_occupied] = self.data[last_occupied], self.data[index]
-        self.last_occupied -= 1
+        return holes, moved
 
-        return last_occupied
 
+def component_elements(Component, components):
+    """Array of the elements of the components, as stored in a ComponentArray."""
+    dtype = getattr(Component, 'dtype', None)
+    elements = numpy.empty(len(components), dtype=dtype if dtype is not None else object)
+    if dtype is None:
+        elements[:] = components
+    else:
+        elements[:] = [tuple(getattr(component, name) for name in dtype.names) for component in components]
+    return elements
 
 
 class SortedGroupComponentSetStorage(IComponentSetStorage):
     def __init__(self):
         pass
 
-    def create(self, *components):
+    def create(self, entity_id, *components):
         raise NotImplemented("Sorry...")
 
     def get(self, index, *Components):
@@ -155,153 +410,410 @@ class SortedGroupComponentSetStorage(IComponentSetStorage):
         raise NotImplemented("Sorry...")
 
 
-class GeneralComponentSetStorage(IComponentSetStorage):
+class ArchetypeStorage(IComponentSetStorage):
+    """
+    Storage of all entities with exactly the same set of components. Element 'i' in all component arrays (and in
+    'ids') belongs to the same entity.
+    """
 
     def __init__(self, *component_classes):
-        self.mapping = {}           # When switching in destroy we need to map the last index to its new index.
+        self.ids = ComponentArray(None, dtype=numpy.dtype(numpy.int64))  # Entity id of each element.
         self.component_array = {
-            component_class : SwitchArray(component_class) for component_class in component_classes
+            component_class: ComponentArray(component_class) for component_class in component_classes
         }
 
-    def create(self, *components):
+    def __len__(self):
+        return self.count
+
+    @property
+    def count(self):
+        return self.ids.count
+
+    def create(self, entity_id, *components):
         assert len(components) == len(self.component_array), "BAD! All must be initialized"
-        previous_index = -1
-        index = -1
         for component in components:
-            array = self.component_array[component.__class__]
-            index = array.create(component)
-            assert index == previous_index or previous_index == -1, "All indices must be the same!"
-            previous_index = index
-        return index
+            self.component_array[component.__class__].create(component)
+        return self.ids.create(entity_id)
 
     def get(self, index, *Components):
-        components = []
         if not Components:
-            for name, array in self.component_array.items():
-                components.append(array.get(index))
-            return components
-        else:
-            for Component in Components:
-                components.append(self.component_array[Component])
-            return components
+            Components = self.component_array.keys()
+        return [self.component_array[Component].get(index) for Component in Components]
 
     def set(self, index, *components):
         for component in components:
-            component_array = self.component_array[component.__class__]
-            component_array.modify(index, component)
+            self.component_array[component.__class__].set(index, component)
 
     def destroy(self, index):
-        indices = []
-        for name, array in self.component_array.items():
-            mapped_index = array.destroy(index)
-            indices.append(mapped_index)
-
-        for i in range(len(indices) - 1):
-            assert indices[i] == indices[i+1], "Destruction not synchronized!"
+        """Returns the index of the element that was moved into 'index' (i.e. the previous last index)."""
+        for array in self.component_array.values():
+            array.destroy(index)
+        return self.ids.destroy(index)
+
+    def arrays(self, *Components):
+        """Views of the occupied part of the component arrays. Modifying the views modifies the components."""
+        return tuple(self.component_array[Component].view() for Component in Components)
+
+    def create_many(self, entity_ids, columns):
+        """Appends one element per entity id, where 'columns' maps each component class to an array of elements."""
+        assert columns.keys() == self.component_array.keys(), "BAD! All must be initialized"
+        for Component, elements in columns.items():
+            self.component_array[Component].extend(elements)
+        return self.ids.extend(entity_ids)
+
+    def take(self, indices, *Components):
+        """Copies of the elements at 'indices', as a mapping from component class to array."""
+        if not Components:
+            Components = self.component_array.keys()
+        return {Component: self.component_array[Component].take(indices) for Component in Components}
 
-        self.mapping[mapped_index] = index  # As it has now taken 'index' in the array.
+    def destroy_many(self, indices):
+        """Same as 'destroy' for multiple (unique) indices. Returns the arrays (holes, moved)."""
+        for array in self.component_array.values():
+            array.destroy_many(indices)
+        return self.ids.destroy_many(indices)
 
 
-class Entity:
-    def __init__(self, component_set, index):
-        self.component_set = component_set  # TODO(ted): Should be bitmask instead.
-        self.index = index
+Entity = namedtuple('Entity', 'id, generation')  # A handle is stale when its generation differs from the world's.
 
 
 class World:
-
-    def __init__(self):
-        self.registered_components = [Transform, Renderable, PointLight, Physics]
-        # TODO(ted): Should be dynamic and using a bitmask.
+    """
+    Entities are handles to a sparse table (indexed by entity id) with the signature, the index in the archetype
+    storage, and the generation of each entity. Destroying an entity increases the generation of its id, so handles to
+    it can be detected as stale, and the id is reused by later entities.
+    """
+
+    def __init__(self, capacity=64):
+        self.registered_components = []
+        self.component_bit = {}  # Component class -> bit in the signature.
+        self.registration_lock = Lock()  # Systems on different threads may use (and so register) new components.
         # TODO(ted): Make it possible for user to set ComponentSetStorage.
-        # TODO(ted): Don't create an entry for every possible combination. Use an hash table and create one when
-        # necessary. Delete entries that are not used.
-        self.component_sets = {
-            # frozenset((Transform,)):                                 ComponentSetStorage(Transform),
-            # frozenset((Transform, Renderable)):                      ComponentSetStorage(Transform, Renderable),
-            # frozenset((Transform, PointLight)):                      ComponentSetStorage(Transform, PointLight),
-            # frozenset((Transform, Physics)):                         ComponentSetStorage(Transform, Physics),
-            # frozenset((Transform, Renderable, PointLight)):          ComponentSetStorage(Transform, Renderable, PointLight),
-            # frozenset((Transform, Renderable, Physics)):             ComponentSetStorage(Transform, Renderable, Physics),
-            # frozenset((Transform, PointLight, Physics)):             ComponentSetStorage(Transform, PointLight, Physics),
-            # frozenset((Transform, Renderable, PointLight, Physics)): ComponentSetStorage(Transform, Renderable, PointLight, Physics),
-        }
+        # TODO(ted): Delete entries that are not used.
+        self.component_sets = {}  # Signature -> ArchetypeStorage.
+        self.query_cache = {}     # Tuple of component classes -> matching ArchetypeStorages.
+
+        # Sparse entity table.
+        self.generations = numpy.zeros(capacity, dtype=numpy.int64)
+        self.signatures  = numpy.zeros(capacity, dtype=numpy.int64)
+        self.indices     = numpy.full(capacity, -1, dtype=numpy.int64)
+        self.entity_count = 0  # Number of ids ever used.
+        self.free_ids = []
+
+        for Component in (Transform, Renderable, PointLight, Physics, Collidable):
+            self.register_component(Component)
+
+    def register_component(self, Component, Storage=ArchetypeStorage):
+        with self.registration_lock:
+            if Component not in self.component_bit:
+                assert len(self.registered_components) < 63, "Signatures are limited to 63 components!"
+                # Appended before the bit is published, so 'components_of' never misses a bit in a signature.
+                self.registered_components.append(Component)
+                self.component_bit[Component] = 1 << (len(self.registered_components) - 1)
+            return self.component_bit[Component]
+
+    def signature_of(self, Components):
+        signature = 0
+        for Component in Components:
+            bit = self.component_bit.get(Component)
+            if bit is None:
+                bit = self.register_component(Component)
+            signature |= bit
+        return signature
+
+    def components_of(self, signature):
+        return [
+            Component for Component in self.registered_components if signature & self.component_bit.get(Component, 0)
+        ]
+
+    def _get_or_create_set_array(self, signature):
+        set_array = self.component_sets.get(signature)
+        if set_array is None:
+            set_array = ArchetypeStorage(*self.components_of(signature))
+            self.component_sets[signature] = set_array
+            self.query_cache.clear()  # The new archetype might match any previous query.
+        return set_array
+
+    def get_archetypes_of(self, *Components):
+        """Returns all archetypes that has (at least) all components in 'Components'."""
+        archetypes = self.query_cache.get(Components)
+        if archetypes is None:
+            target = self.signature_of(Components)
+            archetypes = [
+                set_array for signature, set_array in self.component_sets.items() if signature & target == target
+            ]
+            self.query_cache[Components] = archetypes
+        return archetypes
 
-    def _get_or_create_set_array(self, entity):
-        if entity.component_set not in self.component_sets:
-            self.component_sets[entity.component_set] = GeneralComponentSetStorage(*entity.component_set)
-        return self.component_sets[entity.component_set]
+    def get_component_arrays_of(self, *Components):
+        """
+        Returns a list with a tuple of arrays (one per component in 'Components') for each archetype that has all the
+        components. The arrays are views, so systems can modify the components in-place and vectorized.
+        """
+        return [
+            set_array.arrays(*Components) for set_array in self.get_archetypes_of(*Components) if set_array.count > 0
+        ]
+
+    def is_alive(self, entity):
+        return 0 <= entity.id < self.entity_count and self.generations[entity.id] == entity.generation
+
+    def _assert_alive(self, entity):
+        if not self.is_alive(entity):
+            raise ValueError("Entity {} is stale or was never created!".format(entity))
+
+    def get_signature(self, entity):
+        self._assert_alive(entity)
+        return int(self.signatures[entity.id])
+
+    def get_components(self, entity, *Components):
+        self._assert_alive(entity)
+        signature = int(self.signatures[entity.id])
+        if not signature:
+            return []
+        return self.component_sets[signature].get(int(self.indices[entity.id]), *Components)
+
+    def set_components(self, entity, *components):
+        self._assert_alive(entity)
+        signature = int(self.signatures[entity.id])
+        assert signature, "Entity {} has no components to set!".format(entity)
+        self.component_sets[signature].set(int(self.indices[entity.id]), *components)
+
+    def _reserve_ids(self, capacity):
+        if capacity > len(self.generations):
+            capacity = max(capacity, 2 * len(self.generations))
+            for name, fill in (('generations', 0), ('signatures', 0), ('indices', -1)):
+                old = getattr(self, name)
+                new = numpy.full(capacity, fill, dtype=old.dtype)
+                new[:len(old)] = old
+                setattr(self, name, new)
 
-    def register_component(self, Component, Storage=GeneralComponentSetStorage):
-        pass
+    def create_entity(self, *components):
+        if self.free_ids:
+            id_ = self.free_ids.pop()
+        else:
+            id_ = self.entity_count
+            self._reserve_ids(id_ + 1)
+            self.entity_count += 1
 
-    def get_component_arrays_of(self, *Components):
-        component_set_arrays = []
+        entity = Entity(id_, int(self.generations[id_]))
+        if components:
+            self.add_components(entity, *components)
+        return entity
+
+    def _remove_from_archetype(self, id_):
+        """Removes the entity's element from its archetype, and updates the index of the element moved into it."""
+        signature = int(self.signatures[id_])
+        if not signature:
+            return
+        set_array = self.component_sets[signature]
+        index = int(self.indices[id_])
+        moved = set_array.destroy(index)
+        if moved != index:
+            self.indices[set_array.ids.data[index]] = index
+        self.indices[id_] = -1
+
+    def _insert_into_archetype(self, id_, signature, components):
+        self.signatures[id_] = signature
+        if signature:
+            set_array = self._get_or_create_set_array(signature)
+            self.indices[id_] = set_array.create(id_, *components)
+        else:
+            self.indices[id_] = -1
+
+    def destroy_entity(self, entity):
+        self._assert_alive(entity)
+        self._remove_from_archetype(entity.id)
+        self.signatures[entity.id] = 0
+        self.generations[entity.id] += 1
+        self.free_ids.append(entity.id)
 
-        component_target = frozenset(Components)
-        for component_set, component_set_array in self.component_sets.items():
-            if component_target.intersection(component_set) == component_target:
-                component_set_arrays.append(component_set_array)
+    def add_components(self, entity, *components):
+        added = self.signature_of(type(component) for component in components)
+        previous_components = [
+            component for component in self.get_components(entity) if not self.component_bit[type(component)] & added
+        ]
+        self._remove_from_archetype(entity.id)
+
+        signature = int(self.signatures[entity.id]) | added
+        self._insert_into_archetype(entity.id, signature, chain(previous_components, components))
+
+    def _ids_of(self, entities):
+        if isinstance(entities, numpy.ndarray):
+            handles = entities.reshape(-1, 2)
+        else:
+            handles = numpy.fromiter(chain.from_iterable(entities), dtype=numpy.int64).reshape(-1, 2)
+        ids, generations = handles[:, 0], handles[:, 1]
+        if len(ids) and not (
+            ids.max() < self.entity_count and ids.min() >= 0 and (self.generations[ids] == generations).all()
+        ):
+            raise ValueError("Some entities are stale or were never created!")
+        assert len(numpy.unique(ids)) == len(ids), "Entities must be unique!"
+        return ids
+
+    def _move_many(self, ids, signature, components):
+        """
+        Moves entities (all with the same signature) to the archetype with 'signature'. 'components' maps component
+        classes to the arrays of new (or replaced) elements.
+        """
+        source_signature = int(self.signatures[ids[0]])
+        columns = {}
+
+        if source_signature:
+            source = self.component_sets[source_signature]
+            kept = [Component for Component in source.component_array if self.component_bit[Component] & signature]
+            columns = source.take(self.indices[ids], *kept)
+            holes, moved = source.destroy_many(self.indices[ids])
+            self.indices[source.ids.data[holes]] = holes
+
+        for Component, elements in components.items():
+            columns[Component] = elements
+
+        self.signatures[ids] = signature
+        if signature:
+            target = self._get_or_create_set_array(signature)
+            start = target.create_many(ids, {Component: columns[Component] for Component in target.component_array})
+            self.indices[ids] = numpy.arange(start, start + len(ids))
+        else:
+            self.indices[ids] = -1
+
+    def _group_by_signature(self, ids):
+        """Yields the signature and the positions in 'ids' of the entities with that signature."""
+        signatures = self.signatures[ids]
+        for signature in numpy.unique(signatures):
+            yield int(signature), numpy.flatnonzero(signatures == signature)
+
+    def add_components_to_many(self, entities, *components):
+        """
+        Adds the components to all entities. Entities with the same archetype are moved to their new archetype with
+        one array operation per component. Each entity gets its own copy of numeric components, while other
+        components (like Renderable) are shared.
+        """
+        count = len(entities)
+        self.add_component_columns(entities, {
+            type(component): numpy.repeat(component_elements(type(component), [component]), count)
+            for component in components
+        })
+
+    def add_component_columns(self, entities, columns):
+        """
+        Same as 'add_components_to_many', but 'columns' maps each component class to an array with one element per
+        entity (see 'component_elements').
+        """
+        ids = self._ids_of(entities)
+        added = self.signature_of(columns)
+        for signature, positions in self._group_by_signature(ids):
+            group_columns = {Component: elements[positions] for Component, elements in columns.items()}
+            self._move_many(ids[positions], signature | added, group_columns)
+
+    def remove_components_from_many(self, entities, *Components):
+        """Removes the components from all entities. See 'add_components_to_many'."""
+        ids = self._ids_of(entities)
+        removed = self.signature_of(Components)
+        for signature, positions in self._group_by_signature(ids):
+            if signature & removed:
+                self._move_many(ids[positions], signature & ~removed, {})
+
+    def destroy_entities(self, entities):
+        """Same as 'destroy_entity' for multiple entities, with one array operation per archetype."""
+        ids = self._ids_of(entities)
+        for signature, positions in self._group_by_signature(ids):
+            if signature:
+                self._move_many(ids[positions], 0, {})
+        self.generations[ids] += 1
+        self.free_ids.extend(ids.tolist())
 
+    def remove_components(self, entity, *Components):
+        previous_components = self.get_components(entity)
+        self._remove_from_archetype(entity.id)
 
-        def temp(sequences):
-            for sequence in sequences:
-                for element in sequence:
-                    yield element
+        previous_components = [component for component in previous_components if type(component) not in Components]
 
-        result = []
-        for Component in Components:
-            arrays = [component_set_array.component_array[Component] for component_set_array in component_set_arrays]
-            result.append(temp(arrays))
-        return zip(*result)
+        signature = int(self.signatures[entity.id]) & ~self.signature_of(Components)
+        self._insert_into_archetype(entity.id, signature, previous_components)
+
+
+
+
+class CommandBuffer:
+    """
+    Records structural changes (creating/destroying entities and adding/removing components) so they can be made
+    while iterating the arrays from 'World.get_component_arrays_of', and applies them later in 'flush'.
 
+    Commands are sorted (stably, and keeping the order of the commands on each entity) by kind and component classes,
+    and each group is applied with one call to the batched World methods, which in turn move all entities of the same
+    archetype at once. Commands on entities that have been destroyed when the command is applied are ignored.
+    """
 
+    ADD, REMOVE, DESTROY = range(3)
+
+    def __init__(self, world):
+        self.world = world
+        self.commands = []  # (kind, key, entity, components or component classes)
+        self.lock = Lock()  # Systems running on different threads may share the buffer.
+
+    def __len__(self):
+        return len(self.commands)
 
     def create_entity(self, *components):
-        entity = Entity(frozenset(), 0)
+        # An entity without components isn't stored in any archetype, so it's safe to create it right away.
+        with self.lock:
+            entity = self.world.create_entity()
         if components:
             self.add_components(entity, *components)
         return entity
 
     def destroy_entity(self, entity):
-        if entity.component_set:
-            set_array = self.component_sets[entity.component_set]
-            set_array.destroy(entity.index)
+        self.commands.append((CommandBuffer.DESTROY, 0, entity, ()))
 
     def add_components(self, entity, *components):
-        # Remove
-        previous_components = []
-        if entity.component_set:
-            set_array = self.component_sets[entity.component_set]
-            previous_components = set_array.get(entity.index)
-            set_array.destroy(entity.index)
-
-        # Create
-        component_set_to_add = frozenset(type(component) for component in components)
-        entity.component_set = entity.component_set.union(component_set_to_add)  # Union
-
-        set_array = self._get_or_create_set_array(entity)
-        entity.index = set_array.create(*chain(previous_components, components))
+        key = self.world.signature_of(type(component) for component in components)
+        self.commands.append((CommandBuffer.ADD, key, entity, components))
 
     def remove_components(self, entity, *Components):
-        # Remove
-        previous_components = []
-        if entity.component_set:
-            set_array = self.component_sets[entity.component_set]
-            previous_components = set_array.get(entity.index)
-            set_array.destroy(entity.index)
-
-        # Filter
-        previous_components = [component for component in previous_components if type(component) not in Components]
-
-        # Create
-        component_set_to_remove = frozenset(Components)
-        entity.component_set = entity.component_set.difference(component_set_to_remove)   # Difference
-
-        set_array = self._get_or_create_set_array(entity)
-        entity.index = set_array.create(*previous_components)
-
-
+        key = self.world.signature_of(Components)
+        self.commands.append((CommandBuffer.REMOVE, key, entity, Components))
+
+    def flush(self):
+        commands, self.commands = self.commands, []
+
+        # The n:th command on an entity is in round n, so sorting by round keeps the order of the commands on each
+        # entity, while the commands in a round (at most one per entity) are grouped by kind and component classes.
+        rounds = {}
+        order = []
+        for index, (kind, key, entity, _) in enumerate(commands):
+            round_ = rounds.get(entity.id, 0)
+            rounds[entity.id] = round_ + 1
+            order.append((round_, kind, key, index))
+        order.sort()  # The index keeps the order of submission within a group.
+
+        run = []
+        for round_, kind, key, index in order:
+            if run and (round_, kind, key) != run_key:
+                self._apply(run)
+                run = []
+            run.append(commands[index])
+            run_key = (round_, kind, key)
+
+        if run:
+            self._apply(run)
+
+    def _apply(self, run):
+        kind, key, _, _ = run[0]
+        run = [command for command in run if self.world.is_alive(command[2])]
+        if not run:
+            return
+
+        entities = [entity for _, _, entity, _ in run]
+        if kind == CommandBuffer.ADD:
+            components_by_class = [{type(component): component for component in command[3]} for command in run]
+            self.world.add_component_columns(entities, {
+                Component: component_elements(Component, [components[Component] for components in components_by_class])
+                for Component in components_by_class[0]
+            })
+        elif kind == CommandBuffer.REMOVE:
+            self.world.remove_components_from_many(entities, *run[0][3])
+        else:
+            self.world.destroy_entities(entities)
 
 
 def main():
@@ -324,24 +836,24 @@ def main():
     entities = world.get_component_arrays_of(Transform, PointLight)
 
     print('---- START ----')
-    for x in entities:
-        print(x)
+    for transforms, lights in entities:
+        print(transforms, lights)
     print('----- END -----')
 
     world.add_components(b, PointLight(color=(4, 5, 6), attenuation=11))
     entities = world.get_component_arrays_of(Transform, PointLight)
 
     print('---- START ----')
-    for x in entities:
-        print(x)
+    for transforms, lights in entities:
+        print(transforms, lights)
     print('----- END -----')
 
     world.remove_components(b, PointLight)
     entities = world.get_component_arrays_of(Transform, PointLight)
 
     print('---- START ----')
-    for x in entities:
-        print(x)
+    for transforms, lights in entities:
+        print(transforms, lights)
     print('----- END -----')
 
 
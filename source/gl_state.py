@@ -0,0 +1,167 @@
+from pyglet.gl import (
+    glEnable, glDisable, glUseProgram, glBindBuffer, glActiveTexture, glBindTexture, glEnableVertexAttribArray,
+    glDisableVertexAttribArray, glVertexAttribPointer, glVertexAttribDivisor, glStencilOp, glStencilFunc,
+    glStencilMask, glCullFace, glBindVertexArray, GL_ARRAY_BUFFER, GL_ELEMENT_ARRAY_BUFFER, GL_TEXTURE0
+)
+
+
+def _value(handle):
+    """The integer of a handle, which may be a ctypes object (e.g. GLuint) that doesn't compare by value."""
+    return getattr(handle, 'value', handle)
+
+
+class VertexArrayState:
+    """Shadow copy of the state stored in a vertex array object (or in the default one)."""
+
+    __slots__ = 'arrays', 'pointers', 'divisors', 'buffers'
+
+    def __init__(self):
+        self.arrays   = {}  # Attribute index to enabled.
+        self.pointers = {}  # Attribute index to arguments (including the array buffer it was specified with).
+        self.divisors = {}  # Attribute index to divisor.
+        self.buffers  = {}  # Only GL_ELEMENT_ARRAY_BUFFER, which is part of the vertex array's state.
+
+
+class GLState:
+    """
+    Shadow copy of the OpenGL state that we change, which drops calls that wouldn't change anything. Calls into
+    OpenGL through ctypes take microseconds each, and a frame re-issues many of them.
+
+    All code that changes this state must go through 'gl_state' (the instance for our only context), or the shadow
+    copy goes stale. Call 'invalidate' after code we don't control (e.g. pyglet) has changed the state.
+    """
+
+    def __init__(self):
+        self.calls  = 0  # Calls made since 'reset_statistics'.
+        self.elided = 0  # Calls dropped since 'reset_statistics'.
+        self.invalidate()
+
+    def invalidate(self):
+        """Forgets the state, so the next call of each kind is always made."""
+        self.capabilities = {}
+        self.program = None
+        self.buffers = {}   # Target to buffer.
+        self.active_texture_unit = None
+        self.textures = {}  # (unit, target) to texture.
+        self.vertex_array = None
+        self.vertex_array_states = {None: VertexArrayState()}  # Vertex array object to its state.
+        self.vertex_array_state  = self.vertex_array_states[None]
+        self.stencil_op   = None
+        self.stencil_func = None
+        self.stencil_mask = None
+        self.cull_face    = None
+
+    def reset_statistics(self):
+        self.calls  = 0
+        self.elided = 0
+
+    def _changed(self, mapping, key, value):
+        """Records 'value' for 'key', and returns if it's different from before (i.e. if the call must be made)."""
+        if key in mapping and mapping[key] == value:
+            self.elided += 1
+            return False
+        mapping[key] = value
+        self.calls += 1
+        return True
+
+    def _changed_attribute(self, name, value):
+        if getattr(self, name) == value:
+            self.elided += 1
+            return False
+        setattr(self, name, value)
+        self.calls += 1
+        return True
+
+    # ---- Capabilities ----
+
+    def enable(self, capability):
+        if self._changed(self.capabilities, capability, True):
+            glEnable(capability)
+
+    def disable(self, capability):
+        if self._changed(self.capabilities, capability, False):
+            glDisable(capability)
+
+    def set_stencil_op(self, fail, depth_fail, depth_pass):
+        if self._changed_attribute('stencil_op', (fail, depth_fail, depth_pass)):
+            glStencilOp(fail, depth_fail, depth_pass)
+
+    def set_stencil_func(self, function, reference, mask):
+        if self._changed_attribute('stencil_func', (function, reference, mask)):
+            glStencilFunc(function, reference, mask)
+
+    def set_stencil_mask(self, mask):
+        if self._changed_attribute('stencil_mask', mask):
+            glStencilMask(mask)
+
+    def set_cull_face(self, mode):
+        if self._changed_attribute('cull_face', mode):
+            glCullFace(mode)
+
+    # ---- Objects ----
+
+    def use_program(self, program):
+        if self._changed_attribute('program', _value(program)):
+            glUseProgram(program)
+
+    def bind_buffer(self, target, buffer):
+        buffers = self.vertex_array_state.buffers if target == GL_ELEMENT_ARRAY_BUFFER else self.buffers
+        if self._changed(buffers, target, _value(buffer)):
+            glBindBuffer(target, buffer)
+
+    def bind_vertex_array(self, vertex_array):
+        """Binds a vertex array object (0 is the default one), which switches the attribute and index buffer state."""
+        if self._changed_attribute('vertex_array', _value(vertex_array)):
+            glBindVertexArray(vertex_array)
+            self.vertex_array_state = self.vertex_array_states.setdefault(self.vertex_array, VertexArrayState())
+
+    def active_texture(self, unit):
+        """Makes texture unit 'unit' (i.e. GL_TEXTURE0 + unit) active."""
+        if self._changed_attribute('active_texture_unit', unit):
+            glActiveTexture(GL_TEXTURE0 + unit)
+
+    def bind_texture(self, unit, target, texture):
+        """Binds 'texture' to texture unit 'unit', which is made active if the binding changes."""
+        key = (unit, target)
+        if key in self.textures and self.textures[key] == _value(texture):
+            self.elided += 1
+            return
+        self.active_texture(unit)
+        self.textures[key] = _value(texture)
+        self.calls += 1
+        glBindTexture(target, texture)
+
+    # ---- Vertex attributes ----
+
+    def enable_vertex_attrib_array(self, index):
+        if self._changed(self.vertex_array_state.arrays, index, True):
+            glEnableVertexAttribArray(index)
+
+    def disable_vertex_attrib_array(self, index):
+        if self._changed(self.vertex_array_state.arrays, index, False):
+            glDisableVertexAttribArray(index)
+
+    def vertex_attrib_pointer(self, index, size, type, normalized, stride, pointer):
+        """Like glVertexAttribPointer, which uses the buffer bound to GL_ARRAY_BUFFER (so it's part of the state)."""
+        arguments = (self.buffers.get(GL_ARRAY_BUFFER), size, type, normalized, stride, pointer)
+        if self._changed(self.vertex_array_state.pointers, index, arguments):
+            glVertexAttribPointer(index, size, type, normalized, stride, pointer)
+
+    def vertex_attrib_buffer(self, index, buffer, size, type, normalized, stride, pointer):
+        """
+        Binds 'buffer' to GL_ARRAY_BUFFER and specifies the attribute pointer into it, unless the attribute already
+        points into the buffer like that (in which case the bind isn't needed either).
+        """
+        arguments = (_value(buffer), size, type, normalized, stride, pointer)
+        if self.vertex_array_state.pointers.get(index) == arguments:
+            self.elided += 2
+            return
+        self.bind_buffer(GL_ARRAY_BUFFER, buffer)
+        self.vertex_attrib_pointer(index, size, type, normalized, stride, pointer)
+
+    def vertex_attrib_divisor(self, index, divisor):
+        if self._changed(self.vertex_array_state.divisors, index, divisor):
+            glVertexAttribDivisor(index, divisor)
+
+
+gl_state = GLState()
@@ -0,0 +1,94 @@
+import numpy
+from pyglet.gl import (
+    glGenBuffers, glBufferData, glBufferSubData, GL_ARRAY_BUFFER, GL_FLOAT, GL_FALSE, GL_STREAM_DRAW, GLuint, GLfloat,
+    gl_info
+)
+from source.c_bindings import sizeof
+from source.gl_state import gl_state
+
+
+def supports_instancing():
+    """If the current context can draw instances with per-instance attributes (OpenGL 3.3 or ARB_instanced_arrays)."""
+    return gl_info.have_version(3, 3) or gl_info.have_extension('GL_ARB_instanced_arrays')
+
+
+class InstanceBuffer:
+    """
+    Transformation matrices of many instances, as a per-instance 'mat4' attribute. A 'mat4' attribute takes four
+    attribute indices (one per column), so the shader must bind it after the model's attributes, e.g.
+    'attributes = ['position', 'texture_coordinate', 'normal', 'transformation']'.
+    """
+
+    TARGET = GL_ARRAY_BUFFER
+    MATRIX_SIZE = 16 * sizeof(GLfloat)
+
+    @classmethod
+    def create(cls, capacity=64):
+        handle = GLuint()
+        glGenBuffers(1, handle)
+        gl_state.bind_buffer(InstanceBuffer.TARGET, handle)
+        glBufferData(InstanceBuffer.TARGET, capacity * InstanceBuffer.MATRIX_SIZE, None, GL_STREAM_DRAW)
+        return cls(handle, capacity)
+
+    def __init__(self, id_, capacity):
+        self.id = id_
+        self.capacity = capacity  # Number of matrices the buffer has room for.
+        self.count = 0            # Number of matrices uploaded with the last 'update'.
+        self.staging = numpy.empty((capacity, 4, 4), dtype=GLfloat)  # Reused every update to avoid allocations.
+
+    def update(self, matrices):
+        """Uploads (N, 4, 4) row-major matrices (like 'Transform.matrix'), replacing the previous instances."""
+        matrices = numpy.asarray(matrices).reshape(-1, 4, 4)
+        self.count = len(matrices)
+
+        gl_state.bind_buffer(InstanceBuffer.TARGET, self.id)
+        if self.count > self.capacity:
+            # Grow by doubling, so a growing scene doesn't reallocate every frame.
+            while self.capacity < self.count:
+                self.capacity = max(2 * self.capacity, 1)
+            self.staging = numpy.empty((self.capacity, 4, 4), dtype=GLfloat)
+            glBufferData(InstanceBuffer.TARGET, self.capacity * InstanceBuffer.MATRIX_SIZE, None, GL_STREAM_DRAW)
+
+        if self.count > 0:
+            # GLSL reads a 'mat4' attribute column by column, so the columns must be contiguous.
+            data = self.staging[:self.count]
+            data[...] = matrices.transpose(0, 2, 1)
+            glBufferSubData(InstanceBuffer.TARGET, 0, data.nbytes, data.ctypes.data)
+
+    def enable(self, index):
+        gl_state.bind_buffer(InstanceBuffer.TARGET, self.id)
+        stride = InstanceBuffer.MATRIX_SIZE
+        for column in range(4):
+            gl_state.enable_vertex_attrib_array(index + column)
+            gl_state.vertex_attrib_pointer(index + column, 4, GL_FLOAT, GL_FALSE, stride, column * stride // 4)
+            gl_state.vertex_attrib_divisor(index + column, 1)  # Advance once per instance instead of once per vertex.
+
+    @staticmethod
+    def disable(index):
+        for column in range(4):
+            gl_state.vertex_attrib_divisor(index + column, 0)
+            gl_state.disable_vertex_attrib_array(index + column)
+        gl_state.bind_buffer(InstanceBuffer.TARGET, 0)
+
+
+def draw_instances(model, matrices, shader, instance_buffer=None):
+    """
+    Draws the (enabled) model once for each of the (N, 4, 4) transformation matrices. With an instance buffer, all
+    instances are drawn with one draw call, and 'shader' must take the transformation as an attribute. Without one,
+    the instances are drawn one by one with the 'transformation' uniform of 'shader' (e.g. if the context doesn't
+    support instancing).
+    """
+    if len(matrices) == 0:
+        return
+
+    if instance_buffer is None:
+        for matrix in matrices:
+            shader.load_uniform_matrix(transformation=matrix)
+            model.render()
+        return
+
+    index = model.attribute_count  # The attribute index after the model's attributes.
+    instance_buffer.update(matrices)
+    instance_buffer.enable(index)
+    model.render_instanced(instance_buffer.count)
+    instance_buffer.disable(index)
@@ -57,6 +57,48 @@ def transformation_matrix(x=0, y=0, z=0, rx=0, ry=0, rz=0, sx=1, sy=1, sz=1):
     return translation @ rotation_x @ rotation_y @ rotation_z @ scale
 
 
+def transformation_matrices(locations, rotations, scales):
+    """
+    Batched version of 'transformation_matrix'.
+
+    Args:
+        locations: Array-like of shape (N, 3) with x, y, z.
+        rotations: Array-like of shape (N, 3) with rx, ry, rz (in radians).
+        scales:    Array-like of shape (N, 3) with sx, sy, sz.
+
+    Returns:
+        Array of shape (N, 4, 4) and type GLfloat, where each matrix is equal to
+        'transformation_matrix(*location, *rotation, *scale)'.
+    """
+    locations = numpy.asarray(locations, dtype=GLfloat).reshape(-1, 3)
+    rotations = numpy.asarray(rotations, dtype=GLfloat).reshape(-1, 3)
+    scales    = numpy.asarray(scales,    dtype=GLfloat).reshape(-1, 3)
+
+    cx, cy, cz = numpy.cos(rotations).T
+    sx, sy, sz = numpy.sin(rotations).T
+
+    # Expanded rotation_x @ rotation_y @ rotation_z.
+    matrices = numpy.zeros((len(locations), 4, 4), dtype=GLfloat)
+    matrices[:, 0, 0] = cy * cz
+    matrices[:, 0, 1] = -cy * sz
+    matrices[:, 0, 2] = sy
+    matrices[:, 1, 0] = sx * sy * cz + cx * sz
+    matrices[:, 1, 1] = cx * cz - sx * sy * sz
+    matrices[:, 1, 2] = -sx * cy
+    matrices[:, 2, 0] = sx * sz - cx * sy * cz
+    matrices[:, 2, 1] = cx * sy * sz + sx * cz
+    matrices[:, 2, 2] = cx * cy
+
+    # Scaling is applied first, which scales the columns of the rotation.
+    matrices[:, :3, :3] *= scales[:, numpy.newaxis, :]
+
+    # Translation is applied last.
+    matrices[:, :3, 3] = locations
+    matrices[:, 3, 3] = 1
+
+    return matrices
+
+
 def orthographic_matrix(left, right, bottom, top, near, far):
     a = 2 * near
     b = right - left
@@ -79,4 +121,44 @@ def perspective_matrix(fov, aspect_ratio, near, far):
     right = top * aspect_ratio
     left = -right
 
-    return orthographic_matrix(left, right, bottom, top, near, far)
\ No newline at end of file
+    return orthographic_matrix(left, right, bottom, top, near, far)
+
+
+def transform_box(matrix, minimum, maximum):
+    """World space box (minimum, maximum) that contains the local box (minimum, maximum) transformed by 'matrix'."""
+    matrix  = numpy.asarray(matrix, dtype=numpy.float64)
+    center  = (numpy.asarray(minimum) + numpy.asarray(maximum)) / 2
+    extents = (numpy.asarray(maximum) - numpy.asarray(minimum)) / 2
+
+    # Each axis of the new box is as long as the sum of the transformed extents' absolute components.
+    new_center  = matrix[:3, :3] @ center + matrix[:3, 3]
+    new_extents = numpy.abs(matrix[:3, :3]) @ extents
+    return new_center - new_extents, new_center + new_extents
+
+
+def screen_ray(x, y, width, height, perspective, view):
+    """
+    Ray (origin, direction) through the pixel (x, y), where (0, 0) is the lower left corner of the window (like
+    pyglet's mouse events). The origin is on the near plane, and 'direction' is normalized.
+    """
+    inverse = numpy.linalg.inv(numpy.asarray(perspective, dtype=numpy.float64) @ view)
+    ndc_x = 2 * x / width - 1
+    ndc_y = 2 * y / height - 1
+
+    near = inverse @ (ndc_x, ndc_y, -1, 1)
+    far  = inverse @ (ndc_x, ndc_y,  1, 1)
+    near, far = near[:3] / near[3], far[:3] / far[3]
+    return near, normalize(far - near)
+
+
+def frustum_planes(matrix):
+    """
+    The six planes (left, right, bottom, top, near, far) of the view frustum of 'matrix' (e.g. 'perspective @ view'),
+    as a (6, 4) array of normalized planes (a, b, c, d). A point is inside a plane if 'a*x + b*y + c*z + d >= 0'.
+    """
+    matrix = numpy.asarray(matrix, dtype=numpy.float64)
+    x, y, z, w = matrix
+
+    # A clip space point is inside the frustum when -w <= x, y, z <= w (Gribb & Hartmann).
+    planes = numpy.array((w + x, w - x, w + y, w - y, w + z, w - z))
+    return planes / numpy.sqrt(numpy.square(planes[:, :3]) @ numpy.ones(3))[:, numpy.newaxis]
@@ -0,0 +1,248 @@
+"""
+Levels of detail: simplified versions of a mesh for instances that cover a small part of the screen.
+
+Meshes are simplified with quadric error metrics (Garland & Heckbert, "Surface Simplification Using Quadric Error
+Metrics", 1997), collapsing the edge that moves the surface the least until few enough triangles are left. Edges are
+collapsed into one of their vertices, so no new vertices are made, and the texture coordinates and normals of a
+triangle corner are taken from the vertex it ends up at (from the split vertex with the most similar ones, so seams
+and hard edges keep their sides).
+"""
+import heapq
+import os
+
+import numpy
+
+from source.culling import bounding_spheres
+from source.mesh import Mesh, parse_obj
+from source.mesh_cache import cache_path, save_mesh, load_mesh, upload_mesh
+from source.mesh_optimization import optimize_mesh
+
+
+LOD_RATIOS = (1.0, 0.5, 0.25, 0.125)  # Fraction of the triangles of each level of detail.
+LOD_SIZES  = (0.2, 0.1, 0.05)  # Projected size (see 'projected_sizes') below which the next level is used.
+LOD_ERRORS = (0.05, 0.1, 0.2)  # Largest simplification error of each level after the first (see 'simplify_mesh').
+
+
+def _weld(positions):
+    """Index of each vertex among the unique positions, and the unique positions."""
+    unique, welded = numpy.unique(positions, axis=0, return_inverse=True)
+    return welded.ravel(), unique.astype(numpy.float64)
+
+
+def _face_normals(points, triangles):
+    a, b, c = points[triangles[:, 0]], points[triangles[:, 1]], points[triangles[:, 2]]
+    return numpy.cross(b - a, c - a)
+
+
+def simplify_mesh(mesh, target_triangles, max_error=LOD_ERRORS[0]):
+    """
+    'mesh' simplified to (about) 'target_triangles' triangles. Collapses that move the surface more than 'max_error'
+    times the radius of the mesh or that would flip a triangle are skipped, and vertices on open boundaries (edges of
+    only one triangle) are locked so holes don't grow, so the result has more triangles if nothing is left to collapse.
+    """
+    welded, points = _weld(mesh.positions)
+    corners   = numpy.asarray(mesh.indices, dtype=numpy.int64).reshape(-1, 3)  # Split vertex of each corner.
+    triangles = welded[corners]
+    keep = (triangles[:, 0] != triangles[:, 1]) & (triangles[:, 1] != triangles[:, 2]) & \
+           (triangles[:, 2] != triangles[:, 0])
+    corners, triangles = corners[keep], triangles[keep]
+
+    # The quadric of a vertex is the sum of the squared distances to the planes of its triangles.
+    normals = _face_normals(points, triangles)
+    planes  = numpy.zeros((len(triangles), 4))
+    planes[:, :3] = normals / numpy.maximum(numpy.linalg.norm(normals, axis=1), 1e-12)[:, None]
+    planes[:, 3]  = -numpy.einsum('ij,ij->i', planes[:, :3], points[triangles[:, 0]])
+    face_quadrics = planes[:, :, None] * planes[:, None, :]
+    quadrics = numpy.zeros((len(points), 4, 4))
+    for i in range(3):
+        numpy.add.at(quadrics, triangles[:, i], face_quadrics)
+
+    # Vertices on an open boundary are locked.
+    edges = numpy.sort(triangles[:, [0, 1, 1, 2, 2, 0]].reshape(-1, 2), axis=1)
+    unique_edges, edge_counts = numpy.unique(edges, axis=0, return_counts=True)
+    locked = numpy.zeros(len(points), dtype=bool)
+    locked[unique_edges[edge_counts == 1].ravel()] = True
+
+    homogeneous = numpy.hstack((points, numpy.ones((len(points), 1))))
+    triangles = triangles.tolist()
+    faces_of  = [set() for _ in points]  # Triangles of each vertex.
+    for face, triangle in enumerate(triangles):
+        for vertex in triangle:
+            faces_of[vertex].add(face)
+    alive = [True] * len(triangles)
+    versions = [0] * len(points)  # Incremented when a vertex changes, to skip outdated collapses in the heap.
+
+    def collapse_cost(source, target):
+        quadric = quadrics[source] + quadrics[target]
+        return float(homogeneous[target] @ quadric @ homogeneous[target])
+
+    heap = []
+
+    def push_collapses(vertex):
+        neighbours = {other for face in faces_of[vertex] for other in triangles[face]} - {vertex}
+        for other in neighbours:
+            for source, target in ((vertex, other), (other, vertex)):
+                if not locked[source]:
+                    heapq.heappush(heap, (collapse_cost(source, target), source, target,
+                                          versions[source], versions[target]))
+
+    for vertex in range(len(points)):
+        if not locked[vertex]:
+            push_collapses(vertex)
+
+    radius = numpy.linalg.norm(points - points.mean(axis=0), axis=1).max() if len(points) else 0.0
+    max_cost = (max_error * radius) ** 2
+    count = len(triangles)
+    while count > target_triangles and heap and heap[0][0] <= max_cost:
+        _, source, target, source_version, target_version = heapq.heappop(heap)
+        if versions[source] != source_version or versions[target] != target_version or not faces_of[source]:
+            continue
+
+        # Skip the collapse if it would flip a remaining triangle.
+        removed, moved = [], []
+        for face in faces_of[source]:
+            (removed if target in triangles[face] else moved).append(face)
+        if not removed:
+            continue  # Not an edge anymore.
+        before = [triangles[face] for face in moved]
+        after  = [[target if vertex == source else vertex for vertex in triangle] for triangle in before]
+        before = _face_normals(points, numpy.array(before, dtype=numpy.int64).reshape(-1, 3))
+        after  = _face_normals(points, numpy.array(after, dtype=numpy.int64).reshape(-1, 3))
+        if numpy.any(numpy.einsum('ij,ij->i', before, after) <= 0):
+            continue
+
+        for face in removed:
+            alive[face] = False
+            for vertex in triangles[face]:
+                faces_of[vertex].discard(face)
+        for face in moved:
+            triangles[face] = [target if vertex == source else vertex for vertex in triangles[face]]
+            faces_of[target].add(face)
+        faces_of[source] = set()
+        count -= len(removed)
+
+        quadrics[target] += quadrics[source]
+        versions[source] += 1
+        versions[target] += 1
+        push_collapses(target)
+
+    alive = numpy.array(alive, dtype=bool)
+    return _with_attributes(mesh, welded, corners[alive], numpy.array(triangles, dtype=numpy.int64)[alive])
+
+
+def _with_attributes(mesh, welded, corners, triangles):
+    """
+    The mesh of the simplified 'triangles' (of welded positions). Each corner takes the split vertex at its new
+    position with the texture coordinate and normal most similar to those of the corner's original split vertex.
+    """
+    attributes = numpy.hstack((mesh.texture_coordinates, mesh.normals)).astype(numpy.float64)
+    corners, triangles = corners.ravel(), triangles.ravel()
+
+    # Split vertices of each welded position, as 'split[starts[p]:starts[p] + counts[p]]'.
+    split  = numpy.argsort(welded, kind='stable')
+    counts = numpy.bincount(welded, minlength=welded.max() + 1 if len(welded) else 0)
+    starts = numpy.cumsum(counts) - counts
+
+    # Compare each corner with all split vertices at its position (padded with the first one).
+    width = int(counts[triangles].max()) if len(triangles) else 0
+    offsets = numpy.minimum(numpy.arange(width), counts[triangles, None] - 1)
+    candidates = split[starts[triangles, None] + offsets]
+    distances  = numpy.sum(numpy.square(attributes[candidates] - attributes[corners, None]), axis=-1)
+    chosen = candidates[numpy.arange(len(corners)), numpy.argmin(distances, axis=1)] if width else corners
+
+    used, indices = numpy.unique(chosen, return_inverse=True)
+    return Mesh(mesh.positions[used], mesh.texture_coordinates[used], mesh.normals[used],
+                indices.ravel().astype(numpy.uint32))
+
+
+def lod_chain(mesh, ratios=LOD_RATIOS, max_errors=LOD_ERRORS):
+    """
+    Meshes of 'mesh' with the fraction 'ratios' of its triangles, each simplified from the previous one with at most
+    'max_errors' error and optimized for the vertex cache (see 'mesh_optimization'). Levels are drawn at half the
+    size of the previous one, so the default errors double to look the same on screen.
+    """
+    assert len(max_errors) >= len(ratios) - 1, "Must have an error for each simplified level of detail!"
+    triangles = len(mesh.indices) // 3
+    meshes = [optimize_mesh(mesh)]
+    for ratio, max_error in zip(ratios[1:], max_errors):
+        meshes.append(optimize_mesh(simplify_mesh(meshes[-1], int(triangles * ratio), max_error)))
+    return meshes
+
+
+def lod_cache_paths(path, cache_directory, ratios=LOD_RATIOS, max_errors=LOD_ERRORS):
+    """
+    Paths of the cached levels of detail of the OBJ file at 'path' (see 'mesh_cache.cache_path'). The first level is
+    the optimized mesh, shared with 'mesh_cache.load_cached_model'.
+    """
+    variants = ['optimized'] + [
+        'lod{}-{:g}-{:g}'.format(level, ratio, max_error)
+        for level, (ratio, max_error) in enumerate(zip(ratios[1:], max_errors), start=1)
+    ]
+    return [cache_path(path, cache_directory, variant) for variant in variants]
+
+
+def save_lods(path, cache_directory, ratios=LOD_RATIOS, max_errors=LOD_ERRORS):
+    """Writes the levels of detail of the OBJ file at 'path' to 'cache_directory'. Returns their meshes."""
+    meshes = lod_chain(parse_obj(path), ratios, max_errors)
+    for cached, mesh in zip(lod_cache_paths(path, cache_directory, ratios, max_errors), meshes):
+        save_mesh(cached, mesh)
+    return meshes
+
+
+def load_cached_lods(path, cache_directory=None, use_vao=True, ratios=LOD_RATIOS, max_errors=LOD_ERRORS,
+                     lod_sizes=LOD_SIZES):
+    """
+    Like 'mesh_cache.load_cached_model', but loads the levels of detail of the OBJ file at 'path', which are only
+    simplified the first time or after it changed.
+    """
+    if cache_directory is None:
+        cache_directory = os.path.join(os.path.dirname(path), 'cache')
+    paths = lod_cache_paths(path, cache_directory, ratios, max_errors)
+
+    # All levels are opened before any is uploaded, so nothing is uploaded twice if one is missing (see
+    # 'mesh_cache.load_cached_model').
+    try:
+        meshes = [load_mesh(cached) for cached in paths]
+    except FileNotFoundError:
+        save_lods(path, cache_directory, ratios, max_errors)
+        meshes = [load_mesh(cached) for cached in paths]
+    return LevelsOfDetail([upload_mesh(*mesh, use_vao=use_vao) for mesh in meshes], lod_sizes)
+
+
+def projected_sizes(matrices, bounds, perspective, view):
+    """
+    Size of the bounding sphere of each instance with the (N, 4, 4) transformation 'matrices' on screen, as the
+    fraction of the screen height its radius covers. It's 1 for a sphere filling the screen vertically.
+    """
+    matrices = numpy.asarray(matrices).reshape(-1, 4, 4)
+    centers, radii = bounding_spheres(matrices, bounds.center, bounds.radius)
+    depths = -(centers @ view[2, :3] + view[2, 3])  # The camera looks down negative z in view space.
+
+    # A distance 'd' in front of the camera projects to a screen of height 2 * d / perspective[1][1].
+    return radii * perspective[1][1] / numpy.maximum(depths, 1e-6)
+
+
+def select_lods(sizes, lod_sizes=LOD_SIZES):
+    """Level of detail of each projected size, i.e. the number of 'lod_sizes' (descending) it's below."""
+    sizes = numpy.asarray(sizes)
+    lods  = numpy.zeros(len(sizes), dtype=numpy.int64)
+    for size in lod_sizes:
+        lods += sizes < size
+    return lods
+
+
+class LevelsOfDetail:
+    """The models of a mesh's levels of detail (see 'lod_chain'), and the projected sizes to switch between them."""
+
+    def __init__(self, models, lod_sizes=LOD_SIZES):
+        assert len(lod_sizes) >= len(models) - 1, "Must have a size to switch at for each level of detail!"
+        self.models = models
+        self.lod_sizes = lod_sizes[:len(models) - 1]
+
+    @property
+    def bounds(self):
+        return self.models[0].bounds
+
+    def select(self, matrices, perspective, view):
+        """Level of detail of each instance with the (N, 4, 4) transformation 'matrices'."""
+        return select_lods(projected_sizes(matrices, self.bounds, perspective, view), self.lod_sizes)
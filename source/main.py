@@ -7,26 +7,30 @@ from ctypes import cast, pointer, POINTER, byref, sizeof, create_string_buffer,
 from math import cos, sin, tan, pi
 
 
-from source.model   import load_model, create_cube
-from source.texture import load_texture
-from source.text    import Font
+from source.model   import create_cube
+from source.lod     import LevelsOfDetail, load_cached_lods
 from source.shader  import Shader
-from source.linear_algebra import Vector2, Vector3, transformation_matrix, perspective_matrix as create_perspective_matrix
-
-# We want a stencil buffer with 8-bit values. Don't know why we have to specify double_buffer,
-# but it don't work otherwise. The other default values are good.
-config = pyglet.gl.Config(stencil_size=8, double_buffer=True)
-window = Window(width=480, height=480, config=config)
-
-
-class Transform:
-    def __init__(self, location, rotation, scale):
-        self.location = Vector3(*location)
-        self.rotation = Vector3(*rotation)
-        self.scale    = Vector3(*scale)
+from source.asset_pipeline import AssetPipeline, format_timings
+from source.asset_streaming import AssetStreamer
+from source.entity  import Transform
+from source.bvh     import AABBTree
+from source.culling import FrustumCuller
+from source.instancing import InstanceBuffer, supports_instancing
+from source.render_queue import RenderQueue
+from source.gl_state import gl_state
+from source.linear_algebra import Vector2, Vector3, perspective_matrix as create_perspective_matrix
+from source.linear_algebra import transform_box, screen_ray
+
+TEXTURE_PATHS = [
+    '../resources/textures/Container.png',
+    '../resources/textures/ContainerSpecular.png',
+    '../resources/textures/ContainerEmission.png',
+    '../resources/textures/AluminiumPlate.png',
+]
+FONT_PATH = '../resources/fonts/arial.fnt'
 
-    def matrix(self):
-        return transformation_matrix(*self.location, *self.rotation, *self.scale)
+# Applied after an entity's transformation to make the selected entity's outline slightly bigger.
+OUTLINE_SCALE = numpy.diag((1.1, 1.1, 1.1, 1.0)).astype(GLfloat)
 
 
 def get_all_entities(mapping):
@@ -41,161 +45,295 @@ def get_all_entities(mapping):
         assert False
 
 
-def get_selected_entity_transform():
-    entity = all_entities[entity_selected]
-    if isinstance(entity, list):
-        transform = entity[0]
-    else:
-        transform = entity
-    return transform
-
-
-# Hack until we make better data structure for entities.
-def get_entity_model_index(entity):
-    for model_index, texture_mapping in entities.items():
-        for texture_index, entity_list in texture_mapping.items():
-            for candidate in entity_list:
-                if candidate == entity:
-                    return model_index
-    for model_index, entity_list in lights.items():
-        for candidate in entity_list:
-            if candidate == entity:
-                return model_index
-    return None
-
-
-@window.event
-def on_mouse_drag(x, y, dx, dy, buttons, modifiers):
-    transform = get_selected_entity_transform()
-    if buttons == mouse.LEFT:
-        transform.location[0] += dx / 250
-        transform.location[1] += dy / 250
-    elif buttons == mouse.MIDDLE:  # Scroll button.
-        transform.scale[0] += dx / 250
-        transform.scale[1] += dy / 250
-    elif buttons == mouse.RIGHT:
-        transform.rotation[1] += dx / 250
-        transform.rotation[0] -= dy / 250
-
-
-@window.event
-def on_mouse_scroll(x, y, scroll_x, scroll_y):
-    transform = get_selected_entity_transform()
-    transform.location[2] -= scroll_y / 10
-    transform.location[0] += scroll_x / 10
-
-
-@window.event
-def on_key_press(symbol, modifiers):
-    global entity_selected
-    if key.LEFT == symbol:
-        entity_selected = (entity_selected - 1) % len(all_entities)
-    elif key.RIGHT == symbol:
-        entity_selected = (entity_selected + 1) % len(all_entities)
-
-
-@window.event
-def on_draw():
-    # Must be set here because we turn those of when rendering using stencil buffer.
-    glEnable(GL_DEPTH_TEST)
-    glEnable(GL_CULL_FACE)
-    glCullFace(GL_BACK)
-    glEnable(GL_STENCIL_TEST)
-    glStencilOp(GL_KEEP, GL_KEEP,
-                GL_REPLACE)  # Keep if depth test fails, keep if stencil test fails, replace if both succeed.
-
-    glStencilFunc(GL_ALWAYS, 1, 0xFF)  # Always fill the stencil buffer.
-    glStencilMask(0xFF)  # 0xFF turns on writes the stencil mask. 0x00 disables writes.
-
-    # Apparently, if we've haven't enabled writes for the stencil mask before this line, the stencil mask won't be cleared.
-    glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT | GL_STENCIL_BUFFER_BIT)
-
-    # Light shader
-    simple_program.enable()
-    simple_program.load_uniform_matrix(perspective=perspective_matrix, view=camera.matrix())
-
-    for model_index, entity_list in lights.items():
-        model = models[model_index]
-        model.enable()
-
-        for entity in entity_list:
-            transform, color, attenuation = entity
-
-            simple_program.load_uniform_matrix(transformation=transform.matrix())
-            simple_program.load_uniform_floats(color=color)
-
-            model.render()
-
-    # Object shader
-    program.enable()
-    program.load_uniform_matrix(perspective=perspective_matrix, view=camera.matrix())
-
-    for i, entity in enumerate(get_all_entities(lights)):
-        program.load_uniform_floats(**{'light[' + str(i) + '].position': entity[0].location})
-        program.load_uniform_floats(**{'light[' + str(i) + '].color': entity[1]})
-        program.load_uniform_floats(**{'light[' + str(i) + '].constant': entity[2][0]})
-        program.load_uniform_floats(**{'light[' + str(i) + '].linear': entity[2][1]})
-        program.load_uniform_floats(**{'light[' + str(i) + '].quadratic': entity[2][2]})
+def get_entity_transform(entity):
+    return entity[0] if isinstance(entity, list) else entity
 
-    for model_index, texture_mapping in entities.items():
-        model = models[model_index]
-        model.enable()
 
-        for texture_indices, entity_list in texture_mapping.items():
+def view_depths(view, matrices):
+    """Distance in front of the camera of each of the (N, 4, 4) transformation matrices' location."""
+    # The camera looks down negative z in view space.
+    return -(matrices[:, :3, 3] @ view[2, :3] + view[2, 3])
 
-            # Make bindings for texture.
-            for index, texture_index in enumerate(texture_indices):
-                glActiveTexture(GL_TEXTURE0 + index)
-                texture = textures[texture_index]
-                glBindTexture(GL_TEXTURE_2D, texture.id)
-            texture_names = {'material.diffuse': 0, 'material.specular': 1, 'material.emission': 2}
-            program.load_uniform_sampler(**texture_names)
-            program.load_uniform_floats(**{'material.shininess': 32})
 
-            for entity in entity_list:
-                transform = entity
-
-                # Prepare entities of specific model and texture, and draw.
-                program.load_uniform_matrix(transformation=transform.matrix())
-                model.render()
+class Application:
+    """
+    The window, the assets and the scene, and the window's event handlers. It's created by 'main' instead of on import,
+    as the asset pipeline's worker processes import this module.
+    """
 
-    # Stencil shader
-    glDisable(GL_DEPTH_TEST)  # Disable depth tests.
-    glStencilFunc(GL_NOTEQUAL, 1, 0xFF)  # Only draw where the stencil buffer isn't 1.
-    glStencilMask(0x00)  # Disable writes.
+    def __init__(self):
+        # The font is decoded in another process while the window and shaders are created, and uploaded after. The
+        # textures are streamed in while the first frames are drawn with placeholders.
+        self.asset_pipeline = AssetPipeline()
+        self.asset_pipeline.submit(FONT_PATH)
+
+        # We want a stencil buffer with 8-bit values. Don't know why we have to specify double_buffer,
+        # but it don't work otherwise. The other default values are good.
+        config = pyglet.gl.Config(stencil_size=8, double_buffer=True)
+        self.window = Window(width=480, height=480, config=config)
+        self.window.push_handlers(self)
+
+        assets, timings = self.asset_pipeline.load()
+        print(format_timings(timings, self.asset_pipeline.elapsed))
+
+        self.font_arial = assets[FONT_PATH]
+        self.text_transform = Transform(location=(0, 0, 0), rotation=(0, 0, 0), scale=(10, 10, 10))
+
+        if supports_instancing():
+            # Same shader, but the transformation is a per-instance attribute (which must come after the model's
+            # attributes).
+            instanced_vertex_shader = object_shaders[0].replace(
+                'uniform mat4 transformation', 'attribute mat4 transformation'
+            )
+            attributes = ['position', 'texture_coordinate', 'normal', 'transformation']
+            uniforms   = ['perspective', 'view', *light_uniforms, *material_uniforms]
+            self.program    = Shader.create(instanced_vertex_shader, object_shaders[1], attributes, uniforms)
+            instance_buffer = InstanceBuffer.create()
+        else:
+            attributes = ['position', 'texture_coordinate', 'normal']
+            uniforms   = ['transformation', 'perspective', 'view', *light_uniforms, *material_uniforms]
+            self.program    = Shader.create(*object_shaders, attributes, uniforms)
+            instance_buffer = None
+
+        simple_attributes = ['position']
+        simple_uniforms   = ['transformation', 'perspective', 'view', 'color']
+        self.simple_program = Shader.create(*simple_shaders, simple_attributes, simple_uniforms)
+
+        self.render_queue = RenderQueue(
+            instance_buffers={self.program: instance_buffer} if instance_buffer is not None else {}
+        )
+
+        simple_2D_attributes = ['position']
+        simple_2D_uniforms   = ['transformation', 'perspective', 'view', 'color']
+        self.simple_2D_program = Shader.create(*simple_2D_shaders, simple_2D_attributes, simple_2D_uniforms)
+
+        self.levels_of_detail = [
+            LevelsOfDetail([create_cube()]), load_cached_lods('../resources/models/sphere.obj')
+        ]
+        self.models = [lods.models[0] for lods in self.levels_of_detail]
+
+        self.asset_streamer = AssetStreamer.create(executor=self.asset_pipeline.executor)
+        self.textures = [self.asset_streamer.load_texture(path) for path in TEXTURE_PATHS]
+        pyglet.clock.schedule(self.asset_streamer.update)
+
+        self.entities = {
+            CUBE  : {
+                (CONTAINER_DIFFUSE, CONTAINER_SPECULAR, CONTAINER_EMISSION): [
+                    Transform(location=[randint(-6, 6), randint(-6, 6), randint(-8, -2)], rotation=[0, 0, 0],
+                              scale=[1, 1, 1])
+                    for i in range(5)],
+                (ALUMINIUM_PLATE,)                                         : [
+                    Transform(location=[randint(-6, 6), randint(-6, 6), randint(-8, -2)], rotation=[0, 0, 0],
+                              scale=[1, 1, 1])
+                    for i in range(5)]
+            },
+            SPHERE: {
+                (CONTAINER_DIFFUSE, CONTAINER_SPECULAR, CONTAINER_EMISSION): [
+                    Transform(location=[randint(-6, 6), randint(-6, 6), randint(-8, -2)], rotation=[0, 0, 0],
+                              scale=[1, 1, 1])
+                    for i in range(5)],
+                (ALUMINIUM_PLATE,)                                         : [
+                    Transform(location=[randint(-6, 6), randint(-6, 6), randint(-8, -2)], rotation=[0, 0, 0],
+                              scale=[1, 1, 1])
+                    for i in range(5)]
+            },
+        }
 
-    transform = get_selected_entity_transform()
-    sx, sy, sz = transform.scale
-    # Make the transform slightly bigger so it's visible.
-    transform = transformation_matrix(*transform.location, *transform.rotation, sx * 1.1, sy * 1.1, sz * 1.1)
-    model_index = get_entity_model_index(all_entities[entity_selected])
-    if model_index is not None:
-        model = models[model_index]
+        self.lights = {  # lights have no material but instead has two extra entity attributes: color and attenuation.
+            CUBE  : [
+                [Transform(location=[randint(-6, 6), randint(-6, 6), randint(-8, -2)], rotation=[0, 0, 0],
+                           scale=[1, 1, 1]),
+                 [0.5, 1.0, 1.0], [1.0, 0.009, 0.032]] for i in range(2)],
+            SPHERE: [
+                [Transform(location=[randint(-6, 6), randint(-6, 6), randint(-8, -2)], rotation=[0, 0, 0],
+                           scale=[1, 1, 1]),
+                 [0.5, 1.0, 1.0], [1.0, 0.009, 0.032]] for i in range(2)]
+        }
 
-        simple_program.enable()
-        simple_program.load_uniform_matrix(perspective=perspective_matrix, view=camera.matrix(),
-                                           transformation=transform)
-        simple_program.load_uniform_floats(color=[255, 0, 255])
+        self.perspective_matrix = create_perspective_matrix(60, self.window.width / self.window.height, 0.1, 100)
+        self.culler = FrustumCuller()
+        self.camera = Transform(location=[0, 0, -10], rotation=[0, 0, 0], scale=[1, 1, 1])
+
+        self.entity_selected = 0
+        self.all_entities = (
+            get_all_entities(self.entities) + get_all_entities(self.lights) + [self.camera, self.text_transform]
+        )
+
+        # Boxes of all entities with a model, for picking entities with the mouse.
+        self.picking_tree = AABBTree()
+        self.picking_proxies = {}  # Index in 'all_entities' to proxy in 'picking_tree'.
+        for index, entity in enumerate(self.all_entities):
+            model_index = self.get_entity_model_index(entity)
+            if model_index is not None:
+                bounds = self.models[model_index].bounds
+                self.picking_proxies[index] = self.picking_tree.insert(
+                    *transform_box(get_entity_transform(entity).matrix(), bounds.minimum, bounds.maximum), data=index
+                )
+
+    def get_selected_entity_transform(self):
+        return get_entity_transform(self.all_entities[self.entity_selected])
+
+    # Hack until we make better data structure for entities.
+    def get_entity_model_index(self, entity):
+        for model_index, texture_mapping in self.entities.items():
+            for texture_index, entity_list in texture_mapping.items():
+                for candidate in entity_list:
+                    if candidate == entity:
+                        return model_index
+        for model_index, entity_list in self.lights.items():
+            for candidate in entity_list:
+                if candidate == entity:
+                    return model_index
+        return None
+
+    def update_picking_tree(self, index):
+        """Refits the box of the entity at 'index' in 'all_entities', after it has been moved, rotated or scaled."""
+        if index in self.picking_proxies:
+            entity = self.all_entities[index]
+            bounds = self.models[self.get_entity_model_index(entity)].bounds
+            box = transform_box(get_entity_transform(entity).matrix(), bounds.minimum, bounds.maximum)
+            self.picking_tree.refit(self.picking_proxies[index], *box)
+
+    def on_mouse_press(self, x, y, button, modifiers):
+        if button == mouse.LEFT:
+            origin, direction = screen_ray(
+                x, y, self.window.width, self.window.height, self.perspective_matrix, self.camera.matrix()
+            )
+            hit = self.picking_tree.ray_cast(origin, direction)
+            if hit is not None:
+                self.entity_selected = hit[0]
+
+    def on_mouse_drag(self, x, y, dx, dy, buttons, modifiers):
+        transform = self.get_selected_entity_transform()
+        if buttons == mouse.LEFT:
+            transform.location[0] += dx / 250
+            transform.location[1] += dy / 250
+        elif buttons == mouse.MIDDLE:  # Scroll button.
+            transform.scale[0] += dx / 250
+            transform.scale[1] += dy / 250
+        elif buttons == mouse.RIGHT:
+            transform.rotation[1] += dx / 250
+            transform.rotation[0] -= dy / 250
+        self.update_picking_tree(self.entity_selected)
+
+    def on_mouse_scroll(self, x, y, scroll_x, scroll_y):
+        transform = self.get_selected_entity_transform()
+        transform.location[2] -= scroll_y / 10
+        transform.location[0] += scroll_x / 10
+        self.update_picking_tree(self.entity_selected)
+
+    def on_key_press(self, symbol, modifiers):
+        if key.LEFT == symbol:
+            self.entity_selected = (self.entity_selected - 1) % len(self.all_entities)
+        elif key.RIGHT == symbol:
+            self.entity_selected = (self.entity_selected + 1) % len(self.all_entities)
+
+    def on_draw(self):
+        gl_state.reset_statistics()
+
+        # Must be set here because we turn those of when rendering using stencil buffer. The state cache drops the calls
+        # that doesn't change anything.
+        gl_state.enable(GL_DEPTH_TEST)
+        gl_state.enable(GL_CULL_FACE)
+        gl_state.set_cull_face(GL_BACK)
+        gl_state.enable(GL_STENCIL_TEST)
+        # Keep if depth test fails, keep if stencil test fails, replace if both succeed.
+        gl_state.set_stencil_op(GL_KEEP, GL_KEEP, GL_REPLACE)
+
+        gl_state.set_stencil_func(GL_ALWAYS, 1, 0xFF)  # Always fill the stencil buffer.
+        gl_state.set_stencil_mask(0xFF)  # 0xFF turns on writes the stencil mask. 0x00 disables writes.
+
+        # Apparently, if we've haven't enabled writes for the stencil mask before this line, the stencil mask won't be
+        # cleared.
+        glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT | GL_STENCIL_BUFFER_BIT)
+
+        view = self.camera.matrix()
+        self.culler.begin_frame(self.perspective_matrix, view)
+
+        # Per frame uniforms. The shaders keep them when the render queue switches between them.
+        self.simple_program.enable()
+        self.simple_program.load_uniform_matrix(perspective=self.perspective_matrix, view=view)
+
+        self.program.enable()
+        self.program.load_uniform_matrix(perspective=self.perspective_matrix, view=view)
+
+        for i, entity in enumerate(get_all_entities(self.lights)):
+            self.program.load_uniform_floats(**{'light[' + str(i) + '].position': entity[0].location})
+            self.program.load_uniform_floats(**{'light[' + str(i) + '].color': entity[1]})
+            self.program.load_uniform_floats(**{'light[' + str(i) + '].constant': entity[2][0]})
+            self.program.load_uniform_floats(**{'light[' + str(i) + '].linear': entity[2][1]})
+            self.program.load_uniform_floats(**{'light[' + str(i) + '].quadratic': entity[2][2]})
+
+        texture_names = {'material.diffuse': 0, 'material.specular': 1, 'material.emission': 2}
+        self.program.load_uniform_sampler(**texture_names)
+        self.program.load_uniform_floats(**{'material.shininess': 32})
+
+        # Submit the visible lights and entities. The render queue sorts them to minimize the state changes.
+        # Each instance is drawn with the level of detail of its size on screen.
+        for model_index, entity_list in self.lights.items():
+            lods = self.levels_of_detail[model_index]
+            matrices = numpy.array([transform.matrix() for transform, _, _ in entity_list])
+            visible  = self.culler.cull(matrices, lods.bounds)
+            levels   = lods.select(matrices[visible], self.perspective_matrix, view)
+            for i, depth, level in zip(visible, view_depths(view, matrices[visible]), levels):
+                self.render_queue.submit(self.simple_program, lods.models[level], (), matrices[i], depth,
+                                         uniforms={'color': entity_list[i][1]})
+
+        for model_index, texture_mapping in self.entities.items():
+            lods = self.levels_of_detail[model_index]
+            for texture_indices, entity_list in texture_mapping.items():
+                texture_set = tuple(self.textures[texture_index] for texture_index in texture_indices)
+                matrices = numpy.array([transform.matrix() for transform in entity_list])
+                matrices = matrices[self.culler.cull(matrices, lods.bounds)]
+                levels   = lods.select(matrices, self.perspective_matrix, view)
+                for matrix, depth, level in zip(matrices, view_depths(view, matrices), levels):
+                    self.render_queue.submit(self.program, lods.models[level], texture_set, matrix, depth)
+
+        self.render_queue.flush()
+
+        # Stencil shader
+        gl_state.disable(GL_DEPTH_TEST)  # Disable depth tests.
+        gl_state.set_stencil_func(GL_NOTEQUAL, 1, 0xFF)  # Only draw where the stencil buffer isn't 1.
+        gl_state.set_stencil_mask(0x00)  # Disable writes.
+
+        # Make the transform slightly bigger so it's visible. Scaling is applied first, so this is the same as scaling
+        # the entity's scale, but reuses its cached matrix.
+        transform = self.get_selected_entity_transform().matrix() @ OUTLINE_SCALE
+        model_index = self.get_entity_model_index(self.all_entities[self.entity_selected])
+        if model_index is not None:
+            model = self.models[model_index]
+
+            self.simple_program.enable()
+            self.simple_program.load_uniform_matrix(perspective=self.perspective_matrix, view=self.camera.matrix(),
+                                                    transformation=transform)
+            self.simple_program.load_uniform_floats(color=[255, 0, 255])
+
+            model.enable()
+            model.render()
 
-        model.enable()
-        model.render()
+        # Render text
+        gl_state.disable(GL_DEPTH_TEST)
+        gl_state.disable(GL_CULL_FACE)
 
-    # Render text
-    glDisable(GL_DEPTH_TEST)
-    glDisable(GL_CULL_FACE)
+        text = self.font_arial.text_model("Hello", anchor_center=True)
 
-    text = font_arial.text_model("Hello", anchor_center=True)
+        self.simple_2D_program.enable()
+        self.simple_2D_program.load_uniform_matrix(perspective=self.perspective_matrix, view=self.camera.matrix(),
+                                                   transformation=self.text_transform.matrix())
+        self.simple_2D_program.load_uniform_floats(color=[255, 255, 255])
 
-    simple_2D_program.enable()
-    simple_2D_program.load_uniform_matrix(perspective=perspective_matrix, view=camera.matrix(),
-                                          transformation=text_transform.matrix())
-    simple_2D_program.load_uniform_floats(color=[255, 255, 255])
+        gl_state.bind_texture(0, GL_TEXTURE_2D, self.font_arial.texture.id)
 
-    glActiveTexture(GL_TEXTURE0)
-    glBindTexture(GL_TEXTURE_2D, font_arial.texture.id)
+        text.enable()
+        text.render()
 
-    text.enable()
-    text.render()
+        caption = 'Visible: {}, culled: {}, state changes: {} ({} avoided), GL calls elided: {}/{}, loading: {}'.format(
+            self.culler.visible, self.culler.culled, self.render_queue.state_changes,
+            self.render_queue.state_changes_avoided, gl_state.elided, gl_state.elided + gl_state.calls,
+            self.asset_streamer.pending
+        )
+        if self.window.caption != caption:
+            self.window.set_caption(caption)
 
 
 # Create shaders.
@@ -392,71 +530,26 @@ simple_2D_shaders = [
     """
 ]
 
-font_arial = Font('../resources/fonts/arial.fnt')
-text_transform = Transform(location=(0, 0, 0), rotation=(0, 0, 0), scale=(10, 10, 10))
-
 light_uniforms    = ['light[' + str(i) + attribute for attribute in ('].position', '].color', '].intensity', '].constant', '].linear', '].quadratic') for i in range(4)]
 material_uniforms = ['material.' + x for x in ('diffuse', 'specular', 'emission', 'shininess')]
 
-attributes = ['position', 'texture_coordinate', 'normal']
-uniforms   = ['transformation', 'perspective', 'view', *light_uniforms, *material_uniforms]
-program    = Shader.create(*object_shaders, attributes, uniforms)
-
-simple_attributes = ['position']
-simple_uniforms   = ['transformation', 'perspective', 'view', 'color']
-simple_program    = Shader.create(*simple_shaders, simple_attributes, simple_uniforms)
-
-simple_2D_attributes = ['position']
-simple_2D_uniforms   = ['transformation', 'perspective', 'view', 'color']
-simple_2D_program    = Shader.create(*simple_2D_shaders, simple_2D_attributes, simple_2D_uniforms)
-
 CUBE = 0
 SPHERE = 1
-models = [create_cube(), load_model('../resources/models/sphere.obj')]
 
 CONTAINER_DIFFUSE = 0
 CONTAINER_SPECULAR = 1
 CONTAINER_EMISSION = 2
 ALUMINIUM_PLATE = 3
-textures = [
-    load_texture('../resources/textures/Container.png'),
-    load_texture('../resources/textures/ContainerSpecular.png'),
-    load_texture('../resources/textures/ContainerEmission.png'),
-    load_texture('../resources/textures/AluminiumPlate.png')
-]
 
-entities = {
-    CUBE  : {
-        (CONTAINER_DIFFUSE, CONTAINER_SPECULAR, CONTAINER_EMISSION): [
-            Transform(location=[randint(-6, 6), randint(-6, 6), randint(-8, -2)], rotation=[0, 0, 0], scale=[1, 1, 1])
-            for i in range(5)],
-        (ALUMINIUM_PLATE,)                                         : [
-            Transform(location=[randint(-6, 6), randint(-6, 6), randint(-8, -2)], rotation=[0, 0, 0], scale=[1, 1, 1])
-            for i in range(5)]
-    },
-    SPHERE: {
-        (CONTAINER_DIFFUSE, CONTAINER_SPECULAR, CONTAINER_EMISSION): [
-            Transform(location=[randint(-6, 6), randint(-6, 6), randint(-8, -2)], rotation=[0, 0, 0], scale=[1, 1, 1])
-            for i in range(5)],
-        (ALUMINIUM_PLATE,)                                         : [
-            Transform(location=[randint(-6, 6), randint(-6, 6), randint(-8, -2)], rotation=[0, 0, 0], scale=[1, 1, 1])
-            for i in range(5)]
-    },
-}
-
-lights = {  # lights have no material but instead has two extra entity attributes: color and attenuation.
-    CUBE  : [
-        [Transform(location=[randint(-6, 6), randint(-6, 6), randint(-8, -2)], rotation=[0, 0, 0], scale=[1, 1, 1]),
-         [0.5, 1.0, 1.0], [1.0, 0.009, 0.032]] for i in range(2)],
-    SPHERE: [
-        [Transform(location=[randint(-6, 6), randint(-6, 6), randint(-8, -2)], rotation=[0, 0, 0], scale=[1, 1, 1]),
-         [0.5, 1.0, 1.0], [1.0, 0.009, 0.032]] for i in range(2)]
-}
-
-perspective_matrix = create_perspective_matrix(60, window.width / window.height, 0.1, 100)
-camera = Transform(location=[0, 0, -10], rotation=[0, 0, 0], scale=[1, 1, 1])
-
-entity_selected = 0
-all_entities = get_all_entities(entities) + get_all_entities(lights) + [camera, text_transform]
-
-pyglet.app.run()
+
+def main():
+    """Sets up the window, the assets and the scene (see 'Application'), and runs the application."""
+    application = Application()
+    try:
+        pyglet.app.run()
+    finally:
+        application.asset_pipeline.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+from collections import namedtuple
+
+import numpy
+
+
+# Vertex data of a model, before it's uploaded. Each vertex has a position (N, 3), a texture coordinate (N, 2) and a
+# normal (N, 3), and 'indices' are the (M,) vertex indices of the triangles.
+Mesh = namedtuple('Mesh', 'positions, texture_coordinates, normals, indices')
+
+
+# Line types of an OBJ file, by the keyword starting the line.
+_KEYWORDS = b'v ', b'vt ', b'vn ', b'f '
+
+
+def _split_by_keyword(data):
+    """
+    The text of the lines starting with each of the '_KEYWORDS' (with the keywords replaced by spaces) and their
+    number, from the bytes of an OBJ file. It's done with numpy over all bytes at once instead of line by line.
+    """
+    data = numpy.frombuffer(data + b'\n   ', dtype=numpy.uint8).copy()  # Padded to look ahead of the last line.
+    newlines = numpy.flatnonzero(data == ord('\n'))
+    starts   = numpy.concatenate(([0], newlines[:-1] + 1))
+    lengths  = newlines + 1 - starts
+
+    line_keywords = numpy.zeros(len(starts), dtype=numpy.uint8)  # Index in '_KEYWORDS' plus 1, or 0 for other lines.
+    for i, keyword in enumerate(_KEYWORDS, start=1):
+        matches = numpy.ones(len(starts), dtype=bool)
+        for offset, character in enumerate(keyword):
+            matches &= data[numpy.minimum(starts + offset, len(data) - 1)] == character
+        line_keywords[matches] = i
+        for offset in range(len(keyword)):
+            data[starts[matches] + offset] = ord(' ')
+
+    byte_keywords = numpy.repeat(line_keywords, lengths)
+    return [
+        (data[:len(byte_keywords)][byte_keywords == i].tobytes(), int(numpy.count_nonzero(line_keywords == i)))
+        for i in range(1, len(_KEYWORDS) + 1)
+    ]
+
+
+def _parse_floats(text, count, dimension):
+    """The first 'dimension' numbers of each of the 'count' lines in 'text' as a (count, dimension) float32 array."""
+    numbers = numpy.fromstring(text, dtype=numpy.float32, sep=' ')
+    if len(numbers) != dimension * count:  # Some lines have optional numbers (e.g. 'w'), so do it line by line.
+        numbers = numpy.array([line.split()[:dimension] for line in text.splitlines()], dtype=numpy.float32)
+    return numbers.reshape(-1, dimension)
+
+
+def _with_missing(data):
+    """'data' with a row of zeros first, for corners that don't reference any (index 0)."""
+    return numpy.concatenate((numpy.zeros((1, data.shape[1]), dtype=data.dtype), data))
+
+
+def parse_obj(path):
+    """
+    Reads the triangles of the Wavefront OBJ file at 'path' as a 'Mesh'. Polygons are split into triangles, and face
+    corners with the same position, texture coordinate and normal share a vertex (in the order they first appear).
+    Corners must all be given like 'v/vt/vn', 'v//vn', 'v/vt' or 'v', with positive indices.
+    """
+    with open(path, 'rb') as file:
+        (v, v_count), (vt, vt_count), (vn, vn_count), (faces, face_count) = _split_by_keyword(file.read())
+
+    positions           = _parse_floats(v,  v_count,  3)
+    texture_coordinates = _parse_floats(vt, vt_count, 2)
+    normals             = _parse_floats(vn, vn_count, 3)
+
+    if face_count == 0:
+        empty = numpy.zeros(0, dtype=numpy.int64)
+        return Mesh(positions[empty], texture_coordinates[empty], normals[empty], empty.astype(numpy.uint32))
+
+    # Parse the corners to (position, texture coordinate, normal) indices, where 0 means the corner doesn't have one.
+    first = faces.split(maxsplit=1)[0]
+    columns = {0: (0,), 1: (0, 1), 2: (0, 2) if b'//' in first else (0, 1, 2)}[first.count(b'/')]
+    numbers = numpy.fromstring(faces.replace(b'/', b' '), dtype=numpy.int64, sep=' ').reshape(-1, len(columns))
+
+    if len(numbers) != 3 * face_count:
+        # Not only triangles, so split the polygons into triangle fans.
+        corners = numpy.array([len(face.split()) for face in faces.splitlines()])
+        assert len(numbers) == corners.sum(), "All face corners must have the same format!"
+        starts = numpy.cumsum(corners) - corners
+        triangles = numpy.concatenate([
+            numpy.stack((start + numpy.zeros(count - 2, dtype=numpy.int64), start + numpy.arange(1, count - 1),
+                         start + numpy.arange(2, count)), axis=-1) for start, count in zip(starts, corners)
+        ])
+        numbers = numbers[triangles.ravel()]
+
+    references = numpy.zeros((len(numbers), 3), dtype=numpy.int64)
+    references[:, columns] = numbers
+    assert references[:, 0].min() > 0, "Only positive (absolute) indices are supported!"
+
+    # Corners referencing the same data share a vertex. The references are packed into a single integer to be unique.
+    sizes = numpy.array([len(positions), len(texture_coordinates), len(normals)], dtype=numpy.int64) + 1
+    keys  = (references[:, 0] * sizes[1] + references[:, 1]) * sizes[2] + references[:, 2]
+    _, first_corners, inverse = numpy.unique(keys, return_index=True, return_inverse=True)
+
+    order = numpy.argsort(first_corners)  # Number the vertices in the order they first appear, like the faces.
+    vertex_of_key = numpy.empty_like(order)
+    vertex_of_key[order] = numpy.arange(len(order))
+
+    references = references[first_corners[order]]
+    return Mesh(
+        positions=_with_missing(positions)[references[:, 0]],
+        texture_coordinates=_with_missing(texture_coordinates)[references[:, 1]],
+        normals=_with_missing(normals)[references[:, 2]],
+        indices=vertex_of_key[inverse.ravel()].astype(numpy.uint32),
+    )
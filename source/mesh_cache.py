@@ -0,0 +1,220 @@
+"""
+A binary format of uploadable model data, used to cache parsed OBJ files. A file is laid out as:
+
+    header      magic, version, vertex count, index count, index size (2 or 4 bytes) and attribute count
+    attributes  name, dimension, OpenGL type and normalized flag of each attribute of the vertex layout
+    bounds      minimum (3), maximum (3), center (3) and radius (1) as float32
+    vertices    the interleaved vertices (at an offset aligned to 16 bytes)
+    indices     the indices (at an offset aligned to 16 bytes)
+
+All numbers are little endian. The vertices and indices are memory-mapped when loaded, so they go to 'glBufferData'
+without being parsed or copied.
+"""
+import hashlib
+import json
+import os
+import struct
+
+import numpy
+from pyglet.gl import GLushort, GLuint
+
+from source.gl_helpers import GL_TYPE_TO_CONSTANT
+from source.mesh import parse_obj
+from source.mesh_optimization import index_type, optimize_mesh
+from source.model import Model, VBO, IBO, Bounds, VertexLayout, VertexAttribute, MODEL_LAYOUT, compute_bounds
+
+
+MAGIC   = b'MESH'
+VERSION = 1
+
+HEADER    = struct.Struct('<4sIIIII')
+ATTRIBUTE = struct.Struct('<32sII?3x')
+BOUNDS    = struct.Struct('<10f')
+ALIGNMENT = 16
+
+CONSTANT_TO_GL_TYPE = {constant: type for type, constant in GL_TYPE_TO_CONSTANT.items()}
+
+# Folder of the cache directory with a file per source file, holding its content hash (see 'content_hash'). A file per
+# source, instead of one index, so the worker processes of an 'AssetPipeline' never overwrite each other's entries.
+INDEX_DIRECTORY = 'index'
+
+_layouts = {MODEL_LAYOUT.attributes: MODEL_LAYOUT}  # Attributes to their layout, to not recompute the same layouts.
+_entries = {}  # Path of an index file to its (loaded) entry.
+
+
+def _aligned(offset):
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def _temporary_file(directory, mode='wb'):
+    """
+    Opens a new file in 'directory' to write a cache file to, which is then moved in place with 'os.replace', so a crash
+    never leaves a partial file in the cache. Unlike with 'tempfile', the file gets the mode of a file created normally
+    (the umask is applied by the system instead of reading it).
+    """
+    return open(os.path.join(directory, '.{}.tmp'.format(os.urandom(8).hex())), mode.replace('w', 'x'))
+
+
+def save_mesh(path, mesh):
+    """Writes a 'mesh.Mesh' to 'path' with the 'MODEL_LAYOUT'. Indices are 16-bit if the vertex count allows it."""
+    layout   = MODEL_LAYOUT
+    vertices = layout.pack(position=mesh.positions, texture_coordinate=mesh.texture_coordinates, normal=mesh.normals)
+    indices  = numpy.asarray(mesh.indices, dtype=index_type(len(vertices)))
+    bounds  = compute_bounds(mesh.positions)
+
+    header = HEADER.pack(MAGIC, VERSION, len(vertices), len(indices), indices.itemsize, len(layout))
+    header += b''.join(
+        ATTRIBUTE.pack(attribute.name.encode('utf-8'), attribute.dimension, GL_TYPE_TO_CONSTANT[attribute.type],
+                       attribute.normalized) for attribute in layout.attributes
+    )
+    header += BOUNDS.pack(*bounds.minimum, *bounds.maximum, *bounds.center, bounds.radius)
+
+    vertex_offset = _aligned(len(header))
+    index_offset  = _aligned(vertex_offset + vertices.nbytes)
+
+    with _temporary_file(os.path.dirname(os.path.abspath(path))) as file:
+        file.write(header)
+        file.seek(vertex_offset)
+        file.write(vertices.tobytes())
+        file.seek(index_offset)
+        file.write(indices.tobytes())
+    os.replace(file.name, path)
+
+
+def load_mesh(path):
+    """
+    Reads a file written by 'save_mesh' as the vertex layout, the bounds, and the vertices and indices as read-only
+    memory-mapped arrays.
+    """
+    data = numpy.memmap(path, dtype=numpy.uint8, mode='r')
+
+    magic, version, vertex_count, index_count, index_size, attribute_count = HEADER.unpack_from(data, 0)
+    assert magic == MAGIC, "'{}' isn't a mesh file!".format(path)
+    assert version == VERSION, "'{}' is version {}, not {}!".format(path, version, VERSION)
+
+    attributes = []
+    offset = HEADER.size
+    for _ in range(attribute_count):
+        name, dimension, type, normalized = ATTRIBUTE.unpack_from(data, offset)
+        attributes.append(
+            VertexAttribute(name.rstrip(b'\0').decode('utf-8'), dimension, CONSTANT_TO_GL_TYPE[type], normalized)
+        )
+        offset += ATTRIBUTE.size
+    attributes = tuple(attributes)
+    layout = _layouts.get(attributes)
+    if layout is None:
+        layout = _layouts[attributes] = VertexLayout(*attributes)
+
+    values = numpy.array(BOUNDS.unpack_from(data, offset), dtype=numpy.float32)
+    bounds = Bounds(values[0:3], values[3:6], values[6:9], float(values[9]))
+    offset += BOUNDS.size
+
+    vertex_offset = _aligned(offset)
+    index_offset  = _aligned(vertex_offset + vertex_count * layout.stride)
+    vertices = data[vertex_offset:vertex_offset + vertex_count * layout.stride]
+    indices  = data[index_offset:index_offset + index_count * index_size].view('<u{}'.format(index_size))
+    return layout, bounds, vertices, indices
+
+
+def _read_entry(index_path):
+    """The [size, modification time, content hash] entry of an index file, or None if it's missing or broken."""
+    try:
+        with open(index_path) as file:
+            entry = json.load(file)
+    except (OSError, ValueError):
+        return None
+    return entry if isinstance(entry, list) and len(entry) == 3 else None
+
+
+def content_hash(path, cache_directory):
+    """
+    Hash of the content of the file at 'path' (and the format version). The hash is remembered in the index of
+    'cache_directory' with the file's size and modification time, so the file is only read again when they change.
+    """
+    key        = os.path.abspath(path)
+    index_path = os.path.join(
+        cache_directory, INDEX_DIRECTORY, hashlib.blake2b(key.encode('utf-8'), digest_size=16).hexdigest() + '.json'
+    )
+    status = os.stat(path)
+    stamp  = [status.st_size, status.st_mtime_ns]
+
+    entry = _entries.get(index_path)
+    if entry is None or entry[:2] != stamp:
+        entry = _read_entry(index_path)  # Possibly updated by another process.
+    if entry is not None and entry[:2] == stamp:
+        _entries[index_path] = entry
+        return entry[2]
+
+    hash_ = hashlib.blake2b(digest_size=16)
+    hash_.update(struct.pack('<I', VERSION))
+    with open(path, 'rb') as file:
+        hash_.update(file.read())
+    _entries[index_path] = stamp + [hash_.hexdigest()]
+
+    os.makedirs(os.path.dirname(index_path), exist_ok=True)
+    with _temporary_file(cache_directory, 'w') as file:
+        json.dump(_entries[index_path], file)
+    os.replace(file.name, index_path)
+
+    if entry is not None and entry[2] != _entries[index_path][2]:
+        _remove_cached(cache_directory, entry[2])
+    return _entries[index_path][2]
+
+
+def _remove_cached(cache_directory, hash_):
+    """
+    Removes the cached meshes (of every variant) of a content hash, unless another source file still has it. The index
+    files are read again, as other processes may have added sources.
+    """
+    index_directory = os.path.join(cache_directory, INDEX_DIRECTORY)
+    for name in os.listdir(index_directory):
+        entry = _read_entry(os.path.join(index_directory, name))
+        if entry is not None and entry[2] == hash_:
+            return
+    for name in os.listdir(cache_directory):
+        if name.startswith(hash_ + '.') and name.endswith('.mesh'):
+            try:
+                os.remove(os.path.join(cache_directory, name))
+            except FileNotFoundError:  # Removed by another process.
+                pass
+
+
+def cache_path(path, cache_directory, variant='optimized'):
+    """
+    Path of the cached mesh of the OBJ file at 'path', named by a hash of its content (see 'content_hash') and the
+    'variant' of the mesh it holds (None for the mesh as parsed).
+    """
+    extension = '.{}.mesh'.format(variant) if variant else '.mesh'
+    return os.path.join(cache_directory, content_hash(path, cache_directory) + extension)
+
+
+def load_mesh_model(path, use_vao=True):
+    """Uploads the mesh file at 'path' (see 'load_mesh') as a model."""
+    return upload_mesh(*load_mesh(path), use_vao=use_vao)
+
+
+def upload_mesh(layout, bounds, vertices, indices, use_vao=True):
+    """Uploads a mesh as returned by 'load_mesh' as a model."""
+    index_type = GLushort if indices.itemsize == 2 else GLuint
+    return Model.create(
+        vbos=(VBO.create_packed(layout, vertices),), ibo=IBO.create(indices, type=index_type), bounds=bounds,
+        use_vao=use_vao
+    )
+
+
+def load_cached_model(path, cache_directory=None, use_vao=True, optimize=True):
+    """
+    Like 'model.load_model', but the OBJ file is only parsed (and optimized) the first time, or after it changed, and
+    then loaded from its cached mesh in 'cache_directory' (by default, a 'cache' folder next to the OBJ file).
+    """
+    if cache_directory is None:
+        cache_directory = os.path.join(os.path.dirname(path), 'cache')
+    cached = cache_path(path, cache_directory, 'optimized' if optimize else None)
+
+    # Opened without checking that it exists first, as another process can remove it in between (see '_remove_cached').
+    try:
+        return load_mesh_model(cached, use_vao)
+    except FileNotFoundError:
+        mesh = parse_obj(path)
+        save_mesh(cached, optimize_mesh(mesh) if optimize else mesh)
+    return load_mesh_model(cached, use_vao)
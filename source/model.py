@@ -1,14 +1,96 @@
 from abc import abstractmethod
+from collections import namedtuple
 
+import numpy
 from pyglet.gl import (
-    glBindBuffer, glEnableVertexAttribArray, glVertexAttribPointer, GL_FLOAT, GL_ARRAY_BUFFER, GL_FALSE,
-    GL_ELEMENT_ARRAY_BUFFER, glDisableVertexAttribArray, glDrawElements, GL_TRIANGLES, GL_UNSIGNED_INT,
-    glDrawArrays, GLuint, glGenBuffers, glBufferData, GL_STATIC_DRAW, GLfloat, GLushort, GLubyte
+    GL_ARRAY_BUFFER, GL_FALSE, GL_TRUE, GL_ELEMENT_ARRAY_BUFFER, glDrawElements, GL_TRIANGLES, GL_UNSIGNED_INT,
+    glDrawArrays, GLuint, glGenBuffers, glBufferData, GL_STATIC_DRAW, GLfloat, GLushort, GLubyte,
+    glDrawElementsInstanced, glDrawArraysInstanced, glGenVertexArrays, gl_info
 )
 from source.c_bindings import sizeof
+from source.dynamic_buffer import as_bytes
+from source.gl_state import gl_state
+from source.mesh import parse_obj
+from source.mesh_optimization import index_type, optimize_mesh
 from source.gl_helpers import GL_TYPE_TO_CONSTANT, GL_TYPES, GL_UNSIGNED_INTEGER_TYPES
 
 
+# An attribute of a vertex, e.g. VertexAttribute('position', 3). The type is a ctypes type (e.g. GLfloat), and
+# 'normalized' integers are mapped to [0, 1] (unsigned) or [-1, 1] (signed) by OpenGL.
+VertexAttribute = namedtuple('VertexAttribute', 'name, dimension, type, normalized', defaults=(GLfloat, False))
+
+
+class VertexLayout:
+    """
+    The attributes of a vertex, interleaved in one buffer (i.e. each vertex is stored with all of its attributes next
+    to each other). The attributes take consecutive attribute indices, in the order they're given.
+    """
+
+    def __init__(self, *attributes):
+        assert len(attributes) > 0, "Must have at least one attribute in a vertex layout!"
+
+        self.attributes = attributes
+        self.offsets = []  # Byte offset of each attribute within a vertex.
+
+        offset = 0
+        for attribute in attributes:
+            assert attribute.type in GL_TYPES, "Invalid type for attribute '{}'!".format(attribute.name)
+            self.offsets.append(offset)
+            offset += attribute.dimension * sizeof(attribute.type)
+        self.stride = offset  # Bytes per vertex.
+
+        # Arguments to 'glVertexAttribPointer' (except the index and the stride) of each attribute.
+        self.pointers = [
+            (attribute.dimension, GL_TYPE_TO_CONSTANT[attribute.type], GL_TRUE if attribute.normalized else GL_FALSE,
+             offset) for attribute, offset in zip(attributes, self.offsets)
+        ]
+
+        self.dtype = numpy.dtype({
+            'names':    [attribute.name for attribute in attributes],
+            'formats':  [(numpy.dtype(attribute.type), (attribute.dimension,)) for attribute in attributes],
+            'offsets':  self.offsets,
+            'itemsize': self.stride,
+        })
+
+    def __len__(self):
+        return len(self.attributes)
+
+    def pack(self, **arrays):
+        """
+        Interleaves the data of each attribute (given by the attribute's name as a flat sequence, or an array of a row
+        per vertex) into a numpy array of vertices, laid out like in the buffer.
+        """
+        assert set(arrays) == set(self.dtype.names), "Must give the data of exactly the attributes in the layout!"
+
+        first = self.attributes[0]
+        count = numpy.size(arrays[first.name]) // first.dimension
+        vertices = numpy.empty(count, dtype=self.dtype)
+        for attribute in self.attributes:
+            data = numpy.asarray(arrays[attribute.name]).reshape(-1, attribute.dimension)
+            assert len(data) == count, \
+                "Attribute '{}' has {} vertices, not {}!".format(attribute.name, len(data), count)
+            vertices[attribute.name] = data
+        return vertices
+
+
+def as_contiguous_array(data, type):
+    """
+    'data' as a contiguous numpy array of the ctypes type 'type', which pointer can be given to OpenGL directly. Buffer
+    protocol objects (numpy arrays, 'array.array', 'memoryview', ...) of that type are used without copying, bytes
+    are reinterpreted as 'type', and anything else (e.g. lists) is converted.
+    """
+    dtype = numpy.dtype(type)
+    if not isinstance(data, numpy.ndarray):
+        try:
+            view = memoryview(data)
+        except TypeError:
+            return numpy.array(data, dtype=dtype)
+        if view.format in ('B', 'b', 'c') and dtype.itemsize != 1:
+            return numpy.frombuffer(view, dtype=dtype)
+        data = numpy.asarray(view)
+    return numpy.ascontiguousarray(data, dtype=dtype)  # Doesn't copy if it already is.
+
+
 class VBO:
 
     TARGET = GL_ARRAY_BUFFER
@@ -16,32 +98,51 @@ class VBO:
 
     @classmethod
     def create(cls, data, dimension, type=GLfloat, draw_mode=GL_STATIC_DRAW):
+        """
+        A buffer with a single attribute (see 'create_interleaved' for more). 'data' is uploaded without copying if
+        it's a buffer of 'type' (see 'as_contiguous_array').
+        """
         assert type in VBO.VALID_TYPES, "Invalid type for VBO!"
+        data = as_contiguous_array(data, type)
+
+        handle = GLuint()
+        glGenBuffers(1, handle)
+        gl_state.bind_buffer(VBO.TARGET, handle)
+        glBufferData(VBO.TARGET, data.nbytes, data.ctypes.data, draw_mode)
+        return cls(handle, VertexLayout(VertexAttribute('data', dimension, type)))
+
+    @classmethod
+    def create_interleaved(cls, layout, draw_mode=GL_STATIC_DRAW, **arrays):
+        """A buffer with all attributes of 'layout', which data is given by attribute name (see 'VertexLayout.pack')."""
+        return cls.create_packed(layout, layout.pack(**arrays), draw_mode)
+
+    @classmethod
+    def create_packed(cls, layout, vertices, draw_mode=GL_STATIC_DRAW):
+        """A buffer of vertices already laid out like 'layout' (see 'as_bytes'), uploaded without copying."""
+        vertices = as_bytes(vertices)
+        assert vertices.nbytes % layout.stride == 0, "The vertices don't match the layout!"
 
         handle = GLuint()
         glGenBuffers(1, handle)
-        glBindBuffer(VBO.TARGET, handle)
-        glBufferData(VBO.TARGET, len(data) * sizeof(type), (type * len(data))(*data), draw_mode)
-        return cls(handle, dimension, GL_TYPE_TO_CONSTANT[type])
+        gl_state.bind_buffer(VBO.TARGET, handle)
+        glBufferData(VBO.TARGET, vertices.nbytes, vertices.ctypes.data, draw_mode)
+        return cls(handle, layout)
 
-    def __init__(self, id_, dimension, type=GL_FLOAT):
+    def __init__(self, id_, layout, offset=0):
         self.id = id_
-        self.dimension = dimension
-        self.type = type
+        self.layout = layout
+        self.offset = offset  # Byte offset of the first vertex in the buffer (e.g. in a 'RingBuffer').
 
     def enable(self, index):
-        glBindBuffer(VBO.TARGET, self.id)
-        glEnableVertexAttribArray(index)
-
-        # TODO(ted): Assuming data should not be normalized and without stride or a pointer
-        normalized = GL_FALSE
-        stride  = 0
-        pointer = 0
-        glVertexAttribPointer(index, self.dimension, self.type, normalized, stride, pointer)
+        """Enables the attributes of the layout at attribute index 'index' and onwards."""
+        stride = self.layout.stride
+        for i, (dimension, type, normalized, pointer) in enumerate(self.layout.pointers, start=index):
+            gl_state.enable_vertex_attrib_array(i)
+            gl_state.vertex_attrib_buffer(i, self.id, dimension, type, normalized, stride, self.offset + pointer)
 
     @staticmethod
     def disable():
-        glBindBuffer(VBO.TARGET, 0)
+        gl_state.bind_buffer(VBO.TARGET, 0)
 
 
 class IBO:
@@ -51,14 +152,18 @@ class IBO:
 
     @classmethod
     def create(cls, data, type=GLuint, draw_mode=GL_STATIC_DRAW):
+        """'data' is uploaded without copying if it's a buffer of 'type' (see 'as_contiguous_array')."""
         assert type in IBO.VALID_TYPES, "Invalid type for IBO!"
+        data = as_contiguous_array(data, type)
 
+        # Written while bound to GL_ARRAY_BUFFER, as binding GL_ELEMENT_ARRAY_BUFFER would change the index buffer of
+        # the bound vertex array object.
         handle = GLuint()
         glGenBuffers(1, handle)
-        glBindBuffer(IBO.TARGET, handle)
-        glBufferData(IBO.TARGET, len(data) * sizeof(type), (type * len(data))(*data), draw_mode)
+        gl_state.bind_buffer(VBO.TARGET, handle)
+        glBufferData(VBO.TARGET, data.nbytes, data.ctypes.data, draw_mode)
 
-        return cls(handle, len(data), GL_TYPE_TO_CONSTANT[type])
+        return cls(handle, data.size, GL_TYPE_TO_CONSTANT[type])
 
     def __init__(self, id_, count, type=GL_UNSIGNED_INT):
         self.id = id_
@@ -67,105 +172,193 @@ class IBO:
 
 
     def enable(self):
-        glBindBuffer(IBO.TARGET, self.id)
+        gl_state.bind_buffer(IBO.TARGET, self.id)
 
     @staticmethod
     def disable():
-        glBindBuffer(IBO.TARGET, 0)
+        gl_state.bind_buffer(IBO.TARGET, 0)
+
+
+# Local space bounding box (minimum, maximum) and bounding sphere (center, radius) of a model's vertices.
+Bounds = namedtuple('Bounds', 'minimum, maximum, center, radius')
+
+
+def compute_bounds(positions):
+    """Bounds of the vertex positions, given as a flat sequence of x, y, z."""
+    positions = numpy.asarray(positions, dtype=GLfloat).reshape(-1, 3)
+    if len(positions) == 0:
+        zero = numpy.zeros(3, dtype=GLfloat)
+        return Bounds(zero, zero, zero, 0.0)
+
+    minimum = numpy.array([positions[:, axis].min() for axis in range(3)], dtype=GLfloat)
+    maximum = numpy.array([positions[:, axis].max() for axis in range(3)], dtype=GLfloat)
+    center  = (minimum + maximum) / 2
+    radius  = float(numpy.sqrt(numpy.max(numpy.square(positions - center) @ numpy.ones(3, dtype=GLfloat))))
+    return Bounds(minimum, maximum, center, radius)
+
+
+def supports_vertex_arrays():
+    """If the current context has vertex array objects (OpenGL 3.0 or ARB_vertex_array_object)."""
+    return gl_info.have_version(3, 0) or gl_info.have_extension('GL_ARB_vertex_array_object')
 
 
 class Model:
 
+    vertex_arrays_used = False  # If any model has a vertex array object, the others must bind the default one.
+
     @staticmethod
-    def create(vbos, *, ibo=None, count=-1, draw_mode=GL_TRIANGLES):
+    def create(vbos, *, ibo=None, count=-1, draw_mode=GL_TRIANGLES, bounds=None, use_vao=True):
+        """
+        If 'use_vao' is True (and the context supports it), the attribute setup is recorded in a vertex array object,
+        so 'enable' is a single bind and 'disable' does nothing.
+        """
         assert ibo is not None or count != -1, "Must specify either IBO or count to create model!"
 
         if ibo is not None:
-            return ModelWithIndexBuffer(vbos, ibo, draw_mode)
+            model = ModelWithIndexBuffer(vbos, ibo, draw_mode, bounds)
         else:
-            return ModelWithoutIndexBuffer(vbos, count, draw_mode)
+            model = ModelWithoutIndexBuffer(vbos, count, draw_mode, bounds)
+
+        if use_vao and supports_vertex_arrays():
+            model.create_vertex_array()
+        return model
+
+    def create_vertex_array(self):
+        handle = GLuint()
+        glGenVertexArrays(1, handle)
+        gl_state.bind_vertex_array(handle)
+        self.enable_buffers()
+        gl_state.bind_vertex_array(0)
+
+        self.vao = handle
+        Model.vertex_arrays_used = True
 
-    @abstractmethod
     def enable(self):
+        if self.vao is not None:
+            gl_state.bind_vertex_array(self.vao)
+        else:
+            if Model.vertex_arrays_used:
+                gl_state.bind_vertex_array(0)
+            self.enable_buffers()
+
+    def disable(self):
+        if self.vao is None:
+            self.disable_buffers()
+
+    def enable_vertex_buffers(self):
+        index = 0
+        for vbo in self.vbos:
+            vbo.enable(index=index)
+            index += len(vbo.layout)
+
+    def disable_vertex_buffers(self):
+        for index in range(self.attribute_count):
+            gl_state.disable_vertex_attrib_array(index)
+
+    @abstractmethod
+    def enable_buffers(self):
         pass
 
     @abstractmethod
-    def disable(self):
+    def disable_buffers(self):
         pass
 
     @abstractmethod
     def render(self):
         pass
 
+    @abstractmethod
+    def render_instanced(self, count):
+        """Renders 'count' instances with one draw call (see 'instancing.InstanceBuffer')."""
+        pass
+
 
 class ModelWithIndexBuffer(Model):
-    def __init__(self, vbos, ibo, draw_mode=GL_TRIANGLES):
+    def __init__(self, vbos, ibo, draw_mode=GL_TRIANGLES, bounds=None):
         self.vbos = vbos
         self.ibo  = ibo
+        self.attribute_count = sum(len(vbo.layout) for vbo in vbos)
         self.draw_mode = draw_mode
+        self.bounds = bounds  # Used for culling. None means the model is never culled.
+        self.vao = None
 
-    def enable(self):
-        for index, vbo in enumerate(self.vbos):
-            vbo.enable(index=index)
+    def enable_buffers(self):
+        self.enable_vertex_buffers()
         self.ibo.enable()
 
-    def disable(self):
-        for index in range(len(self.vbos)):
-            glDisableVertexAttribArray(index)
+    def disable_buffers(self):
+        self.disable_vertex_buffers()
         self.ibo.disable()
 
     def render(self):
         glDrawElements(self.draw_mode, self.ibo.count, self.ibo.type, 0)
 
+    def render_instanced(self, count):
+        glDrawElementsInstanced(self.draw_mode, self.ibo.count, self.ibo.type, 0, count)
+
 
 
 class ModelWithoutIndexBuffer(Model):
-    def __init__(self, vbos, count, draw_mode=GL_TRIANGLES):
+    def __init__(self, vbos, count, draw_mode=GL_TRIANGLES, bounds=None):
         self.vbos  = vbos
         self.count = count
+        self.attribute_count = sum(len(vbo.layout) for vbo in vbos)
         self.draw_mode = draw_mode
+        self.bounds = bounds  # Used for culling. None means the model is never culled.
+        self.vao = None
 
-    def enable(self):
-        for index, vbo in enumerate(self.vbos):
-            vbo.enable(index=index)
+    def enable_buffers(self):
+        self.enable_vertex_buffers()
 
-    def disable(self):
-        for index in range(len(self.vbos)):
-            glDisableVertexAttribArray(index)
-        glBindBuffer(GL_ARRAY_BUFFER, 0)
+    def disable_buffers(self):
+        self.disable_vertex_buffers()
+        gl_state.bind_buffer(GL_ARRAY_BUFFER, 0)
 
     def render(self):
         glDrawArrays(self.draw_mode, 0, self.count)
 
+    def render_instanced(self, count):
+        glDrawArraysInstanced(self.draw_mode, 0, self.count, count)
+
+
+
+# Layout of the vertices of 'create_cube' and 'load_model', named like the attributes of the object shaders.
+MODEL_LAYOUT = VertexLayout(
+    VertexAttribute('position', 3), VertexAttribute('texture_coordinate', 2), VertexAttribute('normal', 3)
+)
 
 
-def create_cube():
-    positions = VBO.create(data=[
+def create_cube(use_vao=True):
+    position_data = [
         -0.5, 0.5, -0.5, -0.5, 0.5, 0.5, 0.5, 0.5, 0.5, 0.5, 0.5, -0.5,  # Top.
         -0.5, -0.5, -0.5, 0.5, -0.5, -0.5, 0.5, -0.5, 0.5, -0.5, -0.5, 0.5,  # Bottom.
         -0.5, -0.5, -0.5, -0.5, -0.5, 0.5, -0.5, 0.5, 0.5, -0.5, 0.5, -0.5,  # Left.
         0.5, -0.5, 0.5, 0.5, -0.5, -0.5, 0.5, 0.5, -0.5, 0.5, 0.5, 0.5,  # Right.
         -0.5, -0.5, 0.5, 0.5, -0.5, 0.5, 0.5, 0.5, 0.5, -0.5, 0.5, 0.5,  # Front.
         0.5, -0.5, -0.5, -0.5, -0.5, -0.5, -0.5, 0.5, -0.5, 0.5, 0.5, -0.5,  # Back.
-    ], dimension=3)
+    ]
 
-    texture_coordinates = VBO.create(data=[
+    texture_coordinate_data = [
         0.0, 0.0, 0.0, 1.0, 1.0, 1.0, 1.0, 0.0,  # Top.
         0.0, 0.0, 0.0, 1.0, 1.0, 1.0, 1.0, 0.0,  # Bottom.
         0.0, 0.0, 0.0, 1.0, 1.0, 1.0, 1.0, 0.0,  # Left.
         0.0, 0.0, 0.0, 1.0, 1.0, 1.0, 1.0, 0.0,  # Right.
         0.0, 0.0, 0.0, 1.0, 1.0, 1.0, 1.0, 0.0,  # Front.
         0.0, 0.0, 0.0, 1.0, 1.0, 1.0, 1.0, 0.0,  # Back.
-    ], dimension=2)
+    ]
 
-    normals = VBO.create(data=[
+    normal_data = [
         0.0, 1.0, 0.0, 0.0, 1.0, 0.0, 0.0, 1.0, 0.0, 0.0, 1.0, 0.0,  # Top.
         0.0, -1.0, 0.0, 0.0, -1.0, 0.0, 0.0, -1.0, 0.0, 0.0, -1.0, 0.0,  # Bottom.
         -1.0, 0.0, 0.0, -1.0, 0.0, 0.0, -1.0, 0.0, 0.0, -1.0, 0.0, 0.0,  # Left.
         1.0, 0.0, 0.0, 1.0, 0.0, 0.0, 1.0, 0.0, 0.0, 1.0, 0.0, 0.0,  # Right.
         0.0, 0.0, 1.0, 0.0, 0.0, 1.0, 0.0, 0.0, 1.0, 0.0, 0.0, 1.0,  # Front.
         0.0, 0.0, -1.0, 0.0, 0.0, -1.0, 0.0, 0.0, -1.0, 0.0, 0.0, -1.0,  # Back.
-    ], dimension=3)
+    ]
+
+    vertices = VBO.create_interleaved(
+        MODEL_LAYOUT, position=position_data, texture_coordinate=texture_coordinate_data, normal=normal_data
+    )
 
     indices = IBO.create(data=[
         0, 1, 3, 3, 1, 2,
@@ -176,72 +369,27 @@ def create_cube():
         20, 21, 23, 23, 21, 22
     ])
 
-    return Model.create(vbos=(positions, texture_coordinates, normals), ibo=indices)
-
-
-
-def load_model(path):
-    # TODO(ted): Assumes vertices of dimension 3, texture coordinates of dimension 2 and normals of dimension 3.
-
-    vertices = []
-    normals = []
-    texture_coordinates = []
-
-    with open(path) as text_file:
-
-        line = text_file.readline()
-
-        while True:
-
-            if line.startswith('v '):
-                _, x, y, z = line.split()
-                vertices.append((float(x), float(y), float(z)))
-            elif line.startswith('vt '):
-                _, u, t = line.split()
-                texture_coordinates.append((float(u), float(t)))
-            elif line.startswith('vn '):
-                _, x, y, z = line.split()
-                normals.append((float(x), float(y), float(z)))
-            elif line.startswith('f ') or line == '':
-                break
-
-            line = text_file.readline()
-
-        indices = []
-        unique_data = []
-        sorted_vertices = []
-        sorted_normals = []
-        sorted_texture_coordinates = []
-        index = 0
-
-        while line != '':
-            if not line.startswith('f'):
-                line = text_file.readline()
-                continue
-
-            _, *faces = line.split(' ')
+    bounds = compute_bounds(position_data)
+    return Model.create(vbos=(vertices,), ibo=indices, bounds=bounds, use_vao=use_vao)
 
-            for face in faces:
-                vertex = face.split('/')
-                if vertex not in unique_data:
-                    unique_data.append(vertex)
-                    indices.append(index)
-                    vertex_index, texture_index, normal_index = vertex
-                    vertex_index, texture_index, normal_index = int(vertex_index), int(texture_index), int(normal_index)
-                    sorted_vertices.extend(vertices[vertex_index - 1])
-                    sorted_normals.extend(normals[normal_index - 1])
-                    sorted_texture_coordinates.extend(texture_coordinates[texture_index - 1])
-                    index += 1
-                else:
-                    indices.append(unique_data.index(vertex))
 
-            line = text_file.readline()
 
+def load_model(path, use_vao=True, optimize=False):
+    """
+    Loads the Wavefront OBJ file at 'path' (see 'mesh.parse_obj'). If 'optimize' is True, the mesh is reordered for
+    the vertex cache first (see 'mesh_optimization'), which is worth it for models that are drawn a lot.
+    """
+    mesh = parse_obj(path)
+    if optimize:
+        mesh = optimize_mesh(mesh)
+    return create_mesh_model(mesh, use_vao=use_vao)
 
-    vertices            = VBO.create(data=sorted_vertices,            dimension=3)
-    texture_coordinates = VBO.create(data=sorted_texture_coordinates, dimension=2)
-    normals             = VBO.create(data=sorted_normals,             dimension=3)
 
-    indices = IBO.create(data=indices)
+def create_mesh_model(mesh, use_vao=True):
+    """Uploads a 'mesh.Mesh' as a model (with the 'MODEL_LAYOUT', and 16-bit indices if possible)."""
+    vertices = VBO.create_interleaved(
+        MODEL_LAYOUT, position=mesh.positions, texture_coordinate=mesh.texture_coordinates, normal=mesh.normals
+    )
+    indices = IBO.create(data=mesh.indices, type=index_type(len(mesh.positions)))
 
-    return Model.create(vbos=(vertices, texture_coordinates, normals), ibo=indices)
+    return Model.create(vbos=(vertices,), ibo=indices, bounds=compute_bounds(mesh.positions), use_vao=use_vao)
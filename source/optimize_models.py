@@ -0,0 +1,46 @@
+"""
+Optimizes OBJ files ahead of time into the mesh cache (see 'mesh_cache' and 'mesh_optimization'), so they're loaded
+without being parsed or optimized at startup, and prints their ACMR before and after. With '--lods', their levels of
+detail are simplified (see 'lod') and cached too, and their triangle counts printed.
+
+Run from the repository root with:
+    python -m source.optimize_models resources/models/*.obj
+"""
+import argparse
+import os
+
+from source.c_bindings import sizeof
+from source.lod import save_lods
+from source.mesh import parse_obj
+from source.mesh_cache import save_mesh, cache_path
+from source.mesh_optimization import acmr, index_type, optimize_mesh, CACHE_SIZE
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Optimize OBJ files into the mesh cache.')
+    parser.add_argument('paths', nargs='+', help='OBJ files to optimize.')
+    parser.add_argument('--cache', help="Cache directory (by default, a 'cache' folder next to each file).")
+    parser.add_argument('--cache-size', type=int, default=CACHE_SIZE, help='Vertices in the simulated cache.')
+    parser.add_argument('--lods', action='store_true', help='Also cache the levels of detail.')
+    arguments = parser.parse_args()
+
+    print('{:>24} {:>10} {:>10} {:>8} {:>8} {:>6}'.format('file', 'triangles', 'vertices', 'before', 'after', 'index'))
+    for path in arguments.paths:
+        mesh = parse_obj(path)
+        optimized = optimize_mesh(mesh, arguments.cache_size)
+
+        cache_directory = arguments.cache or os.path.join(os.path.dirname(path), 'cache')
+        save_mesh(cache_path(path, cache_directory), optimized)
+
+        print('{:>24} {:>10} {:>10} {:>8.3f} {:>8.3f} {:>5}B'.format(
+            os.path.basename(path), len(mesh.indices) // 3, len(optimized.positions),
+            acmr(mesh.indices, arguments.cache_size), acmr(optimized.indices, arguments.cache_size),
+            sizeof(index_type(len(optimized.positions)))
+        ))
+        if arguments.lods:
+            levels = save_lods(path, cache_directory)
+            print('{:>24} {}'.format('levels of detail', ', '.join(str(len(l.indices) // 3) for l in levels)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+import numpy
+from pyglet.gl import GLfloat
+
+from source.entity import Transform, Physics
+
+
+_ONES    = numpy.ones(3, dtype=GLfloat)
+_EPSILON = numpy.float32(1e-12)  # Bodies at rest aren't divided by zero.
+
+
+class _Scratch:
+    """Per-body arrays reused by every step, so 'integrate' doesn't allocate. Grown to the largest archetype."""
+
+    def __init__(self):
+        self.steps  = numpy.empty((0, 3), dtype=GLfloat)
+        self.speeds = numpy.empty(0, dtype=GLfloat)
+
+    def arrays(self, count):
+        if len(self.speeds) < count:
+            self.steps  = numpy.empty((count, 3), dtype=GLfloat)
+            self.speeds = numpy.empty(count, dtype=GLfloat)
+        return self.steps[:count], self.speeds[:count]
+
+
+_SCRATCH = _Scratch()
+
+
+def integrate(world, dt):
+    """
+    Moves all entities with Transform and Physics one step of 'dt' seconds (semi-implicit Euler), with one vectorized
+    pass per archetype. The velocity is clamped to 'max_speed' before moving the entity.
+    """
+    for transforms, physics in world.get_component_arrays_of(Transform, Physics):
+        velocity = physics['velocity']
+        steps, speeds = _SCRATCH.arrays(len(velocity))
+        velocity += numpy.multiply(physics['acceleration'], dt, out=steps)
+
+        # Squares summed with a matrix product, as 'sum(axis=1)' is slow for short rows. The factor is 1 for bodies
+        # below their max speed, so the (slow) broadcast multiply is only needed when any body is too fast.
+        speed  = numpy.sqrt(numpy.matmul(numpy.square(velocity, out=steps), _ONES, out=speeds), out=speeds)
+        factor = numpy.divide(physics['max_speed'], numpy.maximum(speed, _EPSILON, out=speed), out=speed)
+        numpy.minimum(factor, 1, out=factor)
+        if factor.min() < 1:
+            velocity *= factor[:, numpy.newaxis]
+
+        transforms['location'] += numpy.multiply(velocity, dt, out=steps)
+
+
+def physics_system(world, commands, dt):
+    """'integrate' as a system for the Scheduler (see 'PHYSICS_READS' and 'PHYSICS_WRITES')."""
+    integrate(world, dt)
+
+
+PHYSICS_READS  = ()
+PHYSICS_WRITES = (Transform, Physics)
+
+
+class FixedTimestep:
+    """
+    Runs 'integrate' in steps of exactly 'step' seconds, no matter the frame rate. Time that's left over is kept
+    until the next update. Schedule 'update' with the pyglet clock, e.g. 'pyglet.clock.schedule(timestep.update)'.
+    """
+
+    def __init__(self, world, step=1 / 120, max_steps=8, function=integrate):
+        self.world = world
+        self.step  = step
+        self.max_steps = max_steps  # Drops time instead of spiraling when a frame takes too long.
+        self.function  = function
+        self.accumulator = 0.0
+
+    def update(self, dt):
+        """Returns the fraction of a step that is left over, for interpolating between the last two steps."""
+        self.accumulator += dt
+
+        steps = 0
+        while self.accumulator >= self.step and steps < self.max_steps:
+            self.function(self.world, self.step)
+            self.accumulator -= self.step
+            steps += 1
+
+        if steps == self.max_steps:
+            self.accumulator = min(self.accumulator, self.step)
+
+        return self.accumulator / self.step
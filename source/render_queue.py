@@ -0,0 +1,152 @@
+import numpy
+from pyglet.gl import GL_TEXTURE_2D
+
+from source.gl_state import gl_state
+from source.instancing import draw_instances
+
+
+# Layout of the sort keys, from the most to the least significant bits. Draws are sorted by shader first, as that's the
+# most expensive state to change, and by depth last (front to back, so the depth test can reject hidden fragments).
+SHADER_BITS  = 8
+MODEL_BITS   = 12
+TEXTURE_BITS = 12
+DEPTH_BITS   = 32
+
+DEPTH_SHIFT   = 0
+TEXTURE_SHIFT = DEPTH_SHIFT + DEPTH_BITS
+MODEL_SHIFT   = TEXTURE_SHIFT + TEXTURE_BITS
+SHADER_SHIFT  = MODEL_SHIFT + MODEL_BITS
+
+
+def sort_keys(shader_ids, model_ids, texture_ids, depths):
+    """64-bit sort keys of draws (see the layout above). The ids must be small integers, and the depths floats."""
+    keys  = numpy.asarray(shader_ids,  dtype=numpy.uint64) << numpy.uint64(SHADER_SHIFT)
+    keys |= numpy.asarray(model_ids,   dtype=numpy.uint64) << numpy.uint64(MODEL_SHIFT)
+    keys |= numpy.asarray(texture_ids, dtype=numpy.uint64) << numpy.uint64(TEXTURE_SHIFT)
+    keys |= depth_bits(depths).astype(numpy.uint64) << numpy.uint64(DEPTH_SHIFT)
+    return keys
+
+
+def depth_bits(depths):
+    """Maps float depths to unsigned 32-bit integers with the same order."""
+    bits = numpy.asarray(depths, dtype=numpy.float32).view(numpy.uint32)
+
+    # Positive floats are ordered like their bits, but must come after the negative ones, which are ordered backwards.
+    negative = (bits >> numpy.uint32(31)).astype(bool)
+    return numpy.where(negative, ~bits, bits | numpy.uint32(0x80000000))
+
+
+class RenderQueue:
+    """
+    Collects draws in any order, then sorts them by state (shader, model, texture set) and depth, and submits them
+    with as few state changes as possible. Consecutive draws with the same state are drawn together (with one draw
+    call if the shader has an instance buffer, see 'instancing').
+
+    Shaders keep their uniforms when another shader is enabled, so per frame uniforms (e.g. 'perspective') can be
+    loaded in each shader before 'flush'.
+    """
+
+    def __init__(self, instance_buffers=None):
+        self.instance_buffers = instance_buffers or {}  # Shader to InstanceBuffer, for shaders that support instancing.
+
+        # Objects to small ids used in the sort keys. Ids are given in the order the objects are first submitted.
+        self.shader_ids  = {}
+        self.model_ids   = {}
+        self.texture_ids = {}
+        self.shaders, self.models, self.texture_sets = [], [], []
+
+        self.keys     = []
+        self.matrices = []
+        self.uniforms = []
+
+        # Statistics of the last flush.
+        self.draws = 0
+        self.state_changes = 0
+        self.state_changes_avoided = 0  # Compared to setting all state for every draw.
+
+    def __len__(self):
+        return len(self.keys)
+
+    @staticmethod
+    def _id_of(mapping, objects, item, bits):
+        id_ = mapping.get(item)
+        if id_ is None:
+            id_ = mapping[item] = len(objects)
+            assert id_ < 1 << bits, "Too many different objects for a {}-bit id!".format(bits)
+            objects.append(item)
+        return id_
+
+    def submit(self, shader, model, textures, matrix, depth=0.0, uniforms=None):
+        """
+        Queues a draw of 'model' with 'shader', the 'textures' bound to texture unit 0, 1, ... and the transformation
+        'matrix'. 'uniforms' are float uniforms (see 'Shader.load_uniform_floats') for only this draw.
+        """
+        shader_id  = RenderQueue._id_of(self.shader_ids,  self.shaders,      shader,          SHADER_BITS)
+        model_id   = RenderQueue._id_of(self.model_ids,   self.models,       model,           MODEL_BITS)
+        texture_id = RenderQueue._id_of(self.texture_ids, self.texture_sets, tuple(textures), TEXTURE_BITS)
+        self.keys.append((shader_id, model_id, texture_id, depth))
+        self.matrices.append(matrix)
+        self.uniforms.append(uniforms)
+
+    def clear(self):
+        self.keys.clear()
+        self.matrices.clear()
+        self.uniforms.clear()
+
+    def sorted_order(self):
+        """Indices of the queued draws in the order they'll be submitted."""
+        if not self.keys:
+            return numpy.empty(0, dtype=numpy.int64)
+        shader_ids, model_ids, texture_ids, depths = zip(*self.keys)
+        # Stable, so draws with equal keys keep the order they were submitted in.
+        return numpy.argsort(sort_keys(shader_ids, model_ids, texture_ids, depths), kind='stable')
+
+    def flush(self):
+        """Submits and clears all queued draws."""
+        order = self.sorted_order()
+        matrices = numpy.asarray(self.matrices).reshape(-1, 4, 4)
+
+        self.draws = self.state_changes = 0
+        naive_state_changes = 0  # If everything was bound for every draw.
+        current_shader, current_model, current_textures = None, None, ()
+
+        start = 0
+        while start < len(order):
+            shader_id, model_id, texture_id, _ = self.keys[order[start]]
+
+            # Draws with the same state and no uniforms of their own are drawn together.
+            end = start + 1
+            if self.uniforms[order[start]] is None:
+                while (end < len(order) and self.uniforms[order[end]] is None and
+                       self.keys[order[end]][:3] == (shader_id, model_id, texture_id)):
+                    end += 1
+
+            shader, model, textures = self.shaders[shader_id], self.models[model_id], self.texture_sets[texture_id]
+            naive_state_changes += (end - start) * (2 + len(textures))
+
+            if shader is not current_shader:
+                shader.enable()
+                current_shader = shader
+                self.state_changes += 1
+            if model is not current_model:
+                model.enable()
+                current_model = model
+                self.state_changes += 1
+            for unit, texture in enumerate(textures):
+                if unit >= len(current_textures) or current_textures[unit] is not texture:
+                    gl_state.bind_texture(unit, GL_TEXTURE_2D, texture.id)
+                    self.state_changes += 1
+            if len(textures) >= len(current_textures):
+                current_textures = textures
+            else:
+                current_textures = textures + current_textures[len(textures):]  # The other units are still bound.
+
+            if self.uniforms[order[start]] is not None:
+                shader.load_uniform_floats(**self.uniforms[order[start]])
+            draw_instances(model, matrices[order[start:end]], shader, self.instance_buffers.get(shader))
+            self.draws += end - start
+
+            start = end
+
+        self.state_changes_avoided = naive_state_changes - self.state_changes
+        self.clear()
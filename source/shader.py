@@ -1,6 +1,4 @@
 from pyglet.gl import (
-    glUseProgram,
-
     glUniform4ui, glUniform4ui, glUniform4ui, glUniform4ui,
     glUniform1i,  glUniform2i,  glUniform3i,  glUniform4i,
     glUniform1d,  glUniform2d,  glUniform3d,  glUniform4d,
@@ -17,6 +15,7 @@ from pyglet.gl import (
     glGetShaderInfoLog, glGetProgramInfoLog, glGetUniformLocation, glGetProgramiv, GLint, GLfloat,
 )
 from source.c_bindings import *
+from source.gl_state import gl_state
 
 
 class Shader:
@@ -56,7 +55,7 @@ class Shader:
 
             glLinkProgram(program_handle)
             glValidateProgram(program_handle)
-            glUseProgram(program_handle)
+            gl_state.use_program(program_handle)
 
         except GLException as error:
             # Print vertex shader errors.
@@ -96,12 +95,12 @@ class Shader:
         self.uniform = uniform_mapping
 
     def enable(self):
-        glUseProgram(self.id)
+        gl_state.use_program(self.id)
         Shader.bound = self  # Just for safety.
 
     @staticmethod
     def disable():
-        glUseProgram(0)
+        gl_state.use_program(0)
         Shader.bound = None
 
     def is_bound(self):
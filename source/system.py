@@ -0,0 +1,83 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from source.entity import CommandBuffer
+
+
+class System:
+    """
+    A function 'function(world, commands, dt)' that works on the component arrays of a world, together with the
+    component classes it reads and writes. Structural changes must be recorded in 'commands' (a CommandBuffer),
+    since other systems might be iterating the same arrays.
+    """
+
+    def __init__(self, function, reads=(), writes=(), name=None):
+        self.function = function
+        self.reads  = frozenset(reads)
+        self.writes = frozenset(writes)
+        self.name   = name or function.__name__
+
+    def __repr__(self):
+        return '{}({})'.format(self.__class__.__name__, self.name)
+
+    def __call__(self, world, commands, dt):
+        return self.function(world, commands, dt)
+
+    def conflicts_with(self, other):
+        return bool(
+            self.writes & other.writes or self.writes & other.reads or self.reads & other.writes
+        )
+
+
+class Scheduler:
+    """
+    Runs systems in the order they were added, but groups them into stages of systems that doesn't conflict (i.e.
+    none of them writes a component that another reads or writes). The systems of a stage runs concurrently on a
+    thread pool, which pays off when they spend their time in NumPy (which releases the GIL for most operations).
+
+    Structural changes recorded in 'commands' are applied after all stages have run.
+    """
+
+    def __init__(self, world, max_workers=None):
+        self.world    = world
+        self.commands = CommandBuffer(world)
+        self.systems  = []
+        self.stages   = []
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    def add_system(self, function, reads=(), writes=(), name=None):
+        system = function if isinstance(function, System) else System(function, reads, writes, name)
+        self.systems.append(system)
+        self.stages = self._build_stages(self.systems)
+        return system
+
+    @staticmethod
+    def _build_stages(systems):
+        """Puts each system in the first stage after the last stage with a system it conflicts with."""
+        stages = []
+        for system in systems:
+            index = 0
+            for i, stage in enumerate(stages):
+                if any(system.conflicts_with(other) for other in stage):
+                    index = i + 1
+            if index == len(stages):
+                stages.append([])
+            stages[index].append(system)
+        return stages
+
+    def run(self, dt):
+        for stage in self.stages:
+            if len(stage) == 1:
+                stage[0](self.world, self.commands, dt)
+            else:
+                futures = [self.executor.submit(system, self.world, self.commands, dt) for system in stage]
+                for future in futures:
+                    future.result()  # Re-raises exceptions from the system.
+        self.commands.flush()
+
+    def run_serial(self, dt):
+        for system in self.systems:
+            system(self.world, self.commands, dt)
+        self.commands.flush()
+
+    def shutdown(self):
+        self.executor.shutdown()
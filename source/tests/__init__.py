@@ -0,0 +1,4 @@
+import pyglet
+
+# The tests never open a window, so don't require a display when importing pyglet.gl.
+pyglet.options['headless'] = True
@@ -0,0 +1,61 @@
+"""
+A stand-in for OpenGL that records the calls instead of making them, so rendering code can be tested without a
+context. It replaces every 'gl*' function imported in the given modules (e.g. 'source.model') and in 'gl_state'
+(which the other modules change the state through), like:
+
+    with RecordingGL(source.model, source.instancing) as gl:
+        model.render()
+    assert gl.count('glDrawElements') == 1
+"""
+import source.gl_state
+from source.gl_state import gl_state
+
+
+
+class RecordingGL:
+
+    DRAW_CALLS = (
+        'glDrawArrays', 'glDrawElements', 'glDrawArraysInstanced', 'glDrawElementsInstanced'
+    )
+
+    def __init__(self, *modules):
+        self.modules  = (source.gl_state, *modules)
+        self.calls    = []  # (name, args) of every call, in order.
+        self.original = []
+        self.handles  = 0  # Last handle given out by a 'glGen*' function.
+
+    def __enter__(self):
+        for module in self.modules:
+            for name, value in vars(module).items():
+                if name.startswith('gl') and name[2:3].isupper() and callable(value):
+                    self.original.append((module, name, value))
+                    setattr(module, name, self._recorder(name))
+        gl_state.invalidate()
+        return self
+
+    def __exit__(self, *exception):
+        for module, name, value in self.original:
+            setattr(module, name, value)
+        self.original.clear()
+        gl_state.invalidate()  # The recorded calls never changed the real state.
+
+    def _recorder(self, name):
+        def record(*args):
+            self.calls.append((name, args))
+            if name.startswith('glGen') and len(args) == 2 and hasattr(args[1], 'value'):
+                self.handles += 1  # Like OpenGL, give out unique handles that aren't 0.
+                args[1].value = self.handles
+        return record
+
+    def count(self, name):
+        return sum(1 for call, _ in self.calls if call == name)
+
+    def arguments(self, name):
+        """Arguments of every call to 'name', in order."""
+        return [args for call, args in self.calls if call == name]
+
+    def draw_calls(self):
+        return sum(1 for call, _ in self.calls if call in RecordingGL.DRAW_CALLS)
+
+    def reset(self):
+        self.calls.clear()
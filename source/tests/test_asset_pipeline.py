@@ -0,0 +1,83 @@
+import os
+import unittest
+
+import numpy
+from pyglet.image import load as load_image
+
+import source.dynamic_buffer
+import source.model
+import source.texture
+from source.asset_pipeline import AssetPipeline, FontData, decode_asset, format_timings
+from source.mesh import Mesh
+from source.text import Font, parse_font
+from source.texture import Image, Texture, decode_png
+from source.tests.recording_gl import RecordingGL
+
+
+RESOURCES = os.path.join(os.path.dirname(__file__), '..', '..', 'resources')
+TEXTURE   = os.path.join(RESOURCES, 'textures', 'HappyDude.png')
+FONT      = os.path.join(RESOURCES, 'fonts', 'arial.fnt')
+MODEL     = os.path.join(RESOURCES, 'models', 'cube.obj')
+
+
+class TestDecoding(unittest.TestCase):
+
+    def test_png_is_decoded_like_pyglet(self):
+        image = decode_png(TEXTURE)
+        with open(TEXTURE, 'rb') as file:  # pyglet doesn't close the files it opens.
+            expected = load_image(TEXTURE, file=file)
+        pixels = numpy.frombuffer(expected.get_data('RGBA', expected.width * 4), dtype=numpy.uint8)
+
+        self.assertEqual((image.width, image.height), (expected.width, expected.height))
+        numpy.testing.assert_array_equal(image.pixels.ravel(), pixels)
+
+    def test_font(self):
+        characters, texture_path = parse_font(FONT)
+        self.assertEqual(characters[ord('A')]['id'], ord('A'))
+        expected = os.path.join(RESOURCES, 'fonts', 'arial.png')
+        self.assertEqual(os.path.normpath(texture_path), os.path.normpath(expected))
+
+    def test_decoders_by_extension(self):
+        self.assertIsInstance(decode_asset(MODEL)[0], Mesh)
+        self.assertIsInstance(decode_asset(TEXTURE)[0], Image)
+        font, seconds = decode_asset(FONT)
+        self.assertIsInstance(font, FontData)
+        self.assertIsInstance(font.image, Image)
+        self.assertGreater(seconds, 0)
+
+
+class TestAssetPipeline(unittest.TestCase):
+
+    def setUp(self):
+        self.gl = RecordingGL(source.model, source.texture, source.dynamic_buffer).__enter__()
+
+    def tearDown(self):
+        self.gl.__exit__(None, None, None)
+
+    def test_decoded_in_workers_and_uploaded(self):
+        with AssetPipeline(workers=2) as pipeline:
+            pipeline.submit(MODEL, TEXTURE, FONT)
+            self.assertEqual(self.gl.calls, [])  # Nothing is uploaded until it's loaded.
+            assets, timings = pipeline.load()
+
+        self.assertEqual(assets[MODEL].ibo.count, 36)
+        self.assertIsInstance(assets[TEXTURE], Texture)
+        self.assertIsInstance(assets[FONT], Font)
+        self.assertEqual(self.gl.count('glTexImage2D'), 2)  # The texture and the font's.
+        self.assertEqual((assets[TEXTURE].width, assets[TEXTURE].height), (128, 128))
+
+        self.assertEqual(sorted(timing.path for timing in timings), sorted((MODEL, TEXTURE, FONT)))
+        self.assertTrue(all(timing.latency >= timing.decode for timing in timings))
+        self.assertGreaterEqual(pipeline.elapsed, max(timing.latency for timing in timings))
+
+        report = format_timings(timings, pipeline.elapsed)
+        self.assertIn('HappyDude.png', report)
+        self.assertIn('3 assets', report)
+
+    def test_load_without_assets(self):
+        with AssetPipeline(workers=1) as pipeline:
+            self.assertEqual(pipeline.load(), ({}, []))
+
+
+if __name__ == '__main__':
+    unittest.main()
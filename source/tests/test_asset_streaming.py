@@ -0,0 +1,158 @@
+import os
+import tempfile
+import unittest
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from pyglet.clock import Clock
+
+from source.asset_streaming import AssetStreamer
+from source.mesh import Mesh
+from source.texture import Image
+
+
+RESOURCES = os.path.join(os.path.dirname(__file__), '..', '..', 'resources')
+
+
+class InlineExecutor:
+    """Runs the submitted functions right away, so the files are decoded as soon as they're loaded."""
+
+    def submit(self, function, *args):
+        future = Future()
+        try:
+            future.set_result(function(*args))
+        except Exception as exception:
+            future.set_exception(exception)
+        return future
+
+    def shutdown(self):
+        pass
+
+
+class FakeUploader:
+    """Records the uploads and returns a name for each asset instead of uploading it."""
+
+    def __init__(self, timer=None, seconds=0.0):
+        self.uploads = []
+        self.timer   = timer
+        self.seconds = seconds  # Time each upload takes on 'timer'.
+
+    def __call__(self, data):
+        self.uploads.append(data)
+        if self.timer is not None:
+            self.timer.time += self.seconds
+        return 'uploaded {}'.format(len(self.uploads))
+
+
+class FakeTimer:
+
+    def __init__(self):
+        self.time = 0.0
+
+    def __call__(self):
+        return self.time
+
+
+def fake_decode(path):
+    return Image(1, 1, path), 0.0
+
+
+class TestAssetStreamer(unittest.TestCase):
+
+    def create(self, budget=0.002, uploader=None, timer=None, executor=None):
+        self.uploader = uploader or FakeUploader()
+        return AssetStreamer(
+            'placeholder texture', 'placeholder model', budget, executor or InlineExecutor(), decode=fake_decode,
+            uploaders={Image: self.uploader}, timer=timer or FakeTimer()
+        )
+
+    def test_placeholders_until_uploaded(self):
+        streamer = self.create()
+        texture = streamer.load_texture('a.png')
+        model   = streamer.load_model('b.obj')
+
+        self.assertEqual((texture.asset, model.asset), ('placeholder texture', 'placeholder model'))
+        self.assertFalse(texture.ready)
+        self.assertEqual(streamer.pending, 2)
+        self.assertEqual(self.uploader.uploads, [])  # Decoded, but nothing is uploaded outside of 'update'.
+
+        self.assertEqual(streamer.update(1 / 60), 2)
+        self.assertEqual((texture.asset, model.asset), ('uploaded 1', 'uploaded 2'))
+        self.assertTrue(texture.ready)
+        self.assertEqual(streamer.pending, 0)
+
+    def test_attributes_are_the_current_assets(self):
+        streamer = self.create()
+        texture = streamer.load_texture('a.png')
+        self.assertEqual(texture.upper(), 'PLACEHOLDER TEXTURE')
+        streamer.update()
+        self.assertEqual(texture.upper(), 'UPLOADED 1')
+
+    def test_loaded_once(self):
+        streamer = self.create()
+        self.assertIs(streamer.load_texture('a.png'), streamer.load_texture('a.png'))
+        streamer.update()
+        self.assertEqual(len(self.uploader.uploads), 1)
+
+    def test_upload_budget(self):
+        timer = FakeTimer()
+        streamer = self.create(budget=0.0025, uploader=FakeUploader(timer, seconds=0.001), timer=timer)
+        handles = [streamer.load_texture('{}.png'.format(i)) for i in range(7)]
+
+        self.assertEqual([streamer.update() for _ in range(4)], [3, 3, 1, 0])
+        self.assertTrue(all(handle.ready for handle in handles))
+
+        # An upload over the budget is still done, one per frame.
+        streamer = self.create(budget=0.0025, uploader=FakeUploader(timer, seconds=0.01), timer=timer)
+        for i in range(2):
+            streamer.load_texture('{}.png'.format(i))
+        self.assertEqual([streamer.update() for _ in range(3)], [1, 1, 0])
+
+    def test_updated_by_the_clock(self):
+        clock = Clock()
+        streamer = self.create()
+        clock.schedule(streamer.update)
+        texture = streamer.load_texture('a.png')
+
+        clock.tick()
+        self.assertTrue(texture.ready)
+
+    def test_decoded_in_the_background(self):
+        executor = ThreadPoolExecutor(2)
+        streamer = AssetStreamer('placeholder texture', 'placeholder model', executor=executor,
+                                 uploaders={Image: FakeUploader(), Mesh: FakeUploader()})
+        texture = streamer.load_texture(os.path.join(RESOURCES, 'textures', 'HappyDude.png'))
+        model   = streamer.load_model(os.path.join(RESOURCES, 'models', 'cube.obj'))
+        self.assertEqual(streamer.pending, 2)
+
+        executor.shutdown(wait=True)
+        while streamer.pending:
+            streamer.update()
+        self.assertEqual((texture.asset, model.asset), ('uploaded 1', 'uploaded 1'))
+
+    def test_decoding_errors_keep_the_placeholder(self):
+        streamer = AssetStreamer('placeholder texture', 'placeholder model', executor=InlineExecutor(),
+                                 uploaders={Image: FakeUploader()})
+        missing = streamer.load_texture(os.path.join(RESOURCES, 'textures', 'Missing.png'))
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'corrupt.png')
+            with open(path, 'wb') as file:
+                file.write(b'\x89PNG\r\n\x1a\n' + b'not a png' * 10)
+            corrupt = streamer.load_texture(path)
+            valid   = streamer.load_texture(os.path.join(RESOURCES, 'textures', 'HappyDude.png'))
+
+            with self.assertLogs('source.asset_streaming', 'ERROR') as logs:
+                self.assertEqual(streamer.update(), 1)
+
+        self.assertEqual(len(logs.records), 2)
+        self.assertEqual(streamer.pending, 0)
+        self.assertTrue(valid.ready)
+        for handle in (missing, corrupt):
+            self.assertFalse(handle.ready)
+            self.assertEqual(handle.asset, 'placeholder texture')
+            self.assertIsNotNone(handle.error)
+        self.assertIsInstance(missing.error, OSError)
+
+
+if __name__ == '__main__':
+    unittest.main()
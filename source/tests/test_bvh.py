@@ -0,0 +1,152 @@
+import unittest
+
+import numpy
+
+from source.bvh import AABBTree
+
+
+def random_boxes(count, seed=0):
+    random = numpy.random.RandomState(seed)
+    centers = random.uniform(-50, 50, size=(count, 3))
+    half_extents = random.uniform(0.1, 2, size=(count, 3))
+    return centers - half_extents, centers + half_extents
+
+
+def overlaps(minimum_a, maximum_a, minimum_b, maximum_b):
+    return numpy.all(minimum_a <= maximum_b) and numpy.all(minimum_b <= maximum_a)
+
+
+class TestAABBTree(unittest.TestCase):
+
+    def setUp(self):
+        self.minimums, self.maximums = random_boxes(500)
+        self.tree = AABBTree()
+        self.proxies = [
+            self.tree.insert(minimum, maximum, data=i)
+            for i, (minimum, maximum) in enumerate(zip(self.minimums, self.maximums))
+        ]
+
+    def test_tree_is_balanced(self):
+        self.tree.validate()
+        self.assertLessEqual(self.tree.height[self.tree.root], 2 * numpy.log2(len(self.proxies)))
+
+    def test_query_aabb(self):
+        minimum, maximum = numpy.array((-10, -10, -10)), numpy.array((15, 5, 20))
+        expected = [
+            i for i in range(len(self.minimums)) if overlaps(self.minimums[i], self.maximums[i], minimum, maximum)
+        ]
+        self.assertEqual(sorted(self.tree.query_aabb(minimum, maximum)), expected)
+
+    def test_remove_and_refit(self):
+        random = numpy.random.RandomState(1)
+        for i in range(0, 500, 3):
+            self.tree.remove(self.proxies[i])
+        for i in range(1, 500, 3):
+            offset = random.uniform(-5, 5, size=3)
+            self.minimums[i] += offset
+            self.maximums[i] += offset
+            self.tree.refit(self.proxies[i], self.minimums[i], self.maximums[i])
+        self.tree.validate()
+
+        minimum, maximum = numpy.array((-30, -30, -30)), numpy.array((0, 10, 30))
+        expected = [
+            i for i in range(len(self.minimums))
+            if i % 3 != 0 and overlaps(self.minimums[i], self.maximums[i], minimum, maximum)
+        ]
+        self.assertEqual(sorted(self.tree.query_aabb(minimum, maximum)), expected)
+
+    def test_small_moves_keep_the_tree(self):
+        self.assertFalse(self.tree.refit(self.proxies[0], self.minimums[0] + 0.05, self.maximums[0] + 0.05))
+        self.assertTrue(self.tree.refit(self.proxies[0], self.minimums[0] + 1, self.maximums[0] + 1))
+
+    def test_ray_cast(self):
+        # Aimed at the center of a box, so something is hit.
+        origin = numpy.array((-100.0, 1.0, 2.0))
+        direction = (self.minimums[7] + self.maximums[7]) / 2 - origin
+
+        best = None
+        for i, (minimum, maximum) in enumerate(zip(self.minimums, self.maximums)):
+            near, far = 0, numpy.inf
+            for axis in range(3):
+                t1, t2 = sorted(((minimum[axis] - origin[axis]) / direction[axis],
+                                 (maximum[axis] - origin[axis]) / direction[axis]))
+                near, far = max(near, t1), min(far, t2)
+            if near <= far and (best is None or near < best[1]):
+                best = (i, near)
+
+        data, distance = self.tree.ray_cast(origin, direction)
+        self.assertEqual(data, best[0])
+        self.assertAlmostEqual(distance, best[1])
+
+    def test_ray_cast_parallel_to_axes(self):
+        # Rays along an axis from the center of a box, which are parallel to the other two axes' slabs.
+        for box, axis in ((3, 0), (11, 1), (42, 2)):
+            origin = (self.minimums[box] + self.maximums[box]) / 2
+            direction = numpy.zeros(3)
+            direction[axis] = -1.0
+
+            inside = numpy.all((self.minimums <= origin) & (origin <= self.maximums), axis=1)
+            data, distance = self.tree.ray_cast(origin, direction)
+            self.assertTrue(inside[data])
+            self.assertEqual(distance, 0.0)
+
+            # Starting outside of every box, the first box hit is the closest one on the line.
+            origin[axis] = 100.0
+            others  = [other for other in range(3) if other != axis]
+            on_line = numpy.all(
+                (self.minimums[:, others] <= origin[others]) & (origin[others] <= self.maximums[:, others]), axis=1
+            )
+            expected = numpy.flatnonzero(on_line)[numpy.argmax(self.maximums[on_line, axis])]
+            data, distance = self.tree.ray_cast(origin, direction)
+            self.assertEqual(data, expected)
+            self.assertAlmostEqual(distance, 100.0 - self.maximums[expected, axis])
+
+    def test_ray_cast_miss(self):
+        self.assertIsNone(self.tree.ray_cast((0, 0, 1000), (0, 1, 0)))
+        self.assertIsNone(self.tree.ray_cast((-100, 0, 0), (1, 0, 0), max_distance=1))
+
+    def test_query_frustum(self):
+        # A box shaped "frustum": 0 <= x <= 20, -5 <= y <= 5, -50 <= z <= 50.
+        planes = [(1, 0, 0, 0), (-1, 0, 0, 20), (0, 1, 0, 5), (0, -1, 0, 5), (0, 0, 1, 50), (0, 0, -1, 50)]
+        expected = self.tree.query_aabb((0, -5, -50), (20, 5, 50))
+        self.assertEqual(sorted(self.tree.query_frustum(planes)), sorted(expected))
+
+
+class TestAABBTreeCreate(unittest.TestCase):
+
+    def test_create_matches_insert(self):
+        minimums, maximums = random_boxes(1000, seed=2)
+        tree, proxies = AABBTree.create(minimums, maximums)
+        tree.validate()
+        self.assertEqual(len(tree), 1000)
+        self.assertLessEqual(tree.height[tree.root], 10)  # Perfectly balanced.
+
+        inserted = AABBTree()
+        for i, (minimum, maximum) in enumerate(zip(minimums, maximums)):
+            inserted.insert(minimum, maximum, data=i)
+
+        query = (-20, -20, -20), (10, 30, 5)
+        self.assertEqual(sorted(tree.query_aabb(*query)), sorted(inserted.query_aabb(*query)))
+
+    def test_created_tree_can_change(self):
+        minimums, maximums = random_boxes(100, seed=3)
+        tree, proxies = AABBTree.create(minimums, maximums, data=['box {}'.format(i) for i in range(100)])
+        for proxy in proxies[:50]:
+            tree.remove(proxy)
+        for proxy in proxies[50:]:
+            tree.refit(proxy, minimums[proxy] + 10, maximums[proxy] + 10)
+        proxy = tree.insert((0, 0, 0), (1, 1, 1), data='new box')
+        tree.validate()
+
+        self.assertEqual(len(tree), 51)
+        self.assertEqual(tree.get_data(proxies[60]), 'box 60')
+        self.assertEqual(tree.get_data(proxy), 'new box')
+
+    def test_create_empty(self):
+        tree, proxies = AABBTree.create(numpy.empty((0, 3)), numpy.empty((0, 3)))
+        self.assertEqual(proxies, [])
+        self.assertIsNone(tree.ray_cast((0, 0, 0), (1, 0, 0)))
+
+
+if __name__ == '__main__':
+    unittest.main()
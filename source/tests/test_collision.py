@@ -0,0 +1,113 @@
+import unittest
+
+import numpy
+
+from source.collision import SpatialHash, broadphase
+from source.entity import World, Transform, Collidable
+
+
+def brute_force_pairs(minimums, maximums):
+    pairs = []
+    for i in range(len(minimums)):
+        for j in range(i + 1, len(minimums)):
+            if numpy.all(minimums[i] <= maximums[j]) and numpy.all(minimums[j] <= maximums[i]):
+                pairs.append((i, j))
+    return sorted(pairs)
+
+
+def random_boxes(count, size, seed=0):
+    random = numpy.random.RandomState(seed)
+    centers = random.uniform(-size, size, size=(count, 3)).astype(numpy.float32)
+    half_extents = random.uniform(0.1, 1.5, size=(count, 3)).astype(numpy.float32)
+    return centers - half_extents, centers + half_extents
+
+
+class TestSpatialHash(unittest.TestCase):
+
+    def assert_same_as_brute_force(self, spatial_hash, minimums, maximums):
+        spatial_hash.build(minimums, maximums)
+        pairs = sorted(map(tuple, spatial_hash.pairs().tolist()))
+        self.assertEqual(pairs, brute_force_pairs(minimums, maximums))
+
+    def test_default_cell_size(self):
+        self.assert_same_as_brute_force(SpatialHash(), *random_boxes(400, 15))
+
+    def test_small_cells(self):
+        # Boxes overlap many cells.
+        self.assert_same_as_brute_force(SpatialHash(cell_size=0.5), *random_boxes(200, 10, seed=1))
+
+    def test_large_cells(self):
+        self.assert_same_as_brute_force(SpatialHash(cell_size=100), *random_boxes(200, 10, seed=2))
+
+    def test_big_collider(self):
+        minimums, maximums = random_boxes(300, 15, seed=3)
+        minimums = numpy.vstack((minimums, [(-100, -1, -100), (-5, -5, -5)]))
+        maximums = numpy.vstack((maximums, [(100, 1, 100), (5, 5, 5)]))
+        spatial_hash = SpatialHash()
+        self.assert_same_as_brute_force(spatial_hash, minimums, maximums)
+        self.assertLess(spatial_hash.grid_cell_size, 10)  # Not the size of the biggest box.
+        self.assertEqual(sorted(spatial_hash.oversized), [300, 301])
+
+    def test_mixed_sizes(self):
+        # Oversized boxes are tested against the cells they overlap, and each other with coarser grids.
+        random = numpy.random.RandomState(4)
+        centers = random.uniform(-20, 20, size=(400, 3)).astype(numpy.float32)
+        half_extents = random.pareto(1.5, size=(400, 3)).astype(numpy.float32) * 0.5 + 0.1
+        self.assert_same_as_brute_force(SpatialHash(), centers - half_extents, centers + half_extents)
+
+    def test_touching_boxes(self):
+        minimums = [(0, 0, 0), (1, 0, 0), (2.5, 0, 0)]
+        maximums = [(1, 1, 1), (2, 1, 1), (3, 1, 1)]
+        spatial_hash = SpatialHash()
+        spatial_hash.build(minimums, maximums)
+        self.assertEqual(spatial_hash.pairs().tolist(), [[0, 1]])
+
+    def test_point_colliders(self):
+        random = numpy.random.RandomState(5)
+        points = random.uniform(-10, 10, size=(300, 3)).astype(numpy.float32)
+        points[1] = points[0]
+        spatial_hash = SpatialHash()
+        self.assert_same_as_brute_force(spatial_hash, points, points)
+        self.assertEqual(spatial_hash.pairs().tolist(), [[0, 1]])
+
+        # With a few boxes among the points, which are oversized.
+        minimums, maximums = points.copy(), points.copy()
+        minimums[:3] -= 5
+        maximums[:3] += 5
+        self.assert_same_as_brute_force(spatial_hash, minimums, maximums)
+
+    def test_tiny_cells_in_a_large_world(self):
+        random = numpy.random.RandomState(6)
+        minimums = random.uniform(-1e5, 1e5, size=(200, 3)).astype(numpy.float32)
+        minimums[1] = minimums[0] + 0.0005
+        self.assert_same_as_brute_force(SpatialHash(cell_size=1e-3), minimums, minimums + 0.001)
+
+    def test_empty(self):
+        spatial_hash = SpatialHash()
+        spatial_hash.build(numpy.empty((0, 3)), numpy.empty((0, 3)))
+        self.assertEqual(spatial_hash.pairs().shape, (0, 2))
+
+
+class TestBroadphase(unittest.TestCase):
+
+    def test_entity_pairs(self):
+        world = World()
+
+        def transform(x, scale=1):
+            return Transform(location=(x, 0, 0), rotation=(0, 0, 0), scale=(scale, scale, scale))
+
+        a = world.create_entity(transform(0), Collidable(hitbox=(1, 1, 1)))
+        b = world.create_entity(transform(1), Collidable(hitbox=(0.5, 0.5, 0.5)))
+        c = world.create_entity(transform(4, scale=2), Collidable(hitbox=(1, 1, 1)))
+        world.create_entity(transform(0))  # Not collidable.
+
+        self.assertEqual(broadphase(world).tolist(), [[a.id, b.id]])
+
+        # Scaling makes the third entity reach the others.
+        world.set_components(c, transform(4, scale=6))
+
+        self.assertEqual(sorted(broadphase(world).tolist()), [[a.id, b.id], [a.id, c.id], [b.id, c.id]])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+import unittest
+
+import numpy
+
+from source.culling import FrustumCuller, bounding_spheres, spheres_in_frustum
+from source.linear_algebra import frustum_planes, perspective_matrix, transformation_matrix, transformation_matrices
+from source.model import Bounds, compute_bounds
+
+
+class TestFrustumPlanes(unittest.TestCase):
+
+    def test_points_match_clip_space(self):
+        perspective = perspective_matrix(60, 1.5, 0.1, 100)
+        view = transformation_matrix(1, -2, -10, 0.1, 0.3, 0)
+        matrix = perspective @ view
+        planes = frustum_planes(matrix)
+
+        random = numpy.random.RandomState(0)
+        points = random.uniform(-30, 30, size=(2000, 3))
+        clip = numpy.column_stack((points, numpy.ones(len(points)))) @ matrix.T
+        w = clip[:, 3:]
+        expected = numpy.all((-w <= clip[:, :3]) & (clip[:, :3] <= w), axis=1)
+
+        inside = spheres_in_frustum(planes, points, numpy.zeros(len(points)))
+        numpy.testing.assert_array_equal(inside, expected)
+        self.assertTrue(0 < expected.sum() < len(points))
+
+    def test_planes_are_normalized(self):
+        planes = frustum_planes(perspective_matrix(90, 1, 1, 10))
+        numpy.testing.assert_allclose(numpy.linalg.norm(planes[:, :3], axis=1), 1)
+
+
+class TestBoundingSpheres(unittest.TestCase):
+
+    def test_compute_bounds(self):
+        bounds = compute_bounds([-1, 0, 0, 3, 2, 0, 1, 1, 4])
+        numpy.testing.assert_array_equal(bounds.minimum, (-1, 0, 0))
+        numpy.testing.assert_array_equal(bounds.maximum, (3, 2, 4))
+        numpy.testing.assert_array_equal(bounds.center, (1, 1, 2))
+        self.assertAlmostEqual(bounds.radius, numpy.sqrt(4 + 1 + 4))
+
+    def test_spheres_contain_transformed_vertices(self):
+        random = numpy.random.RandomState(1)
+        vertices = random.uniform(-1, 2, size=(50, 3))
+        bounds = compute_bounds(vertices.ravel())
+
+        count = 20
+        matrices = transformation_matrices(
+            random.uniform(-10, 10, size=(count, 3)), random.uniform(-3, 3, size=(count, 3)),
+            random.uniform(0.1, 5, size=(count, 3))
+        )
+        centers, radii = bounding_spheres(matrices, bounds.center, bounds.radius)
+
+        transformed = numpy.einsum('nij,vj->nvi', matrices[:, :3, :3], vertices) + matrices[:, numpy.newaxis, :3, 3]
+        distances = numpy.linalg.norm(transformed - centers[:, numpy.newaxis], axis=2)
+        self.assertTrue(numpy.all(distances <= radii[:, numpy.newaxis] * (1 + 1e-5)))
+
+
+class TestFrustumCuller(unittest.TestCase):
+
+    def setUp(self):
+        self.culler = FrustumCuller()
+        self.culler.begin_frame(perspective_matrix(60, 1, 0.1, 100), transformation_matrix(0, 0, -10))
+        self.bounds = Bounds(numpy.full(3, -0.5), numpy.full(3, 0.5), numpy.zeros(3), numpy.sqrt(0.75))
+
+    def test_culls_instances_outside(self):
+        locations = [(0, 0, 0), (0, 0, 20), (50, 0, 0), (0, -50, 0), (0, 0, -5000), (3, 3, -5)]
+        count = len(locations)
+        matrices = transformation_matrices(locations, numpy.zeros((count, 3)), numpy.ones((count, 3)))
+
+        visible = self.culler.cull(matrices, self.bounds)
+        numpy.testing.assert_array_equal(visible, (0, 5))
+        self.assertEqual((self.culler.visible, self.culler.culled), (2, 4))
+
+    def test_scale_makes_instances_visible(self):
+        # Just outside the left plane, unless it's scaled up.
+        matrices = transformation_matrices([(-10, 0, 0)] * 2, numpy.zeros((2, 3)), [(1, 1, 1), (10, 1, 1)])
+        numpy.testing.assert_array_equal(self.culler.cull(matrices, self.bounds), (1,))
+
+    def test_without_bounds_nothing_is_culled(self):
+        matrices = transformation_matrices([(0, 0, 500)] * 3, numpy.zeros((3, 3)), numpy.ones((3, 3)))
+        numpy.testing.assert_array_equal(self.culler.cull(matrices, None), (0, 1, 2))
+
+    def test_counters_are_reset(self):
+        matrices = transformation_matrices([(0, 0, 500)], numpy.zeros((1, 3)), numpy.ones((1, 3)))
+        self.culler.cull(matrices, self.bounds)
+        self.culler.begin_frame(perspective_matrix(60, 1, 0.1, 100), transformation_matrix(0, 0, -10))
+        self.assertEqual((self.culler.visible, self.culler.culled), (0, 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
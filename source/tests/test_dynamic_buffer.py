@@ -0,0 +1,74 @@
+import unittest
+
+import numpy
+from pyglet.gl import GL_ARRAY_BUFFER
+
+import source.dynamic_buffer
+from source.dynamic_buffer import DynamicBuffer, RingBuffer
+from source.tests.recording_gl import RecordingGL
+
+
+class TestDynamicBuffer(unittest.TestCase):
+
+    def setUp(self):
+        self.gl = RecordingGL(source.dynamic_buffer).__enter__()
+
+    def tearDown(self):
+        self.gl.__exit__(None, None, None)
+
+    def test_update_writes_a_range(self):
+        buffer = DynamicBuffer.create(capacity=64)
+        data = numpy.arange(4, dtype=numpy.float32)
+        buffer.update(data, offset=16)
+
+        self.assertEqual(self.gl.arguments('glBufferSubData'), [(GL_ARRAY_BUFFER, 16, 16, data.ctypes.data)])
+        with self.assertRaises(AssertionError):
+            buffer.update(data, offset=56)
+
+    def test_orphan_keeps_the_handle(self):
+        buffer = DynamicBuffer.create(capacity=64)
+        buffer.orphan()
+
+        self.assertEqual(self.gl.count('glGenBuffers'), 1)
+        self.assertEqual(self.gl.arguments('glBufferData')[-1], (GL_ARRAY_BUFFER, 64, None, buffer.draw_mode))
+
+    def test_upload_grows_by_doubling(self):
+        buffer = DynamicBuffer.create(capacity=16)
+        buffer.upload(numpy.zeros(10, dtype=numpy.float32))
+        self.assertEqual(buffer.capacity, 64)
+
+        buffer.upload(b'1234')
+        self.assertEqual(buffer.capacity, 64)
+        self.assertEqual(self.gl.arguments('glBufferSubData')[-1][:3], (GL_ARRAY_BUFFER, 0, 4))
+
+
+class TestRingBuffer(unittest.TestCase):
+
+    def setUp(self):
+        self.gl = RecordingGL(source.dynamic_buffer).__enter__()
+
+    def tearDown(self):
+        self.gl.__exit__(None, None, None)
+
+    def test_allocations_are_consecutive_and_aligned(self):
+        ring = RingBuffer.create(capacity=256, alignment=16)
+        offsets = [ring.allocate(numpy.zeros(count, dtype=numpy.float32)) for count in (3, 4, 1)]
+        self.assertEqual(offsets, [0, 16, 32])
+
+    def test_wrapping_orphans_the_buffer(self):
+        ring = RingBuffer.create(capacity=64)
+        for _ in range(10):
+            ring.allocate(numpy.zeros(6, dtype=numpy.float32))
+
+        self.assertEqual(ring.wraps, 4)  # Two allocations fit.
+        self.assertEqual(self.gl.count('glBufferData'), 1 + ring.wraps)
+        self.assertEqual(self.gl.count('glGenBuffers'), 1)
+
+    def test_grows_for_large_allocations(self):
+        ring = RingBuffer.create(capacity=64)
+        self.assertEqual(ring.allocate(numpy.zeros(100, dtype=numpy.float32)), 0)
+        self.assertEqual(ring.buffer.capacity, 512)
+
+
+if __name__ == '__main__':
+    unittest.main()
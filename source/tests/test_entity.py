@@ -0,0 +1,447 @@
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy
+
+from source.entity import (
+    Transform, PointLight, Physics, Renderable, Collidable, World, ArchetypeStorage, CommandBuffer
+)
+from source.linear_algebra import transformation_matrix
+
+
+class TestTransform(unittest.TestCase):
+
+    def setUp(self):
+        Transform.reset_statistics()
+        self.transform = Transform(location=(1, 2, 3), rotation=(0.1, 0.2, 0.3), scale=(1, 2, 1))
+
+    def assert_matrix_is_current(self):
+        expected = transformation_matrix(*self.transform.location, *self.transform.rotation, *self.transform.scale)
+        numpy.testing.assert_allclose(self.transform.matrix(), expected)
+
+    def test_static_transform_is_cached(self):
+        for _ in range(10):
+            self.transform.matrix()
+        self.assertEqual(Transform.misses, 1)
+        self.assertEqual(Transform.hits, 9)
+
+    def test_in_place_item_modification(self):
+        self.transform.matrix()
+        self.transform.location[0] += 0.5
+        self.transform.rotation[1] -= 0.5
+        self.assertTrue(self.transform.dirty)
+        self.assert_matrix_is_current()
+        self.assertEqual(Transform.misses, 2)
+
+    def test_in_place_vector_modification(self):
+        self.transform.matrix()
+        scale = self.transform.scale
+        scale *= 2
+        self.assertTrue(self.transform.dirty)
+        self.assert_matrix_is_current()
+
+    def test_assignment(self):
+        self.transform.matrix()
+        self.transform.location = (4, 5, 6)
+        self.assertTrue(self.transform.dirty)
+        self.assert_matrix_is_current()
+
+    def test_arithmetic_does_not_invalidate(self):
+        self.transform.matrix()
+        moved = self.transform.location + 1
+        moved[0] = 100
+        self.assertFalse(self.transform.dirty)
+        self.assertEqual(self.transform.location[0], 1)
+
+    def test_slice_modification(self):
+        self.transform.matrix()
+        self.transform.location[:2] += 1
+        self.assert_matrix_is_current()
+
+        view = self.transform.scale[1:]
+        view *= 2
+        self.assertTrue(self.transform.dirty)
+        self.assert_matrix_is_current()
+
+    def test_ufunc_output_and_fill_modification(self):
+        self.transform.matrix()
+        numpy.add(self.transform.location, (1, 1, 1), out=self.transform.location)
+        self.assertTrue(self.transform.dirty)
+        self.assert_matrix_is_current()
+
+        numpy.multiply.at(self.transform.rotation, [0, 2], 2)
+        self.assertTrue(self.transform.dirty)
+        self.assert_matrix_is_current()
+
+        self.transform.scale.fill(3)
+        self.assertTrue(self.transform.dirty)
+        self.assert_matrix_is_current()
+
+        # Only the output is modified, not the inputs.
+        numpy.add(self.transform.location, 1, out=numpy.empty(3, dtype=numpy.float32))
+        self.assertFalse(self.transform.dirty)
+
+    def test_copies_do_not_invalidate(self):
+        self.transform.matrix()
+        copy = self.transform.location.copy()
+        copy[0] = 100
+        self.assertFalse(self.transform.dirty)
+
+    def test_cached_matrix_is_read_only(self):
+        with self.assertRaises(ValueError):
+            self.transform.matrix()[0, 3] = 100
+        self.assert_matrix_is_current()
+
+
+class TestArchetypeStorage(unittest.TestCase):
+
+    def test_numeric_components_are_structured_arrays(self):
+        storage = ArchetypeStorage(Transform, Physics)
+        for i in range(100):
+            storage.create(
+                i,
+                Transform(location=(i, 0, 0), rotation=(0, 0, 0), scale=(1, 1, 1)),
+                Physics(velocity=(1, 2, 3), acceleration=(0, 0, 0), max_speed=10)
+            )
+
+        transforms, physics = storage.arrays(Transform, Physics)
+        self.assertEqual(transforms.dtype, Transform.dtype)
+        self.assertEqual(len(transforms), 100)
+        numpy.testing.assert_array_equal(transforms['location'][:, 0], numpy.arange(100))
+        numpy.testing.assert_array_equal(physics['max_speed'], 10)
+
+    def test_destroy_moves_last_into_hole(self):
+        storage = ArchetypeStorage(Transform)
+        for i in range(3):
+            storage.create(i, Transform(location=(i, 0, 0), rotation=(0, 0, 0), scale=(1, 1, 1)))
+
+        moved = storage.destroy(0)
+
+        self.assertEqual(moved, 2)
+        self.assertEqual(storage.count, 2)
+        self.assertEqual(storage.ids.data[0], 2)
+        transform, = storage.get(0)
+        self.assertEqual(transform.location[0], 2)
+
+    def test_object_components(self):
+        storage = ArchetypeStorage(Renderable)
+        renderable = Renderable('shader', 'model', 'texture')
+        storage.create(0, renderable)
+        self.assertIs(storage.get(0)[0], renderable)
+
+
+class TestWorld(unittest.TestCase):
+
+    def test_arrays_are_views(self):
+        world = World()
+        for i in range(10):
+            world.create_entity(
+                Transform(location=(0, 0, 0), rotation=(0, 0, 0), scale=(1, 1, 1)),
+                Physics(velocity=(i, 0, 0), acceleration=(0, 0, 0), max_speed=10)
+            )
+        world.create_entity(Transform(location=(0, 0, 0), rotation=(0, 0, 0), scale=(1, 1, 1)))
+
+        for transforms, physics in world.get_component_arrays_of(Transform, Physics):
+            transforms['location'] += physics['velocity']
+
+        arrays = world.get_component_arrays_of(Transform)
+        locations = numpy.concatenate([transforms['location'][:, 0] for transforms, in arrays])
+        self.assertEqual(sorted(locations), [0] + list(range(10)))
+
+    def test_query_matches_supersets(self):
+        world = World()
+        world.create_entity(
+            Transform(location=(1, 2, 3), rotation=(0, 0, 0), scale=(1, 1, 1)),
+            PointLight(color=(1, 1, 1), attenuation=(1.0, 0.009, 0.032))
+        )
+        world.create_entity(Transform(location=(0, 0, 0), rotation=(0, 0, 0), scale=(1, 1, 1)))
+
+        lights = world.get_component_arrays_of(Transform, PointLight)
+
+        self.assertEqual(len(lights), 1)
+        transforms, point_lights = lights[0]
+        numpy.testing.assert_array_equal(transforms['location'], [(1, 2, 3)])
+        numpy.testing.assert_allclose(point_lights['attenuation'], [(1.0, 0.009, 0.032)])
+
+    def test_signatures_are_bitmasks(self):
+        world = World()
+        entity = world.create_entity(
+            Transform(location=(0, 0, 0), rotation=(0, 0, 0), scale=(1, 1, 1)),
+            Physics(velocity=(0, 0, 0), acceleration=(0, 0, 0), max_speed=1)
+        )
+        self.assertEqual(world.get_signature(entity), world.component_bit[Transform] | world.component_bit[Physics])
+
+        world.remove_components(entity, Physics)
+        self.assertEqual(world.get_signature(entity), world.component_bit[Transform])
+
+        world.remove_components(entity, Transform)
+        self.assertEqual(world.get_signature(entity), 0)
+
+    def test_unregistered_components_are_registered_on_use(self):
+        class Frozen:
+            pass
+
+        world = World()
+        entity = world.create_entity(Frozen())
+        self.assertEqual(world.get_signature(entity), world.component_bit[Frozen])
+        self.assertEqual(len(world.get_component_arrays_of(Frozen)), 1)
+
+    def test_query_cache(self):
+        world = World()
+        world.create_entity(Transform(location=(0, 0, 0), rotation=(0, 0, 0), scale=(1, 1, 1)))
+
+        archetypes = world.get_archetypes_of(Transform)
+        self.assertIs(world.get_archetypes_of(Transform), archetypes)
+
+        # Existing archetype, so the cache is kept.
+        world.create_entity(Transform(location=(1, 0, 0), rotation=(0, 0, 0), scale=(1, 1, 1)))
+        self.assertIs(world.get_archetypes_of(Transform), archetypes)
+
+        # New archetype, which also matches the query.
+        world.create_entity(
+            Transform(location=(0, 0, 0), rotation=(0, 0, 0), scale=(1, 1, 1)), Collidable(hitbox=(1, 1, 1))
+        )
+        self.assertEqual(len(world.get_archetypes_of(Transform)), 2)
+        self.assertEqual(len(world.get_archetypes_of(Collidable)), 1)
+
+    def test_concurrent_registration(self):
+        world = World()
+        Components = [type('Component{}'.format(i), (), {}) for i in range(50)]
+        barrier = threading.Barrier(8)
+
+        def register():
+            barrier.wait()
+            return [world.signature_of(Components[i:i + 1]) for i in range(len(Components))]
+
+        with ThreadPoolExecutor(8) as executor:
+            signatures = list(executor.map(lambda _: register(), range(8)))
+
+        self.assertTrue(all(bits == signatures[0] for bits in signatures))
+        self.assertEqual(len(set(signatures[0])), len(Components))
+        for Component, bit in zip(Components, signatures[0]):
+            self.assertEqual(world.components_of(bit), [Component])
+
+
+class TestEntityHandles(unittest.TestCase):
+
+    @staticmethod
+    def transform(x):
+        return Transform(location=(x, 0, 0), rotation=(0, 0, 0), scale=(1, 1, 1))
+
+    def test_handles_survive_swap_remove(self):
+        world = World()
+        entities = [world.create_entity(self.transform(i)) for i in range(5)]
+
+        world.destroy_entity(entities[0])  # Moves the last entity into the hole.
+        world.destroy_entity(entities[2])
+
+        for i in (1, 3, 4):
+            transform, = world.get_components(entities[i], Transform)
+            self.assertEqual(transform.location[0], i)
+
+    def test_handles_survive_archetype_moves(self):
+        world = World()
+        entities = [world.create_entity(self.transform(i)) for i in range(5)]
+
+        world.add_components(entities[1], Collidable(hitbox=(1, 1, 1)))
+        world.remove_components(entities[3], Transform)
+
+        for i in (0, 1, 2, 4):
+            transform, = world.get_components(entities[i], Transform)
+            self.assertEqual(transform.location[0], i)
+        self.assertEqual(world.get_components(entities[3]), [])
+
+    def test_stale_handles_are_detected(self):
+        world = World()
+        entity = world.create_entity(self.transform(0))
+        world.destroy_entity(entity)
+
+        reused = world.create_entity(self.transform(1))
+
+        self.assertEqual(reused.id, entity.id)
+        self.assertFalse(world.is_alive(entity))
+        self.assertTrue(world.is_alive(reused))
+        with self.assertRaises(ValueError):
+            world.get_components(entity)
+        with self.assertRaises(ValueError):
+            world.destroy_entity(entity)
+
+    def test_adding_existing_component_replaces_it(self):
+        world = World()
+        entity = world.create_entity(self.transform(0))
+        world.add_components(entity, self.transform(7))
+        transform, = world.get_components(entity, Transform)
+        self.assertEqual(transform.location[0], 7)
+
+    def test_churn(self):
+        world = World()
+        random = numpy.random.RandomState(0)
+        alive = {}
+        for step in range(2000):
+            if alive and random.rand() < 0.45:
+                entity = list(alive)[random.randint(len(alive))]
+                world.destroy_entity(entity)
+                del alive[entity]
+            else:
+                entity = world.create_entity(self.transform(step))
+                alive[entity] = step
+
+        for entity, x in alive.items():
+            transform, = world.get_components(entity, Transform)
+            self.assertEqual(transform.location[0], x)
+        transforms, = world.get_component_arrays_of(Transform)[0]
+        self.assertEqual(len(transforms), len(alive))
+
+
+
+class Frozen:
+    pass
+
+
+class TestBatchedMigration(unittest.TestCase):
+
+    @staticmethod
+    def transform(x):
+        return Transform(location=(x, 0, 0), rotation=(0, 0, 0), scale=(1, 1, 1))
+
+    def setUp(self):
+        self.world = World()
+        self.entities = [self.world.create_entity(self.transform(i)) for i in range(100)]
+        for entity in self.entities[::10]:
+            self.world.add_components(entity, Collidable(hitbox=(1, 1, 1)))
+
+    def assert_entities_intact(self):
+        for i, entity in enumerate(self.entities):
+            transform, = self.world.get_components(entity, Transform)
+            self.assertEqual(transform.location[0], i)
+
+    def test_add_components_to_many(self):
+        tagged = self.entities[5:60]
+        physics = Physics(velocity=(1, 0, 0), acceleration=(0, 0, 0), max_speed=2)
+        self.world.add_components_to_many(tagged, Frozen(), physics)
+
+        self.assert_entities_intact()
+        for entity in self.entities:
+            has_frozen = self.world.get_signature(entity) & self.world.component_bit[Frozen]
+            self.assertEqual(bool(has_frozen), entity in tagged)
+
+        frozen = sum(len(physics) for physics, _ in self.world.get_component_arrays_of(Physics, Frozen))
+        self.assertEqual(frozen, len(tagged))
+        for physics, in self.world.get_component_arrays_of(Physics):
+            numpy.testing.assert_array_equal(physics['max_speed'], 2)
+
+    def test_remove_components_from_many(self):
+        self.world.add_components_to_many(self.entities, Frozen())
+        self.world.remove_components_from_many(self.entities[::3], Frozen, Collidable)
+
+        self.assert_entities_intact()
+        for i, entity in enumerate(self.entities):
+            signature = self.world.get_signature(entity)
+            self.assertEqual(bool(signature & self.world.component_bit[Frozen]), i % 3 != 0)
+            self.assertEqual(bool(signature & self.world.component_bit[Collidable]), i % 3 != 0 and i % 10 == 0)
+
+    def test_destroy_entities(self):
+        destroyed = self.entities[::2]
+        self.world.destroy_entities(destroyed)
+
+        for entity in destroyed:
+            self.assertFalse(self.world.is_alive(entity))
+        for i, entity in enumerate(self.entities[1::2]):
+            transform, = self.world.get_components(entity, Transform)
+            self.assertEqual(transform.location[0], 2 * i + 1)
+        count = sum(len(transforms) for transforms, in self.world.get_component_arrays_of(Transform))
+        self.assertEqual(count, 50)
+
+    def test_stale_entities_are_rejected(self):
+        self.world.destroy_entity(self.entities[0])
+        with self.assertRaises(ValueError):
+            self.world.add_components_to_many(self.entities[:10], Frozen())
+
+
+
+class TestCommandBuffer(unittest.TestCase):
+
+    @staticmethod
+    def transform(x):
+        return Transform(location=(x, 0, 0), rotation=(0, 0, 0), scale=(1, 1, 1))
+
+    def setUp(self):
+        self.world = World()
+        self.entities = [self.world.create_entity(self.transform(i)) for i in range(20)]
+        self.commands = CommandBuffer(self.world)
+
+    def test_changes_are_deferred_until_flush(self):
+        for transforms, in self.world.get_component_arrays_of(Transform):
+            for x in transforms['location'][:, 0]:
+                entity = self.entities[int(x)]
+                if x % 2 == 0:
+                    self.commands.destroy_entity(entity)
+                else:
+                    velocity = (x, 0, 0)
+                    physics = Physics(velocity=velocity, acceleration=(0, 0, 0), max_speed=9)
+                    self.commands.add_components(entity, physics)
+            self.commands.create_entity(self.transform(100))
+            self.assertEqual(len(transforms), 20)  # Nothing has changed yet.
+
+        self.commands.flush()
+
+        self.assertEqual(len(self.commands), 0)
+        for i, entity in enumerate(self.entities):
+            self.assertEqual(self.world.is_alive(entity), i % 2 == 1)
+        for transforms, physics in self.world.get_component_arrays_of(Transform, Physics):
+            numpy.testing.assert_array_equal(transforms['location'][:, 0], physics['velocity'][:, 0])
+            self.assertEqual(len(transforms), 10)
+        self.assertEqual(sum(len(t) for t, in self.world.get_component_arrays_of(Transform)), 11)
+
+    def test_order_is_kept_for_the_same_entity(self):
+        entity = self.entities[0]
+        self.commands.add_components(entity, Collidable(hitbox=(1, 1, 1)))
+        self.commands.remove_components(entity, Collidable)
+        self.commands.add_components(entity, Collidable(hitbox=(2, 2, 2)))
+        self.commands.add_components(entity, Collidable(hitbox=(3, 3, 3)))
+        self.commands.flush()
+
+        collidable, = self.world.get_components(entity, Collidable)
+        numpy.testing.assert_array_equal(collidable.hitbox, (3, 3, 3))
+
+    def test_interleaved_commands_are_grouped(self):
+        calls = []
+        for name in ('add_component_columns', 'remove_components_from_many', 'destroy_entities'):
+            method = getattr(self.world, name)
+            setattr(self.world, name, lambda entities, *args, name=name, method=method: (
+                calls.append((name, [entity.id for entity in entities])), method(entities, *args)
+            ))
+
+        for i, entity in enumerate(self.entities[:6]):
+            if i % 3 == 0:
+                self.commands.destroy_entity(entity)
+            elif i % 3 == 1:
+                self.commands.add_components(entity, Collidable(hitbox=(i, i, i)))
+            else:
+                self.commands.add_components(entity, Physics(velocity=(i, 0, 0), acceleration=(0, 0, 0), max_speed=9))
+        self.commands.remove_components(self.entities[1], Collidable)  # Must stay after the add.
+        self.commands.flush()
+
+        # One call per kind and component classes, except for the second command on entity 1, which comes last.
+        self.assertEqual(sorted(calls[:3]), [
+            ('add_component_columns', [1, 4]), ('add_component_columns', [2, 5]), ('destroy_entities', [0, 3]),
+        ])
+        self.assertEqual(calls[3:], [('remove_components_from_many', [1])])
+        collidable, = self.world.get_components(self.entities[4], Collidable)
+        numpy.testing.assert_array_equal(collidable.hitbox, (4, 4, 4))
+        self.assertFalse(self.world.get_signature(self.entities[1]) & self.world.component_bit[Collidable])
+
+    def test_commands_on_destroyed_entities_are_ignored(self):
+        entity = self.entities[0]
+        self.commands.destroy_entity(entity)
+        self.commands.add_components(entity, Collidable(hitbox=(1, 1, 1)))
+        self.commands.destroy_entity(entity)
+        self.commands.flush()
+
+        self.assertFalse(self.world.is_alive(entity))
+        self.assertEqual(self.world.get_component_arrays_of(Collidable), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
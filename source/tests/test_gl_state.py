@@ -0,0 +1,74 @@
+import unittest
+
+from pyglet.gl import (
+    GL_DEPTH_TEST, GL_CULL_FACE, GL_ARRAY_BUFFER, GL_ELEMENT_ARRAY_BUFFER, GL_TEXTURE_2D, GL_TEXTURE0, GL_FLOAT,
+    GL_FALSE, GLuint
+)
+
+import source.model
+from source.gl_state import gl_state
+from source.model import create_cube
+from source.tests.recording_gl import RecordingGL
+
+
+class TestGLState(unittest.TestCase):
+
+    def setUp(self):
+        self.gl = RecordingGL(source.model).__enter__()
+        gl_state.reset_statistics()
+
+    def tearDown(self):
+        self.gl.__exit__(None, None, None)
+
+    def test_redundant_calls_are_elided(self):
+        for _ in range(3):
+            gl_state.enable(GL_DEPTH_TEST)
+            gl_state.disable(GL_CULL_FACE)
+            gl_state.use_program(4)
+        self.assertEqual([name for name, _ in self.gl.calls], ['glEnable', 'glDisable', 'glUseProgram'])
+        self.assertEqual((gl_state.calls, gl_state.elided), (3, 6))
+
+        gl_state.disable(GL_DEPTH_TEST)
+        self.assertEqual(self.gl.arguments('glDisable')[-1], (GL_DEPTH_TEST,))
+
+    def test_handles_compare_by_value(self):
+        gl_state.bind_buffer(GL_ARRAY_BUFFER, GLuint(3))
+        gl_state.bind_buffer(GL_ARRAY_BUFFER, GLuint(3))
+        gl_state.bind_buffer(GL_ELEMENT_ARRAY_BUFFER, GLuint(3))
+        self.assertEqual(self.gl.count('glBindBuffer'), 2)
+
+    def test_attribute_pointer_depends_on_buffer(self):
+        for buffer in (1, 1, 2):
+            gl_state.bind_buffer(GL_ARRAY_BUFFER, buffer)
+            gl_state.vertex_attrib_pointer(0, 3, GL_FLOAT, GL_FALSE, 0, 0)
+        self.assertEqual(self.gl.count('glVertexAttribPointer'), 2)
+
+    def test_textures_are_per_unit(self):
+        gl_state.bind_texture(0, GL_TEXTURE_2D, 5)
+        gl_state.bind_texture(1, GL_TEXTURE_2D, 5)
+        gl_state.bind_texture(0, GL_TEXTURE_2D, 5)
+        gl_state.bind_texture(1, GL_TEXTURE_2D, 6)
+
+        self.assertEqual(self.gl.arguments('glActiveTexture'), [(GL_TEXTURE0,), (GL_TEXTURE0 + 1,)])
+        self.assertEqual(self.gl.count('glBindTexture'), 3)
+
+    def test_enabling_a_model_again_is_free(self):
+        model = create_cube(use_vao=False)
+        model.enable()
+        self.gl.reset()
+        gl_state.reset_statistics()
+
+        model.enable()
+        self.assertEqual(self.gl.calls, [])
+        self.assertEqual(gl_state.calls, 0)
+        self.assertGreaterEqual(gl_state.elided, 3 * model.attribute_count + 1)
+
+    def test_invalidate(self):
+        gl_state.enable(GL_DEPTH_TEST)
+        gl_state.invalidate()
+        gl_state.enable(GL_DEPTH_TEST)
+        self.assertEqual(self.gl.count('glEnable'), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
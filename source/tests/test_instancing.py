@@ -0,0 +1,85 @@
+import unittest
+
+import numpy
+from pyglet.gl import GL_FLOAT, GL_FALSE
+
+import source.instancing
+import source.model
+import source.shader
+from source.instancing import InstanceBuffer, draw_instances
+from source.linear_algebra import transformation_matrices
+from source.model import create_cube, Model, VBO
+from source.shader import Shader
+from source.tests.recording_gl import RecordingGL
+
+
+def random_matrices(count, seed=0):
+    random = numpy.random.RandomState(seed)
+    return transformation_matrices(
+        random.uniform(-10, 10, size=(count, 3)), random.uniform(-3, 3, size=(count, 3)),
+        random.uniform(0.5, 2, size=(count, 3))
+    )
+
+
+class TestInstancedRendering(unittest.TestCase):
+
+    def setUp(self):
+        self.gl = RecordingGL(source.model, source.instancing, source.shader).__enter__()
+        self.model  = create_cube()
+        self.shader = Shader(1, {'transformation': 0})
+        self.shader.enable()
+        self.gl.reset()
+
+    def tearDown(self):
+        self.gl.__exit__(None, None, None)
+        Shader.bound = None
+
+    def test_one_draw_call_for_all_instances(self):
+        instance_buffer = InstanceBuffer.create(capacity=16)
+        self.gl.reset()
+
+        draw_instances(self.model, random_matrices(1000), self.shader, instance_buffer)
+
+        self.assertEqual(self.gl.draw_calls(), 1)
+        self.assertEqual(self.gl.arguments('glDrawElementsInstanced')[0][-1], 1000)
+        self.assertEqual(self.gl.count('glUniformMatrix4fv'), 0)
+        self.assertEqual(instance_buffer.capacity, 1024)
+
+    def test_fallback_draws_one_by_one(self):
+        draw_instances(self.model, random_matrices(100), self.shader)
+
+        self.assertEqual(self.gl.count('glDrawElements'), 100)
+        self.assertEqual(self.gl.count('glUniformMatrix4fv'), 100)
+
+    def test_nothing_to_draw(self):
+        draw_instances(self.model, numpy.empty((0, 4, 4)), self.shader, InstanceBuffer.create())
+        self.assertEqual(self.gl.draw_calls(), 0)
+
+    def test_matrix_attribute_layout(self):
+        instance_buffer = InstanceBuffer.create(capacity=4)
+        self.gl.reset()
+
+        matrices = random_matrices(3)
+        instance_buffer.update(matrices)
+        instance_buffer.enable(index=3)
+
+        # The uploaded data must be the matrices column by column.
+        _, offset, size, pointer = self.gl.arguments('glBufferSubData')[0]
+        self.assertEqual((offset, size), (0, 3 * 64))
+        uploaded = numpy.ctypeslib.as_array((numpy.ctypeslib.ctypes.c_float * 48).from_address(pointer))
+        numpy.testing.assert_array_equal(uploaded.reshape(3, 4, 4), matrices.transpose(0, 2, 1))
+
+        self.assertEqual(self.gl.arguments('glVertexAttribPointer'), [
+            (3 + column, 4, GL_FLOAT, GL_FALSE, 64, 16 * column) for column in range(4)
+        ])
+        self.assertEqual(self.gl.arguments('glVertexAttribDivisor'), [(3 + column, 1) for column in range(4)])
+
+    def test_model_without_index_buffer(self):
+        model = Model.create(vbos=(VBO.create([0.0] * 9, dimension=3),), count=3)
+        draw_instances(model, random_matrices(10), self.shader, InstanceBuffer.create())
+        self.assertEqual(self.gl.arguments('glDrawArraysInstanced')[-1][-1], 10)
+        self.assertEqual(self.gl.draw_calls(), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import unittest
+
+import numpy
+
+from source.linear_algebra import (
+    transformation_matrix, transformation_matrices, transform_box, screen_ray, perspective_matrix
+)
+
+
+class TestTransformationMatrices(unittest.TestCase):
+
+    def test_matches_transformation_matrix(self):
+        random = numpy.random.RandomState(0)
+        count = 64
+        locations = random.uniform(-100, 100, size=(count, 3))
+        rotations = random.uniform(-2 * numpy.pi, 2 * numpy.pi, size=(count, 3))
+        scales    = random.uniform(0.1, 10, size=(count, 3))
+
+        matrices = transformation_matrices(locations, rotations, scales)
+
+        self.assertEqual(matrices.shape, (count, 4, 4))
+        self.assertEqual(matrices.dtype, numpy.float32)
+        for matrix, location, rotation, scale in zip(matrices, locations, rotations, scales):
+            expected = transformation_matrix(*location, *rotation, *scale)
+            numpy.testing.assert_allclose(matrix, expected, rtol=1e-4, atol=1e-3)
+
+    def test_identity(self):
+        matrices = transformation_matrices([(0, 0, 0)], [(0, 0, 0)], [(1, 1, 1)])
+        numpy.testing.assert_array_equal(matrices[0], numpy.identity(4))
+
+    def test_empty(self):
+        matrices = transformation_matrices(numpy.empty((0, 3)), numpy.empty((0, 3)), numpy.empty((0, 3)))
+        self.assertEqual(matrices.shape, (0, 4, 4))
+
+
+class TestPicking(unittest.TestCase):
+
+    def test_transform_box_contains_corners(self):
+        matrix = transformation_matrix(1, 2, 3, 0.3, -1.2, 2.0, 2, 1, 0.5)
+        minimum, maximum = transform_box(matrix, (-0.5, -1, -0.5), (0.5, 1, 0.5))
+
+        corners = numpy.array([(x, y, z, 1) for x in (-0.5, 0.5) for y in (-1, 1) for z in (-0.5, 0.5)])
+        transformed = (corners @ matrix.T)[:, :3]
+        numpy.testing.assert_allclose(minimum, transformed.min(axis=0), rtol=1e-5)
+        numpy.testing.assert_allclose(maximum, transformed.max(axis=0), rtol=1e-5)
+
+    def test_screen_ray_through_center(self):
+        perspective = perspective_matrix(60, 1, 0.1, 100)
+        view = transformation_matrix(0, 0, -10)
+        origin, direction = screen_ray(240, 240, 480, 480, perspective, view)
+
+        # The view matrix moves the world 10 units away, so the camera is at z = 10 looking down negative z.
+        numpy.testing.assert_allclose(direction, (0, 0, -1), atol=1e-6)
+        numpy.testing.assert_allclose(origin[:2], (0, 0), atol=1e-6)
+        self.assertGreater(origin[2], 0)
+
+    def test_screen_ray_hits_projected_point(self):
+        perspective = perspective_matrix(60, 1.5, 0.1, 100)
+        view = transformation_matrix(1, -2, -10, 0.1, 0.2, 0)
+        point = numpy.array((0.5, 0.7, -3, 1))
+        clip = perspective @ view @ point
+        x, y = (clip[:2] / clip[3] + 1) / 2 * (600, 400)
+
+        origin, direction = screen_ray(x, y, 600, 400, perspective, view)
+        to_point = point[:3] - origin
+        numpy.testing.assert_allclose(numpy.cross(direction, to_point / numpy.linalg.norm(to_point)), 0, atol=1e-5)
+
+
+if __name__ == '__main__':
+    unittest.main()
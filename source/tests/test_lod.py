@@ -0,0 +1,142 @@
+import glob
+import os
+import shutil
+import tempfile
+import unittest
+from math import tan, pi
+from unittest import mock
+
+import numpy
+
+import source.lod
+import source.model
+from source.linear_algebra import perspective_matrix, transformation_matrix
+from source.lod import simplify_mesh, lod_chain, projected_sizes, select_lods, load_cached_lods, LevelsOfDetail
+from source.mesh import Mesh, parse_obj
+from source.model import Bounds
+from source.tests.recording_gl import RecordingGL
+from source.tests.test_mesh_optimization import grid_indices
+
+
+MODELS = os.path.join(os.path.dirname(__file__), '..', '..', 'resources', 'models')
+
+
+def grid_mesh(size):
+    """A flat 'size' x 'size' grid in the xy-plane, with one vertex per position."""
+    indices, vertex_count = grid_indices(size)
+    x, y = numpy.meshgrid(numpy.arange(size + 1), numpy.arange(size + 1))
+    positions = numpy.stack((x.ravel(), y.ravel(), numpy.zeros(vertex_count)), axis=-1).astype(numpy.float32)
+    texture_coordinates = positions[:, :2] / size
+    normals = numpy.tile(numpy.float32((0, 0, 1)), (vertex_count, 1))
+    return Mesh(positions, texture_coordinates, normals, indices.astype(numpy.uint32))
+
+
+def area(mesh):
+    triangles = mesh.positions[mesh.indices].reshape(-1, 3, 3).astype(numpy.float64)
+    normals = numpy.cross(triangles[:, 1] - triangles[:, 0], triangles[:, 2] - triangles[:, 0])
+    return numpy.linalg.norm(normals, axis=1).sum() / 2
+
+
+class TestSimplification(unittest.TestCase):
+
+    def test_flat_grid(self):
+        mesh = grid_mesh(16)
+        simplified = simplify_mesh(mesh, 64)
+
+        self.assertLessEqual(len(simplified.indices) // 3, 64)
+        self.assertAlmostEqual(area(simplified), 16 * 16, places=3)  # Nothing flipped or folded over.
+
+        # The border is locked, so it keeps all its vertices.
+        border = {tuple(p) for p in mesh.positions if p[0] in (0, 16) or p[1] in (0, 16)}
+        self.assertLessEqual(border, {tuple(p) for p in simplified.positions})
+
+        # Attributes follow the positions.
+        numpy.testing.assert_allclose(simplified.texture_coordinates, simplified.positions[:, :2] / 16)
+
+    def test_error_is_bounded(self):
+        mesh = parse_obj(os.path.join(MODELS, 'cube.obj'))
+        simplified = simplify_mesh(mesh, 2)
+        self.assertEqual(len(simplified.indices), len(mesh.indices))  # Any collapse would change its shape.
+
+    def test_chains(self):
+        for name in ('suzanne.obj', 'simple_car.obj', 'sphere.obj'):
+            mesh = parse_obj(os.path.join(MODELS, name))
+            counts = [len(level.indices) // 3 for level in lod_chain(mesh)]
+
+            self.assertEqual(counts[0], len(mesh.indices) // 3, name)
+            self.assertTrue(all(a > b for a, b in zip(counts, counts[1:])), (name, counts))
+            self.assertLess(counts[-1], counts[0] / 4, (name, counts))
+
+    def test_keeps_the_split_attributes(self):
+        mesh = parse_obj(os.path.join(MODELS, 'suzanne.obj'))
+        simplified = lod_chain(mesh)[-1]
+
+        # Every vertex is one of the original vertices, with the attributes it had.
+        original = {tuple(v) for v in numpy.hstack((mesh.positions, mesh.texture_coordinates, mesh.normals))}
+        vertices = numpy.hstack((simplified.positions, simplified.texture_coordinates, simplified.normals))
+        self.assertTrue(all(tuple(v) in original for v in vertices))
+        self.assertLess(int(simplified.indices.max()), len(simplified.positions))
+
+
+class TestSelection(unittest.TestCase):
+
+    def test_projected_sizes(self):
+        perspective = perspective_matrix(60, 1, 0.1, 100)
+        view     = numpy.eye(4)
+        bounds   = Bounds(None, None, (0, 0, 0), 1.0)
+        matrices = numpy.array([transformation_matrix(z=-10), transformation_matrix(z=-20),
+                                transformation_matrix(z=-20, sx=2, sy=2, sz=2)])
+
+        sizes = projected_sizes(matrices, bounds, perspective, view)
+        numpy.testing.assert_allclose(sizes, [0.1 / tan(pi / 6), 0.05 / tan(pi / 6), 0.1 / tan(pi / 6)], rtol=1e-5)
+
+    def test_select_lods(self):
+        numpy.testing.assert_array_equal(select_lods([1.0, 0.15, 0.07, 0.01], (0.2, 0.1, 0.05)), [0, 1, 2, 3])
+        numpy.testing.assert_array_equal(select_lods([0.01, 1.0], (0.2,)), [1, 0])
+        numpy.testing.assert_array_equal(select_lods([0.01], ()), [0])
+
+    def test_single_level(self):
+        lods = LevelsOfDetail([mock.Mock(bounds=Bounds(None, None, (0, 0, 0), 1.0))])
+        far = numpy.array([transformation_matrix(z=-1000)])
+        numpy.testing.assert_array_equal(lods.select(far, perspective_matrix(60, 1, 0.1, 100), numpy.eye(4)), [0])
+
+
+class TestCachedLevelsOfDetail(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.gl = RecordingGL(source.model).__enter__()
+
+    def tearDown(self):
+        self.gl.__exit__(None, None, None)
+        shutil.rmtree(self.directory)
+
+    def test_simplified_only_once(self):
+        path  = os.path.join(self.directory, 'simple_car.obj')
+        cache = os.path.join(self.directory, 'cache')
+        shutil.copy(os.path.join(MODELS, 'simple_car.obj'), path)
+
+        first = load_cached_lods(path, cache)
+        with mock.patch.object(source.lod, 'parse_obj') as parse:
+            second = load_cached_lods(path, cache)
+        parse.assert_not_called()
+
+        self.assertEqual(len(first.models), 4)
+        self.assertEqual([model.ibo.count for model in first.models], [model.ibo.count for model in second.models])
+        self.assertEqual(len(os.listdir(cache)), 5)  # The levels and the index folder.
+
+    def test_simplified_again_when_a_level_is_removed(self):
+        path  = os.path.join(self.directory, 'simple_car.obj')
+        cache = os.path.join(self.directory, 'cache')
+        shutil.copy(os.path.join(MODELS, 'simple_car.obj'), path)
+        load_cached_lods(path, cache)
+        os.remove(sorted(glob.glob(os.path.join(cache, '*.mesh')))[0])
+        uploads = len(self.gl.arguments('glBufferData'))
+
+        lods = load_cached_lods(path, cache)
+        self.assertEqual(len(lods.models), 4)
+        self.assertEqual(len(self.gl.arguments('glBufferData')) - uploads, 8)  # A vertex and index buffer per level.
+
+
+if __name__ == '__main__':
+    unittest.main()
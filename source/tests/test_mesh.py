@@ -0,0 +1,67 @@
+import os
+import tempfile
+import unittest
+
+import numpy
+
+from source.mesh import parse_obj
+
+
+MODELS = os.path.join(os.path.dirname(__file__), '..', '..', 'resources', 'models')
+
+
+def expanded_triangles(path):
+    """The position, texture coordinate and normal of each triangle corner, read line by line without sharing."""
+    data = {'v': [], 'vt': [], 'vn': []}
+    corners = []
+    with open(path) as file:
+        for line in file:
+            keyword, *values = line.split()
+            if keyword in data:
+                data[keyword].append([float(value) for value in values])
+            elif keyword == 'f':
+                for corner in values:
+                    v, t, n = (int(index) - 1 for index in corner.split('/'))
+                    corners.append(data['v'][v] + data['vt'][t] + data['vn'][n])
+    return numpy.array(corners, dtype=numpy.float32)
+
+
+def write_obj(text):
+    with tempfile.NamedTemporaryFile('w', suffix='.obj', delete=False) as file:
+        file.write(text)
+    return file.name
+
+
+class TestParseObj(unittest.TestCase):
+
+    def test_same_triangles_as_the_file(self):
+        for name in ('suzanne.obj', 'simple_car.obj', 'cube.obj'):
+            path = os.path.join(MODELS, name)
+            mesh = parse_obj(path)
+            vertices = numpy.hstack((mesh.positions, mesh.texture_coordinates, mesh.normals))
+            numpy.testing.assert_array_equal(vertices[mesh.indices], expanded_triangles(path))
+
+    def test_vertices_are_shared(self):
+        mesh = parse_obj(os.path.join(MODELS, 'cube.obj'))
+        self.assertEqual(len(mesh.indices), 36)
+        self.assertEqual(len(mesh.positions), 24)  # Each corner of the cube has three normals.
+        self.assertEqual(list(mesh.indices[:3]), [0, 1, 2])  # Numbered in the order they first appear.
+
+    def test_polygons_and_other_formats(self):
+        path = write_obj(
+            'v 0 0 0 1\nv 1 0 0 1\nv 1 1 0 1\nv 0 1 0 1\nvn 0 0 1\n'
+            'f 1//1 2//1 3//1 4//1\n'
+        )
+        try:
+            mesh = parse_obj(path)
+        finally:
+            os.remove(path)
+
+        self.assertEqual(mesh.indices.tolist(), [0, 1, 2, 0, 2, 3])
+        numpy.testing.assert_array_equal(mesh.positions, [[0, 0, 0], [1, 0, 0], [1, 1, 0], [0, 1, 0]])
+        numpy.testing.assert_array_equal(mesh.texture_coordinates, numpy.zeros((4, 2)))
+        numpy.testing.assert_array_equal(mesh.normals, [[0, 0, 1]] * 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,147 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy
+from pyglet.gl import GL_UNSIGNED_SHORT
+
+import source.mesh_cache
+import source.model
+from source.mesh import parse_obj
+from source.mesh_cache import save_mesh, load_mesh, load_cached_model, cache_path
+from source.model import MODEL_LAYOUT, compute_bounds
+from source.tests.recording_gl import RecordingGL
+
+
+MODELS = os.path.join(os.path.dirname(__file__), '..', '..', 'resources', 'models')
+
+
+class TestMeshCache(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.gl = RecordingGL(source.model).__enter__()
+
+    def tearDown(self):
+        self.gl.__exit__(None, None, None)
+        shutil.rmtree(self.directory)
+
+    def copy_model(self, name):
+        path = os.path.join(self.directory, name)
+        shutil.copy(os.path.join(MODELS, name), path)
+        return path
+
+    def test_round_trip(self):
+        mesh = parse_obj(os.path.join(MODELS, 'suzanne.obj'))
+        path = os.path.join(self.directory, 'suzanne.mesh')
+        save_mesh(path, mesh)
+
+        layout, bounds, vertices, indices = load_mesh(path)
+        self.assertEqual(layout.attributes, MODEL_LAYOUT.attributes)
+        self.assertEqual(vertices.tobytes(), MODEL_LAYOUT.pack(
+            position=mesh.positions, texture_coordinate=mesh.texture_coordinates, normal=mesh.normals
+        ).tobytes())
+        self.assertEqual(indices.dtype, numpy.uint16)
+        numpy.testing.assert_array_equal(indices, mesh.indices)
+        numpy.testing.assert_array_equal(bounds.minimum, compute_bounds(mesh.positions).minimum)
+        self.assertAlmostEqual(bounds.radius, compute_bounds(mesh.positions).radius, places=5)
+
+    def test_parsed_only_once(self):
+        path  = self.copy_model('cube.obj')
+        cache = os.path.join(self.directory, 'cache')
+
+        load_cached_model(path, cache)
+        with mock.patch.object(source.mesh_cache, 'parse_obj') as parse:
+            model = load_cached_model(path, cache)
+        parse.assert_not_called()
+
+        self.assertEqual(len(os.listdir(cache)), 2)  # The mesh and the index folder.
+        self.assertEqual((model.ibo.count, model.ibo.type), (36, GL_UNSIGNED_SHORT))
+        self.assertEqual(self.gl.arguments('glBufferData')[-2][1], 24 * MODEL_LAYOUT.stride)
+
+    def test_invalidated_when_the_source_changes(self):
+        path  = self.copy_model('cube.obj')
+        cache = os.path.join(self.directory, 'cache')
+        load_cached_model(path, cache)
+
+        with open(path, 'a') as file:
+            file.write('f 1/1/1 3/3/1 2/2/1\n')
+        model = load_cached_model(path, cache)
+
+        self.assertEqual(len(os.listdir(cache)), 2)  # The old mesh is removed.
+        self.assertEqual(model.ibo.count, 39)
+
+    def test_old_meshes_are_kept_while_used_by_another_source(self):
+        path  = self.copy_model('cube.obj')
+        copy  = shutil.copy(path, os.path.join(self.directory, 'copy.obj'))
+        cache = os.path.join(self.directory, 'cache')
+        load_cached_model(path, cache)
+        load_cached_model(copy, cache)
+        before = cache_path(copy, cache)
+
+        with open(path, 'a') as file:
+            file.write('f 1/1/1 3/3/1 2/2/1\n')
+        load_cached_model(path, cache)
+
+        self.assertTrue(os.path.exists(before))
+        self.assertEqual(len(os.listdir(cache)), 3)
+
+    def test_sources_indexed_by_another_process_are_kept(self):
+        path  = self.copy_model('cube.obj')
+        copy  = shutil.copy(path, os.path.join(self.directory, 'copy.obj'))
+        cache = os.path.join(self.directory, 'cache')
+        load_cached_model(path, cache)
+        with mock.patch.object(source.mesh_cache, '_entries', {}):  # Another process, with its own index in memory.
+            load_cached_model(copy, cache)
+            before = cache_path(copy, cache)
+
+        with open(path, 'a') as file:
+            file.write('f 1/1/1 3/3/1 2/2/1\n')
+        load_cached_model(path, cache)
+
+        self.assertTrue(os.path.exists(before))
+        self.assertEqual(len(os.listdir(os.path.join(cache, 'index'))), 2)
+
+    def test_parsed_again_when_the_mesh_is_removed(self):
+        path  = self.copy_model('cube.obj')
+        cache = os.path.join(self.directory, 'cache')
+        load_cached_model(path, cache)
+        os.remove(cache_path(path, cache))  # E.g. by another process, after its source changed.
+
+        with mock.patch.object(source.mesh_cache, 'parse_obj', wraps=parse_obj) as parse:
+            model = load_cached_model(path, cache)
+        parse.assert_called_once()
+        self.assertEqual(model.ibo.count, 36)
+
+    def test_file_modes(self):
+        path  = self.copy_model('cube.obj')
+        cache = os.path.join(self.directory, 'cache')
+        load_cached_model(path, cache)
+
+        # The same mode as a file created normally, whatever the umask is.
+        normal = os.path.join(self.directory, 'normal')
+        open(normal, 'w').close()
+        expected = os.stat(normal).st_mode & 0o777
+        for directory, _, names in os.walk(cache):
+            for name in names:
+                self.assertEqual(os.stat(os.path.join(directory, name)).st_mode & 0o777, expected)
+
+    def test_invalidated_by_an_edit_of_the_same_size(self):
+        path  = self.copy_model('cube.obj')
+        cache = os.path.join(self.directory, 'cache')
+        before = cache_path(path, cache)
+
+        with open(path, 'r+') as file:
+            text = file.read()
+            file.seek(0)
+            file.write(text.replace('f 4/1/1 3/2/1 1/3/1', 'f 4/1/1 1/3/1 3/2/1'))
+        status = os.stat(path)
+        os.utime(path, ns=(status.st_atime_ns, status.st_mtime_ns + 1000))
+
+        self.assertNotEqual(cache_path(path, cache), before)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+import os
+import unittest
+
+import numpy
+from pyglet.gl import GLushort, GLuint
+
+from source.mesh import parse_obj
+from source.mesh_optimization import index_type, acmr, optimize_vertex_cache, optimize_vertex_fetch, optimize_mesh
+
+
+MODELS = os.path.join(os.path.dirname(__file__), '..', '..', 'resources', 'models')
+
+
+def grid_indices(size, seed=0):
+    """Triangles of a 'size' x 'size' grid of quads, in random order (like a badly exported mesh)."""
+    corner = numpy.arange(size * (size + 1)).reshape(size, size + 1)[:, :-1].ravel()
+    quads  = numpy.stack((corner, corner + size + 1, corner + size + 2, corner + 1), axis=-1)
+    triangles = quads[:, [0, 1, 2, 0, 2, 3]].reshape(-1, 3)
+    return triangles[numpy.random.RandomState(seed).permutation(len(triangles))].ravel(), (size + 1) ** 2
+
+
+def sorted_triangles(vertices, indices):
+    """The triangles as vertex data, in a canonical order to compare meshes with different orders."""
+    triangles = vertices[indices].reshape(len(indices) // 3, -1)
+    return triangles[numpy.lexsort(triangles.T[::-1])]
+
+
+class TestMeshOptimization(unittest.TestCase):
+
+    def test_index_type(self):
+        self.assertIs(index_type(100), GLushort)
+        self.assertIs(index_type(65536), GLushort)
+        self.assertIs(index_type(65537), GLuint)
+
+    def test_acmr(self):
+        self.assertEqual(acmr([0, 1, 2, 3, 4, 5]), 3)
+        self.assertEqual(acmr([0, 1, 2, 2, 1, 3]), 2)  # The second triangle only misses vertex 3.
+        self.assertEqual(acmr([0, 1, 2, 3, 4, 5, 0, 1, 2], cache_size=3), 3)  # Vertex 0-2 were evicted.
+
+    def test_vertex_cache_order_has_fewer_misses(self):
+        indices, vertex_count = grid_indices(40)
+        optimized = optimize_vertex_cache(indices, vertex_count)
+
+        self.assertGreater(acmr(indices), 2.5)
+        self.assertLess(acmr(optimized), 0.8)
+        numpy.testing.assert_array_equal(
+            numpy.sort(numpy.sort(optimized.reshape(-1, 3), axis=1), axis=0),
+            numpy.sort(numpy.sort(indices.reshape(-1, 3), axis=1), axis=0)
+        )
+
+    def test_vertex_fetch_order(self):
+        indices, order = optimize_vertex_fetch([5, 2, 7, 2, 7, 0], vertex_count=9)
+        self.assertEqual(indices.tolist(), [0, 1, 2, 1, 2, 3])
+        self.assertEqual(order.tolist(), [5, 2, 7, 0])
+
+    def test_optimized_mesh_has_the_same_triangles(self):
+        for name in ('sphere.obj', 'simple_car.obj'):
+            mesh = parse_obj(os.path.join(MODELS, name))
+            optimized = optimize_mesh(mesh)
+            self.assertLess(acmr(optimized.indices), acmr(mesh.indices))
+
+            vertices = numpy.hstack((mesh.positions, mesh.texture_coordinates, mesh.normals))
+            optimized_vertices = numpy.hstack((optimized.positions, optimized.texture_coordinates, optimized.normals))
+            numpy.testing.assert_array_equal(
+                sorted_triangles(optimized_vertices, optimized.indices), sorted_triangles(vertices, mesh.indices)
+            )
+
+    def test_empty_mesh(self):
+        self.assertEqual(len(optimize_vertex_cache([], 0)), 0)
+        self.assertEqual(acmr([]), 0.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
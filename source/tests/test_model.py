@@ -0,0 +1,144 @@
+import array
+import os
+import unittest
+from unittest import mock
+
+import numpy
+from pyglet.gl import GL_FLOAT, GL_FALSE, GL_TRUE, GL_UNSIGNED_BYTE, GL_UNSIGNED_SHORT, GLfloat, GLubyte, GLushort
+
+import source.model
+from source.model import (
+    create_cube, load_model, as_contiguous_array, Model, VBO, IBO, VertexLayout, VertexAttribute, MODEL_LAYOUT
+)
+from source.tests.recording_gl import RecordingGL
+
+
+MODELS = os.path.join(os.path.dirname(__file__), '..', '..', 'resources', 'models')
+
+
+class TestVertexLayout(unittest.TestCase):
+
+    def test_offsets_and_stride(self):
+        layout = VertexLayout(VertexAttribute('position', 3), VertexAttribute('color', 4, GLubyte, normalized=True))
+        self.assertEqual(layout.offsets, [0, 12])
+        self.assertEqual(layout.stride, 16)
+        self.assertEqual(layout.pointers, [(3, GL_FLOAT, GL_FALSE, 0), (4, GL_UNSIGNED_BYTE, GL_TRUE, 12)])
+
+    def test_pack_interleaves_the_attributes(self):
+        vertices = MODEL_LAYOUT.pack(
+            position=[1, 2, 3, 4, 5, 6], texture_coordinate=[7, 8, 9, 10], normal=[11, 12, 13, 14, 15, 16]
+        )
+        self.assertEqual(vertices.nbytes, 2 * MODEL_LAYOUT.stride)
+        numpy.testing.assert_array_equal(
+            vertices.view(numpy.float32), [1, 2, 3, 7, 8, 11, 12, 13, 4, 5, 6, 9, 10, 14, 15, 16]
+        )
+
+    def test_pack_takes_rows_of_vertices(self):
+        positions = numpy.arange(6, dtype=numpy.float32).reshape(2, 3)
+        vertices = MODEL_LAYOUT.pack(position=positions, texture_coordinate=numpy.zeros((2, 2)), normal=positions)
+        numpy.testing.assert_array_equal(vertices['position'], positions)
+
+    def test_pack_checks_the_vertex_count(self):
+        with self.assertRaises(AssertionError):
+            MODEL_LAYOUT.pack(position=[0.0] * 6, texture_coordinate=[0.0] * 2, normal=[0.0] * 6)
+
+
+class TestBufferUploads(unittest.TestCase):
+
+    def setUp(self):
+        self.gl = RecordingGL(source.model).__enter__()
+
+    def tearDown(self):
+        self.gl.__exit__(None, None, None)
+
+    def uploaded(self):
+        """Size and pointer of the last upload."""
+        _, size, pointer, _ = self.gl.arguments('glBufferData')[-1]
+        return size, pointer
+
+    def test_numpy_arrays_are_not_copied(self):
+        data = numpy.arange(30, dtype=numpy.float32).reshape(10, 3)
+        VBO.create(data, dimension=3)
+        self.assertEqual(self.uploaded(), (data.nbytes, data.ctypes.data))
+
+    def test_buffers_are_not_copied(self):
+        data = array.array('I', range(12))
+        ibo = IBO.create(data)
+        self.assertEqual(self.uploaded(), (48, data.buffer_info()[0]))
+        self.assertEqual(ibo.count, 12)
+
+        indices = numpy.arange(12, dtype=numpy.uint16)
+        ibo = IBO.create(memoryview(indices), type=GLushort)
+        self.assertEqual(self.uploaded(), (24, indices.ctypes.data))
+        self.assertEqual((ibo.count, ibo.type), (12, GL_UNSIGNED_SHORT))
+
+    def test_other_data_is_converted(self):
+        for data in ([0.5, 1.5, 2.5], numpy.array([0.5, 1.5, 2.5]), array.array('d', [0.5, 1.5, 2.5])):
+            converted = as_contiguous_array(data, GLfloat)
+            self.assertEqual(converted.dtype, numpy.float32)
+            numpy.testing.assert_array_equal(converted, [0.5, 1.5, 2.5])
+
+    def test_bytes_are_reinterpreted(self):
+        data = numpy.array([0.5, 1.5], dtype=numpy.float32)
+        numpy.testing.assert_array_equal(as_contiguous_array(data.tobytes(), GLfloat), data)
+
+
+class TestVertexArrays(unittest.TestCase):
+
+    def setUp(self):
+        self.gl = RecordingGL(source.model).__enter__()
+
+    def tearDown(self):
+        self.gl.__exit__(None, None, None)
+
+    def test_attribute_setup_is_recorded_once(self):
+        model = create_cube()
+        self.assertEqual(self.gl.count('glGenVertexArrays'), 1)
+        self.assertEqual(self.gl.count('glVertexAttribPointer'), model.attribute_count)
+        self.assertEqual(self.gl.arguments('glBindVertexArray')[-1], (0,))  # Not left bound after creation.
+
+    def test_model_attributes_share_one_buffer(self):
+        model, other = create_cube(use_vao=False), create_cube(use_vao=False)
+        other.enable()
+        self.gl.reset()
+
+        model.enable()
+        self.assertEqual(len(model.vbos), 1)
+        self.assertEqual(self.gl.count('glBindBuffer'), 2)  # The vertex buffer and the index buffer.
+        self.assertEqual([(index, stride, pointer) for index, _, _, _, stride, pointer in
+                          self.gl.arguments('glVertexAttribPointer')], [(0, 32, 0), (1, 32, 12), (2, 32, 20)])
+
+    def test_load_model(self):
+        model = load_model(os.path.join(MODELS, 'cube.obj'))
+        self.assertEqual(model.ibo.count, 36)
+        self.assertEqual(self.gl.arguments('glBufferData')[0][1], 24 * MODEL_LAYOUT.stride)
+
+    def test_enable_is_a_single_bind(self):
+        model = create_cube()
+        self.gl.reset()
+
+        model.enable()
+        model.disable()
+        self.assertEqual([name for name, _ in self.gl.calls], ['glBindVertexArray'])
+
+    def test_model_without_vertex_array_binds_the_default(self):
+        with_vao, without_vao = create_cube(), create_cube(use_vao=False)
+        with_vao.enable()
+        self.gl.reset()
+
+        without_vao.enable()
+        self.assertEqual(self.gl.calls[0], ('glBindVertexArray', (0,)))
+        self.assertEqual(self.gl.count('glVertexAttribPointer'), without_vao.attribute_count)
+
+    def test_fallback_without_vertex_arrays(self):
+        with mock.patch.object(source.model, 'supports_vertex_arrays', return_value=False):
+            model = Model.create(vbos=(VBO.create([0.0] * 9, dimension=3),), count=3)
+        self.assertIsNone(model.vao)
+        self.assertEqual(self.gl.count('glGenVertexArrays'), 0)
+
+        model.enable()
+        self.assertEqual(self.gl.count('glEnableVertexAttribArray'), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import unittest
+
+import numpy
+
+from source.entity import World, Transform, Physics
+from source.physics import integrate, FixedTimestep
+
+
+class TestIntegrate(unittest.TestCase):
+
+    def setUp(self):
+        self.world = World()
+        self.moving = self.world.create_entity(
+            Transform(location=(0, 0, 0), rotation=(0, 0, 0), scale=(1, 1, 1)),
+            Physics(velocity=(1, 0, 0), acceleration=(0, 2, 0), max_speed=100)
+        )
+        self.fast = self.world.create_entity(
+            Transform(location=(0, 0, 0), rotation=(0, 0, 0), scale=(1, 1, 1)),
+            Physics(velocity=(30, 40, 0), acceleration=(0, 0, 0), max_speed=5)
+        )
+        self.static = self.world.create_entity(Transform(location=(1, 1, 1), rotation=(0, 0, 0), scale=(1, 1, 1)))
+
+    def test_semi_implicit_euler(self):
+        integrate(self.world, 0.5)
+
+        transform, physics = self.world.get_components(self.moving, Transform, Physics)
+        numpy.testing.assert_allclose(physics.velocity, (1, 1, 0))
+        numpy.testing.assert_allclose(transform.location, (0.5, 0.5, 0))
+
+    def test_speed_is_clamped(self):
+        integrate(self.world, 1)
+
+        transform, physics = self.world.get_components(self.fast, Transform, Physics)
+        numpy.testing.assert_allclose(physics.velocity, (3, 4, 0), rtol=1e-6)
+        numpy.testing.assert_allclose(transform.location, (3, 4, 0), rtol=1e-6)
+
+    def test_entities_without_physics_are_untouched(self):
+        integrate(self.world, 1)
+
+        transform, = self.world.get_components(self.static, Transform)
+        numpy.testing.assert_array_equal(transform.location, (1, 1, 1))
+
+
+class TestFixedTimestep(unittest.TestCase):
+
+    def setUp(self):
+        self.steps = []
+        self.timestep = FixedTimestep(None, step=0.1, max_steps=5, function=lambda world, dt: self.steps.append(dt))
+
+    def test_steps_are_independent_of_frame_rate(self):
+        for _ in range(10):
+            self.timestep.update(0.035)
+        self.assertEqual(len(self.steps), 3)
+        self.assertTrue(all(step == 0.1 for step in self.steps))
+        self.assertAlmostEqual(self.timestep.update(0), 0.5)
+
+    def test_long_frames_are_limited(self):
+        self.timestep.update(10)
+        self.assertEqual(len(self.steps), 5)
+        self.assertLessEqual(self.timestep.accumulator, 0.1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+import unittest
+from collections import namedtuple
+
+import numpy
+
+import source.instancing
+import source.model
+import source.render_queue
+import source.shader
+from source.instancing import InstanceBuffer
+from source.linear_algebra import transformation_matrix
+from source.model import create_cube
+from source.render_queue import RenderQueue, depth_bits, sort_keys
+from source.shader import Shader
+from source.tests.recording_gl import RecordingGL
+
+
+Texture = namedtuple('Texture', 'id')
+
+
+class TestSortKeys(unittest.TestCase):
+
+    def test_depth_bits_keep_order(self):
+        depths = numpy.array([-numpy.inf, -100, -1.5, -0.0, 0.0, 1e-30, 0.5, 2, 1e10, numpy.inf], dtype=numpy.float32)
+        bits = depth_bits(depths)
+        self.assertTrue(numpy.all(numpy.diff(bits.astype(numpy.int64)) >= 0))
+
+    def test_key_order(self):
+        # The shader matters most, then the model, the textures and the depth.
+        keys = sort_keys([1, 0, 0, 0, 0], [0, 1, 0, 0, 0], [0, 0, 1, 0, 0], [0, 0, 0, 5, -5])
+        numpy.testing.assert_array_equal(numpy.argsort(keys), (4, 3, 2, 1, 0))
+
+
+class TestRenderQueue(unittest.TestCase):
+
+    def setUp(self):
+        self.gl = RecordingGL(source.model, source.instancing, source.shader, source.render_queue).__enter__()
+        self.shaders  = [Shader(1, {'transformation': 0, 'color': 1}), Shader(2, {'transformation': 0})]
+        self.models   = [create_cube(), create_cube()]
+        self.textures = [Texture(1), Texture(2), Texture(3)]
+        self.gl.reset()
+
+    def tearDown(self):
+        self.gl.__exit__(None, None, None)
+        Shader.bound = None
+
+    def submit_scene(self, queue, count=300, seed=0):
+        """Submits 'count' draws with random state, in random order."""
+        random = numpy.random.RandomState(seed)
+        for i in range(count):
+            shader  = self.shaders[random.randint(2)]
+            model   = self.models[random.randint(2)]
+            texture = self.textures[random.randint(3)]
+            queue.submit(shader, model, (texture,), transformation_matrix(i, 0, 0), depth=random.uniform(0, 10))
+
+    def test_state_changes_are_near_minimal(self):
+        queue = RenderQueue()
+        self.submit_scene(queue)
+        queue.flush()
+
+        # At most every (shader, model, texture) combination once: 2 shaders, 2 * 2 models and 2 * 2 * 3 textures.
+        self.assertEqual(self.gl.count('glUseProgram'), 2)
+        self.assertEqual(self.gl.count('glBindTexture'), queue.state_changes - 2 - 4)
+        self.assertLessEqual(queue.state_changes, 2 + 4 + 12)
+        self.assertEqual(queue.state_changes + queue.state_changes_avoided, 300 * 3)
+        self.assertEqual(self.gl.draw_calls(), 300)
+        self.assertEqual(queue.draws, 300)
+        self.assertEqual(len(queue), 0)
+
+    def test_instanced_shader_draws_each_state_once(self):
+        queue = RenderQueue(instance_buffers={shader: InstanceBuffer.create() for shader in self.shaders})
+        self.submit_scene(queue)
+        queue.flush()
+        self.assertEqual(self.gl.count('glDrawElementsInstanced'), 12)
+
+    def test_sorted_front_to_back_within_state(self):
+        queue = RenderQueue()
+        for depth in (3, 1, 2):
+            queue.submit(self.shaders[0], self.models[0], (), transformation_matrix(depth, 0, 0), depth=depth)
+        queue.flush()
+
+        translations = [args[3] for args in self.gl.arguments('glUniformMatrix4fv')]
+        locations = [numpy.ctypeslib.as_array(pointer, shape=(16,))[3] for pointer in translations]
+        self.assertEqual(locations, [1, 2, 3])
+
+    def test_equal_keys_keep_submission_order(self):
+        queue = RenderQueue()
+        for i in range(200):
+            queue.submit(self.shaders[i % 2], self.models[0], (), transformation_matrix(i, 0, 0), depth=i // 100)
+
+        order = queue.sorted_order().tolist()
+        first = [i for i in order if i % 2 == 0]
+        self.assertEqual(order, sorted(first) + sorted(set(order) - set(first)))
+
+    def test_draws_with_uniforms_are_drawn_alone(self):
+        queue = RenderQueue()
+        for color in ((1, 0, 0), (0, 1, 0)):
+            queue.submit(self.shaders[0], self.models[0], (), numpy.identity(4), uniforms={'color': color})
+        queue.flush()
+
+        self.assertEqual(self.gl.arguments('glUniform3f'), [(1, 1, 0, 0), (1, 0, 1, 0)])
+        self.assertEqual(self.gl.count('glUseProgram'), 1)
+        self.assertEqual(queue.state_changes_avoided, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
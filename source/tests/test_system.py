@@ -0,0 +1,68 @@
+import threading
+import unittest
+
+from source.entity import World, Transform, Physics, PointLight, Collidable
+from source.system import System, Scheduler
+
+
+def noop(world, commands, dt):
+    pass
+
+
+class TestScheduler(unittest.TestCase):
+
+    def setUp(self):
+        self.scheduler = Scheduler(World(), max_workers=4)
+
+    def tearDown(self):
+        self.scheduler.shutdown()
+
+    def test_conflicts(self):
+        a = System(noop, reads=[Transform], writes=[Physics])
+        b = System(noop, reads=[Transform, PointLight])
+        c = System(noop, writes=[Transform])
+
+        self.assertFalse(a.conflicts_with(b))
+        self.assertTrue(a.conflicts_with(c))
+        self.assertTrue(c.conflicts_with(b))
+
+    def test_stages(self):
+        velocity = self.scheduler.add_system(noop, reads=[], writes=[Physics], name='velocity')
+        lights   = self.scheduler.add_system(noop, reads=[Transform, PointLight], name='lights')
+        movement = self.scheduler.add_system(noop, reads=[Physics], writes=[Transform], name='movement')
+        culling  = self.scheduler.add_system(noop, reads=[Collidable], name='culling')
+
+        self.assertEqual(self.scheduler.stages, [[velocity, lights, culling], [movement]])
+
+    def test_stage_runs_concurrently(self):
+        barrier = threading.Barrier(2, timeout=5)
+
+        def wait(world, commands, dt):
+            barrier.wait()  # Would time out if the systems ran one after another.
+
+        self.scheduler.add_system(wait, reads=[Transform])
+        self.scheduler.add_system(wait, reads=[Transform])
+        self.scheduler.run(1 / 60)
+
+    def test_exceptions_are_raised(self):
+        def fail(world, commands, dt):
+            raise RuntimeError('Failed')
+
+        self.scheduler.add_system(fail, reads=[Transform])
+        self.scheduler.add_system(noop, reads=[Transform])
+        with self.assertRaises(RuntimeError):
+            self.scheduler.run(1 / 60)
+
+    def test_commands_are_flushed_after_run(self):
+        def spawn(world, commands, dt):
+            self.assertEqual(world.get_component_arrays_of(Transform), [])
+            commands.create_entity(Transform(location=(0, 0, 0), rotation=(0, 0, 0), scale=(1, 1, 1)))
+
+        self.scheduler.add_system(spawn, writes=[Transform])
+        self.scheduler.run(1 / 60)
+
+        self.assertEqual(len(self.scheduler.world.get_component_arrays_of(Transform)), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
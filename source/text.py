@@ -1,19 +1,26 @@
 import os
-from source.texture import load_texture
-from source.model import Model, VBO, IBO
 
+import numpy
+from pyglet.gl import GL_UNSIGNED_INT
 
-def load_font(path):
-    raise NotImplemented('Sorry...')
+from source.dynamic_buffer import DynamicBuffer, RingBuffer
+from source.texture import load_texture
+from source.model import Model, VBO, IBO, VertexLayout, VertexAttribute
 
 
-class Font:
+TEXT_LAYOUT = VertexLayout(VertexAttribute('position', 2), VertexAttribute('texture_coordinate', 2))
 
-    def __init__(self, path):
-        self.characters = {}
-        texture_path = None
 
-        for line in open(path):
+def parse_font(path):
+    """
+    The characters (character code to its attributes) of the BMFont text file at 'path', and the path of its texture.
+    It doesn't need OpenGL, so it can run in other processes (see 'asset_pipeline').
+    """
+    characters = {}
+    texture_path = None
+
+    with open(path) as file:
+        for line in file:
             if line.startswith('page '):
                 for statement in line.split(' '):
                     if statement.startswith('file'):
@@ -28,21 +35,45 @@ class Font:
                         character_attributes[attribute] = int(value)
 
                         if 'id=' in statement:
-                            self.characters[int(value)] = character_attributes
+                            characters[int(value)] = character_attributes
+
+    assert texture_path, 'Could not find the texture!'
+    return characters, os.path.join(os.path.split(path)[0], texture_path)
 
-        assert texture_path, 'Could not find the texture!'
-        folder_path = os.path.split(path)[0]
-        self.texture = load_texture(os.path.join(folder_path, texture_path))
+
+def load_font(path):
+    characters, texture_path = parse_font(path)
+    return Font(characters, load_texture(texture_path))
+
+
+class Font:
+
+    def __init__(self, characters, texture):
+        self.characters = characters
+        self.texture = texture
+
+        # Text models are made every frame, so their vertices are written to a ring buffer, and they share the
+        # indices (which are the same for every quad).
+        self.vertices = RingBuffer.create(capacity=64 * 1024)
+        self.indices  = DynamicBuffer.create(capacity=0)
+        self.quads = 0  # Number of quads 'indices' has indices for.
+
+    def quad_indices(self, count):
+        """Index buffer of (at least) 'count' quads, which is grown if needed."""
+        if count > self.quads:
+            self.quads = max(count, 2 * self.quads)
+            quad = numpy.array([0, 1, 3, 3, 1, 2], dtype=numpy.uint32)
+            self.indices.upload(quad + 4 * numpy.arange(self.quads, dtype=numpy.uint32)[:, None])
+        return IBO(self.indices.id, 6 * count, GL_UNSIGNED_INT)
 
 
     def text_model(self, text, anchor_center=False):
+        """A model of 'text', which is only valid for the current frame (until the vertex ring buffer wraps)."""
 
         positions = []
         texture_coordinates = []
-        indices = []
 
         cursor_x, cursor_y = 0, 0
-        index = 0
 
         height = self.texture.height
 
@@ -64,13 +95,9 @@ class Font:
                     tx + tw, height - (ty + th),  # bottomright
                     tx + tw, height - ty  # topright
             ]
-            i = [index, index + 1, index + 3, index + 3, index + 1, index + 2]
 
             positions.extend(v)
             texture_coordinates.extend(t)
-            indices.extend(i)
-
-            index += 4
 
             cursor_x += info['xadvance']
 
@@ -87,9 +114,10 @@ class Font:
         texture_coordinates = [i / max_value for i in texture_coordinates]
 
 
-        positions = VBO.create(positions, dimension=2)
-        texture_coordinates = VBO.create(texture_coordinates, dimension=2)
-        indices = IBO.create(indices)
+        vertices = TEXT_LAYOUT.pack(position=positions, texture_coordinate=texture_coordinates)
+        offset   = self.vertices.allocate(vertices)
 
-        return Model.create(vbos=(positions, texture_coordinates), ibo=indices)
+        # A new model is created every call, so don't create a vertex array object for it as well.
+        vbo = VBO(self.vertices.id, TEXT_LAYOUT, offset)
+        return Model.create(vbos=(vbo,), ibo=self.quad_indices(len(text)), use_vao=False)
 
@@ -1,19 +1,65 @@
+from collections import namedtuple
+
+import numpy
+from pyglet.extlibs import png
 from pyglet.gl import (
-    glTexParameteri, glBindTexture, GL_TEXTURE_2D, GL_TEXTURE_BASE_LEVEL, GL_TEXTURE_MAX_LEVEL,
-    GL_TEXTURE_MIN_FILTER, GL_TEXTURE_MAG_FILTER, GL_TEXTURE_WRAP_S, GL_TEXTURE_WRAP_T, GL_LINEAR,
-    GL_CLAMP_TO_EDGE,
+    glGenTextures, glTexImage2D, glTexParameteri, GLuint, GL_TEXTURE_2D, GL_TEXTURE_BASE_LEVEL, GL_TEXTURE_MAX_LEVEL,
+    GL_TEXTURE_MIN_FILTER, GL_TEXTURE_MAG_FILTER, GL_TEXTURE_WRAP_S, GL_TEXTURE_WRAP_T, GL_LINEAR, GL_CLAMP_TO_EDGE,
+    GL_RGBA, GL_UNSIGNED_BYTE,
 )
 from pyglet.image import load as load_image
 
+from source.gl_state import gl_state
 
-def load_texture(path, min_filter=GL_LINEAR, max_filter=GL_LINEAR, wrap_s=GL_CLAMP_TO_EDGE, wrap_t=GL_CLAMP_TO_EDGE):
-    texture = load_image(path).get_texture()  # DIMENSIONS MUST BE POWER OF 2.
-    glBindTexture(GL_TEXTURE_2D, texture.id)
+
+# Pixels of an image before it's uploaded, as an RGBA (height, width, 4) uint8 array with the bottom row first (like
+# OpenGL expects).
+Image = namedtuple('Image', 'width, height, pixels')
+
+# A texture made by 'create_texture'. Textures from 'load_texture' are pyglet's, which have the same attributes.
+Texture = namedtuple('Texture', 'id, width, height')
+
+
+def decode_png(path):
+    """
+    Decodes the PNG file at 'path' to an 'Image', with the decoder pyglet uses for PNG files. It doesn't need OpenGL,
+    so it can run in other processes (see 'asset_pipeline').
+    """
+    with open(path, 'rb') as file:
+        width, height, rows, _ = png.Reader(file=file).asRGBA8()
+        pixels = numpy.frombuffer(b''.join(rows), dtype=numpy.uint8).reshape(height, width, 4)
+    return Image(width, height, numpy.ascontiguousarray(pixels[::-1]))
+
+
+def _set_parameters(min_filter, max_filter, wrap_s, wrap_t):
     glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_BASE_LEVEL, 0)
     glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAX_LEVEL, 0)
     glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, min_filter)
     glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, max_filter)
     glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, wrap_s)
     glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, wrap_t)
-    glBindTexture(GL_TEXTURE_2D, 0)
-    return texture
\ No newline at end of file
+
+
+def create_texture(image, min_filter=GL_LINEAR, max_filter=GL_LINEAR, wrap_s=GL_CLAMP_TO_EDGE,
+                   wrap_t=GL_CLAMP_TO_EDGE):
+    """Uploads an 'Image' (e.g. from 'decode_png') to a new texture."""
+    handle = GLuint()
+    glGenTextures(1, handle)
+
+    pixels = numpy.ascontiguousarray(image.pixels, dtype=numpy.uint8)
+    gl_state.bind_texture(0, GL_TEXTURE_2D, handle.value)
+    glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA, image.width, image.height, 0, GL_RGBA, GL_UNSIGNED_BYTE,
+                 pixels.ctypes.data)
+    _set_parameters(min_filter, max_filter, wrap_s, wrap_t)
+    gl_state.bind_texture(0, GL_TEXTURE_2D, 0)
+    return Texture(handle.value, image.width, image.height)
+
+
+def load_texture(path, min_filter=GL_LINEAR, max_filter=GL_LINEAR, wrap_s=GL_CLAMP_TO_EDGE, wrap_t=GL_CLAMP_TO_EDGE):
+    texture = load_image(path).get_texture()  # DIMENSIONS MUST BE POWER OF 2.
+    gl_state.invalidate()  # Pyglet has bound textures of its own.
+
+    gl_state.bind_texture(0, GL_TEXTURE_2D, texture.id)
+    _set_parameters(min_filter, max_filter, wrap_s, wrap_t)
+    gl_state.bind_texture(0, GL_TEXTURE_2D, 0)
+    return texture